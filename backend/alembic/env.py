@@ -14,8 +14,9 @@ from app.config import settings
 # this is the Alembic Config object
 config = context.config
 
-# Interpret the config file for Python logging.
-if config.config_file_name is not None:
+# Interpret the config file for Python logging, unless the caller (the app's
+# startup migrations) has already configured logging and asked to keep it
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
 # Set the SQLAlchemy URL from settings
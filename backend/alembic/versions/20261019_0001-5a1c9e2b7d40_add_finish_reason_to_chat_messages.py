@@ -0,0 +1,25 @@
+"""Add finish_reason to chat_messages
+
+Revision ID: 5a1c9e2b7d40
+Revises: 2f68bf0fd8ec
+Create Date: 2026-10-19 00:01:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "5a1c9e2b7d40"
+down_revision: Union[str, None] = "2f68bf0fd8ec"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("chat_messages", sa.Column("finish_reason", sa.String(20), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("chat_messages", "finish_reason")
@@ -0,0 +1,26 @@
+"""Add (created_at, id) indexes for keyset pagination
+
+Revision ID: 6b2d0f3c8e51
+Revises: 5a1c9e2b7d40
+Create Date: 2026-10-19 00:02:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "6b2d0f3c8e51"
+down_revision: Union[str, None] = "5a1c9e2b7d40"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("idx_pdfs_created_at_id", "pdfs", ["created_at", "id"])
+    op.create_index("idx_images_created_at_id", "images", ["created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_images_created_at_id", table_name="images")
+    op.drop_index("idx_pdfs_created_at_id", table_name="pdfs")
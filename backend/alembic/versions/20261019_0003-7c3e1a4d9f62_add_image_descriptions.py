@@ -0,0 +1,39 @@
+"""Add image descriptions and per-turn answer metrics
+
+Revision ID: 7c3e1a4d9f62
+Revises: 6b2d0f3c8e51
+Create Date: 2026-10-19 00:03:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "7c3e1a4d9f62"
+down_revision: Union[str, None] = "6b2d0f3c8e51"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("images", sa.Column("description", sa.Text(), nullable=True))
+    op.add_column("images", sa.Column("extracted_text", sa.Text(), nullable=True))
+    op.add_column("images", sa.Column("description_status", sa.String(20), nullable=True))
+
+    op.add_column("image_messages", sa.Column("answer_path", sa.String(20), nullable=True))
+    op.add_column("image_messages", sa.Column("latency_ms", sa.Integer(), nullable=True))
+    op.add_column("image_messages", sa.Column("prompt_tokens", sa.Integer(), nullable=True))
+    op.add_column("image_messages", sa.Column("completion_tokens", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("image_messages", "completion_tokens")
+    op.drop_column("image_messages", "prompt_tokens")
+    op.drop_column("image_messages", "latency_ms")
+    op.drop_column("image_messages", "answer_path")
+
+    op.drop_column("images", "description_status")
+    op.drop_column("images", "extracted_text")
+    op.drop_column("images", "description")
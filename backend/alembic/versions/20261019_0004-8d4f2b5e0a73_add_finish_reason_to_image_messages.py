@@ -0,0 +1,25 @@
+"""Add finish_reason to image_messages
+
+Revision ID: 8d4f2b5e0a73
+Revises: 7c3e1a4d9f62
+Create Date: 2026-10-19 00:04:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "8d4f2b5e0a73"
+down_revision: Union[str, None] = "7c3e1a4d9f62"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("image_messages", sa.Column("finish_reason", sa.String(20), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("image_messages", "finish_reason")
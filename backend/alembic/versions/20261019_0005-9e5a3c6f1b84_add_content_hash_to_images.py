@@ -0,0 +1,25 @@
+"""Add content_hash to images
+
+Revision ID: 9e5a3c6f1b84
+Revises: 8d4f2b5e0a73
+Create Date: 2026-10-19 00:05:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "9e5a3c6f1b84"
+down_revision: Union[str, None] = "8d4f2b5e0a73"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("images", sa.Column("content_hash", sa.String(64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("images", "content_hash")
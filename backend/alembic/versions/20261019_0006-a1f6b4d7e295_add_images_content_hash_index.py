@@ -0,0 +1,24 @@
+"""Add images content_hash index for upload dedupe
+
+Revision ID: a1f6b4d7e295
+Revises: 9e5a3c6f1b84
+Create Date: 2026-10-19 00:06:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "a1f6b4d7e295"
+down_revision: Union[str, None] = "9e5a3c6f1b84"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("idx_images_content_hash", "images", ["content_hash"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_images_content_hash", table_name="images")
@@ -0,0 +1,29 @@
+"""Add stream_metrics to chat_messages
+
+Revision ID: b2a7c5e8f3a6
+Revises: a1f6b4d7e295
+Create Date: 2026-10-19 00:07:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision: str = "b2a7c5e8f3a6"
+down_revision: Union[str, None] = "a1f6b4d7e295"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "chat_messages",
+        sa.Column("stream_metrics", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("chat_messages", "stream_metrics")
@@ -0,0 +1,45 @@
+"""Add token usage and cost columns
+
+Revision ID: c3b8d6f9a4b7
+Revises: b2a7c5e8f3a6
+Create Date: 2026-10-19 00:08:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "c3b8d6f9a4b7"
+down_revision: Union[str, None] = "b2a7c5e8f3a6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("chat_messages", sa.Column("prompt_tokens", sa.Integer(), nullable=True))
+    op.add_column("chat_messages", sa.Column("completion_tokens", sa.Integer(), nullable=True))
+    op.add_column("chat_messages", sa.Column("cached_tokens", sa.Integer(), nullable=True))
+    op.add_column("chat_messages", sa.Column("embedding_tokens", sa.Integer(), nullable=True))
+    op.add_column("chat_messages", sa.Column("cost_usd", sa.Numeric(12, 6), nullable=True))
+
+    op.add_column("image_messages", sa.Column("cached_tokens", sa.Integer(), nullable=True))
+    op.add_column("image_messages", sa.Column("cost_usd", sa.Numeric(12, 6), nullable=True))
+
+    op.add_column("pdfs", sa.Column("embedding_tokens", sa.Integer(), nullable=True))
+    op.add_column("pdfs", sa.Column("cost_usd", sa.Numeric(12, 6), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("pdfs", "cost_usd")
+    op.drop_column("pdfs", "embedding_tokens")
+
+    op.drop_column("image_messages", "cost_usd")
+    op.drop_column("image_messages", "cached_tokens")
+
+    op.drop_column("chat_messages", "cost_usd")
+    op.drop_column("chat_messages", "embedding_tokens")
+    op.drop_column("chat_messages", "cached_tokens")
+    op.drop_column("chat_messages", "completion_tokens")
+    op.drop_column("chat_messages", "prompt_tokens")
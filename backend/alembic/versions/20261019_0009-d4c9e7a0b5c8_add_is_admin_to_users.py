@@ -0,0 +1,28 @@
+"""Add is_admin flag to users
+
+Revision ID: d4c9e7a0b5c8
+Revises: c3b8d6f9a4b7
+Create Date: 2026-10-19 00:09:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "d4c9e7a0b5c8"
+down_revision: Union[str, None] = "c3b8d6f9a4b7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users",
+        sa.Column("is_admin", sa.Boolean(), server_default=sa.false(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "is_admin")
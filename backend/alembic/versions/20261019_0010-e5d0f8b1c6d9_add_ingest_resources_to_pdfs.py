@@ -0,0 +1,31 @@
+"""Add ingestion resource accounting columns to pdfs
+
+Revision ID: e5d0f8b1c6d9
+Revises: d4c9e7a0b5c8
+Create Date: 2026-10-19 00:10:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision: str = "e5d0f8b1c6d9"
+down_revision: Union[str, None] = "d4c9e7a0b5c8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("pdfs", sa.Column("peak_rss_bytes", sa.BigInteger(), nullable=True))
+    op.add_column(
+        "pdfs",
+        sa.Column("ingest_resources", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("pdfs", "ingest_resources")
+    op.drop_column("pdfs", "peak_rss_bytes")
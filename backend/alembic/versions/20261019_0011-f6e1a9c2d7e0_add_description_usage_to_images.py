@@ -0,0 +1,31 @@
+"""Add description usage and cost columns to images
+
+Revision ID: f6e1a9c2d7e0
+Revises: e5d0f8b1c6d9
+Create Date: 2026-10-19 00:11:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "f6e1a9c2d7e0"
+down_revision: Union[str, None] = "e5d0f8b1c6d9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("images", sa.Column("prompt_tokens", sa.Integer(), nullable=True))
+    op.add_column("images", sa.Column("completion_tokens", sa.Integer(), nullable=True))
+    op.add_column("images", sa.Column("cached_tokens", sa.Integer(), nullable=True))
+    op.add_column("images", sa.Column("cost_usd", sa.Numeric(12, 6), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("images", "cost_usd")
+    op.drop_column("images", "cached_tokens")
+    op.drop_column("images", "completion_tokens")
+    op.drop_column("images", "prompt_tokens")
@@ -1,3 +1,5 @@
+import time
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -5,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models.user import User
 from app.db.session import get_db
 from app.services import auth_service
+from app.services.user_cache import user_cache
 
 security = HTTPBearer()
 
@@ -23,8 +26,23 @@ async def get_current_user(
     if token_data is None or token_data.user_id is None:
         raise credentials_exception
 
+    # Served from the snapshot cache when possible so hot paths skip the users query
+    user = user_cache.get(token_data.user_id)
+    if user is not None:
+        return user
+
+    loaded_at = time.monotonic()
     user = await auth_service.get_user_by_id(db, token_data.user_id)
     if user is None or not user.is_active:
         raise credentials_exception
 
+    user_cache.set(user, loaded_at=loaded_at)
     return user
+
+
+async def get_current_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required"
+        )
+    return current_user
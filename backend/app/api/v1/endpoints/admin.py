@@ -0,0 +1,133 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
+
+from app.api.v1.deps import get_current_admin_user
+from app.db.models.user import User
+from app.schemas.admin import (
+    ProfileArmRequest,
+    ProfileResponse,
+    ProfileRuleResponse,
+    ProfilingStatusResponse,
+    SlowQueryFingerprintResponse,
+    SlowQueryLogResponse,
+    SlowQueryResponse,
+)
+from app.services.profiling_service import ProfileRecord, profiling_service
+from app.services.storage import storage
+from app.config import settings
+from app.utils.slow_queries import slow_query_log
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(dependencies=[Depends(get_current_admin_user)])
+
+
+def _profile_response(record: ProfileRecord) -> ProfileResponse:
+    return ProfileResponse(
+        id=record.id,
+        rule_id=record.rule_id,
+        target=record.target,
+        subject=record.subject,
+        mode=record.mode,
+        format="pstats" if record.mode == "cprofile" else "speedscope",
+        started_at=record.started_at,
+        duration_s=record.duration_s,
+        size_bytes=record.size_bytes,
+        truncated=record.truncated,
+        request_id=record.request_id,
+    )
+
+
+@router.post("/profiling/rules", response_model=ProfileRuleResponse, status_code=201)
+async def arm_profiling(
+    request: ProfileArmRequest,
+    current_user: User = Depends(get_current_admin_user),
+):
+    """
+    Profile the next N matching requests or ingestion runs
+
+    cprofile captures deterministic call statistics on the event-loop thread
+    (downloaded as pstats); sampling captures wall-clock stacks of every busy
+    thread (downloaded as speedscope JSON).
+    """
+    rule = profiling_service.arm(
+        target=request.target,
+        mode=request.mode,
+        count=request.count,
+        expires_in_s=request.expires_in_s,
+        created_by=current_user.email,
+        route_prefix=request.route_prefix,
+        pdf_id=str(request.pdf_id) if request.pdf_id else None,
+    )
+    return ProfileRuleResponse.model_validate(rule)
+
+
+@router.delete("/profiling/rules/{rule_id}", status_code=204)
+async def disarm_profiling(rule_id: str):
+    """Drop an armed profiling rule"""
+    if not profiling_service.disarm(rule_id):
+        raise HTTPException(status_code=404, detail="Profiling rule not found")
+    return Response(status_code=204)
+
+
+@router.get("/profiling", response_model=ProfilingStatusResponse)
+async def profiling_status():
+    """Armed rules and recently captured profiles (this worker only)"""
+    return ProfilingStatusResponse(
+        rules=[ProfileRuleResponse.model_validate(rule) for rule in profiling_service.rules()],
+        profiles=[_profile_response(record) for record in profiling_service.profiles()],
+    )
+
+
+@router.get("/profiling/profiles/{profile_id}")
+async def download_profile(profile_id: str):
+    """
+    Download a captured profile
+
+    pstats files load with pstats.Stats(path) or snakeviz; speedscope files
+    open in https://www.speedscope.app.
+    """
+    record = profiling_service.get_profile(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    try:
+        data = await storage.download_file_bytes(record.object_name)
+    except Exception as e:
+        logger.error(f"Error downloading profile {profile_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to download profile: {str(e)}")
+
+    filename = record.object_name.rsplit("/", 1)[-1]
+    return Response(
+        content=data,
+        media_type=record.content_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/slow-queries", response_model=SlowQueryLogResponse)
+async def slow_queries(limit: int = Query(50, ge=1, le=500)):
+    """
+    Recent slow statements and per-fingerprint counters (this worker only)
+
+    With SLOW_QUERY_EXPLAIN on, vector-search and list queries carry an
+    EXPLAIN (ANALYZE, BUFFERS) plan, captured at most once per fingerprint
+    per SLOW_QUERY_EXPLAIN_INTERVAL_S; the plan is filled in shortly after
+    the query is recorded.
+    """
+    return SlowQueryLogResponse(
+        threshold_ms=settings.slow_query_threshold_ms,
+        queries=[SlowQueryResponse.model_validate(q) for q in slow_query_log.entries(limit)],
+        fingerprints=[
+            SlowQueryFingerprintResponse(**stats) for stats in slow_query_log.fingerprints()
+        ],
+    )
+
+
+@router.delete("/slow-queries", status_code=204)
+async def clear_slow_queries():
+    """Reset the slow-query log and fingerprint counters"""
+    slow_query_log.clear()
+    return Response(status_code=204)
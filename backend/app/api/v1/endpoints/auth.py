@@ -131,7 +131,7 @@ async def change_password(
     db: AsyncSession = Depends(get_db),
 ):
     """Change authenticated user password"""
-    if not auth_service.verify_password(
+    if not await auth_service.verify_password(
         password_data.current_password, current_user.hashed_password
     ):
         raise HTTPException(
@@ -139,7 +139,7 @@ async def change_password(
             detail="Current password is incorrect",
         )
 
-    current_user.hashed_password = auth_service.hash_password(password_data.new_password)
+    current_user.hashed_password = await auth_service.hash_password(password_data.new_password)
     db.add(current_user)
     await db.flush()
 
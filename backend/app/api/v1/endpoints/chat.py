@@ -1,13 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+import asyncio
 import logging
-import json
+import time
+from typing import Optional
+
+import anyio
+
+from app.config import settings
 
 from app.db.session import get_db
-from app.db.models import ChatMessage as ChatMessageModel
+from app.db.models import ChatMessage as ChatMessageModel, PDFChunk
 from app.schemas.chat import (
+    ChunkBatchRequest,
+    ChunkBatchResponse,
+    ChunkDetail,
     ChatQueryRequest,
     ChatQueryResponse,
     ChatHistoryResponse,
@@ -16,6 +25,18 @@ from app.schemas.chat import (
 from app.services.chat_service import chat_service
 from app.services.llm_service import llm_service
 from app.services.vector_store import vector_store_service
+from app.utils.http_cache import compute_etag, etag_matches
+from app.utils.pagination import encode_cursor, fetch_history_page
+from app.utils.metrics import stream_cancellations, stream_tokens_saved
+from app.utils.streaming import (
+    ClientDisconnected,
+    FrameCoalescer,
+    StreamTelemetry,
+    iterate_until_disconnect,
+    sse_json,
+)
+from app.utils.timing import record_stage, timed, track_pipeline
+from app.utils.usage import track_usage
 
 logger = logging.getLogger(__name__)
 
@@ -25,22 +46,28 @@ router = APIRouter()
 @router.post("/query", response_model=ChatQueryResponse)
 async def chat_query(
     request: ChatQueryRequest,
+    response: Response,
     db: AsyncSession = Depends(get_db),
 ):
     """
     Send a chat message and get response using RAG
+
+    Stage durations are reported in the Server-Timing header.
     """
     try:
         # Convert chat history to dict format
         chat_history = [msg.model_dump() for msg in request.chat_history]
 
         # Process query using RAG
-        result = await chat_service.process_query(
-            db=db,
-            pdf_id=request.pdf_id,
-            query=request.message,
-            chat_history=chat_history,
-        )
+        with track_pipeline("chat_query") as timings:
+            result = await chat_service.process_query(
+                db=db,
+                pdf_id=request.pdf_id,
+                query=request.message,
+                chat_history=chat_history,
+                lean=request.lean,
+            )
+        response.headers["Server-Timing"] = timings.server_timing()
 
         return ChatQueryResponse(
             response=result["response"],
@@ -55,67 +82,147 @@ async def chat_query(
 @router.post("/stream")
 async def chat_stream(
     request: ChatQueryRequest,
+    http_request: Request,
     db: AsyncSession = Depends(get_db),
 ):
     """
     Streaming chat response using Server-Sent Events (SSE)
+
+    If the client disconnects mid-answer the upstream LLM stream is closed
+    and the partial answer is saved with finish_reason="cancelled".
+
+    The Server-Timing header covers the stages that run before the first
+    byte; LLM stages are recorded in the stage histograms only. Time to first
+    token, first byte and token throughput feed the chat_stream_* histograms
+    and, with CHAT_STREAM_RECORD_METRICS, the assistant message itself.
     """
+    telemetry = StreamTelemetry("chat")
     try:
         # Convert chat history to dict format
         chat_history = [msg.model_dump() for msg in request.chat_history]
 
-        # Retrieve similar chunks
-        similar_chunks = await vector_store_service.search_similar_chunks(
-            db=db,
-            pdf_id=request.pdf_id,
-            query=request.message,
-        )
+        with track_pipeline("chat_stream") as timings, track_usage() as usage:
+            # Retrieve similar chunks
+            similar_chunks = await vector_store_service.search_similar_chunks(
+                db=db,
+                pdf_id=request.pdf_id,
+                query=request.message,
+            )
 
-        logger.info(f"Retrieved {len(similar_chunks)} chunks for streaming query")
+            telemetry.mark_retrieval()
+            logger.info(f"Retrieved {len(similar_chunks)} chunks for streaming query")
 
-        # Save user message
-        await chat_service.save_chat_message(
-            db=db,
-            pdf_id=request.pdf_id,
-            role="user",
-            content=request.message,
-        )
+            # Save user message
+            with timed("save"):
+                await chat_service.save_chat_message(
+                    db=db,
+                    pdf_id=request.pdf_id,
+                    role="user",
+                    content=request.message,
+                )
 
         async def event_generator():
             """Generate SSE events"""
             full_response = ""
+            token_count = 0
+            cancelled = False
+            chunk_ids = [chunk["id"] for chunk in similar_chunks]
+            frames = FrameCoalescer(settings.sse_coalesce_interval_ms / 1000)
+            llm_start = time.perf_counter()
 
             try:
-                # Stream response from LLM
-                async for chunk in llm_service.generate_response_stream(
-                    query=request.message,
-                    context_chunks=similar_chunks,
-                    chat_history=chat_history,
+                # Stream response from LLM, stopping as soon as the client goes away
+                async for chunk in iterate_until_disconnect(
+                    http_request,
+                    llm_service.generate_response_stream(
+                        query=request.message,
+                        context_chunks=similar_chunks,
+                        chat_history=chat_history,
+                        usage=usage,
+                    ),
                 ):
+                    if token_count == 0:
+                        record_stage(
+                            "llm_first_token", time.perf_counter() - llm_start, "chat_stream"
+                        )
+                    telemetry.mark_token()
                     full_response += chunk
-                    # Send SSE event
-                    yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+                    token_count += 1
+                    # Send SSE event once enough text has accumulated
+                    frame = frames.add(chunk)
+                    if frame:
+                        yield f"data: {sse_json({'chunk': frame})}\n\n"
+                        # Resumed only after the ASGI server sent the frame
+                        telemetry.mark_byte_sent()
+
+                frame = frames.flush()
+                if frame:
+                    yield f"data: {sse_json({'chunk': frame})}\n\n"
+                    telemetry.mark_byte_sent()
+
+                record_stage("llm", time.perf_counter() - llm_start, "chat_stream")
+                stream_record = telemetry.finish()
 
                 # Save assistant message
-                chunk_ids = [chunk["id"] for chunk in similar_chunks]
-                await chat_service.save_chat_message(
-                    db=db,
-                    pdf_id=request.pdf_id,
-                    role="assistant",
-                    content=full_response,
-                    retrieved_chunk_ids=chunk_ids,
-                )
+                with timed("save", "chat_stream"):
+                    await chat_service.save_chat_message(
+                        db=db,
+                        pdf_id=request.pdf_id,
+                        role="assistant",
+                        content=full_response,
+                        retrieved_chunk_ids=chunk_ids,
+                        finish_reason="stop",
+                        usage=usage,
+                        stream_metrics=(
+                            stream_record if settings.chat_stream_record_metrics else None
+                        ),
+                    )
 
                 # Send done signal
-                yield f"data: {json.dumps({'done': True})}\n\n"
+                yield f"data: {sse_json({'done': True})}\n\n"
 
+            except ClientDisconnected:
+                cancelled = True
+            except (asyncio.CancelledError, GeneratorExit):
+                # Server cancelled the response task or the ASGI send failed
+                cancelled = True
+                raise
             except Exception as e:
                 logger.error(f"Error in streaming: {e}")
-                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                yield f"data: {sse_json({'error': str(e)})}\n\n"
+            finally:
+                if cancelled:
+                    # Each streamed chunk is roughly one completion token
+                    tokens_saved = max(settings.openai_max_tokens - token_count, 0)
+                    stream_cancellations.inc(endpoint="chat")
+                    stream_tokens_saved.inc(tokens_saved, endpoint="chat")
+                    logger.info(
+                        f"Client disconnected from stream for PDF {request.pdf_id} "
+                        f"after {token_count} tokens (up to {tokens_saved} saved)"
+                    )
+                    stream_record = telemetry.finish()
+                    # Shield the write so it survives the cancellation of this task
+                    with anyio.CancelScope(shield=True):
+                        try:
+                            await chat_service.save_chat_message(
+                                db=db,
+                                pdf_id=request.pdf_id,
+                                role="assistant",
+                                content=full_response,
+                                retrieved_chunk_ids=chunk_ids,
+                                finish_reason="cancelled",
+                                usage=usage,
+                                stream_metrics=(
+                                    stream_record if settings.chat_stream_record_metrics else None
+                                ),
+                            )
+                        except Exception as e:
+                            logger.error(f"Error saving partial answer: {e}")
 
         return StreamingResponse(
             event_generator(),
             media_type="text/event-stream",
+            headers={"Server-Timing": timings.server_timing()},
         )
 
     except Exception as e:
@@ -126,24 +233,42 @@ async def chat_stream(
 @router.get("/history/{pdf_id}", response_model=ChatHistoryResponse)
 async def get_chat_history(
     pdf_id: str,
-    limit: int = 50,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    if_none_match: Optional[str] = Header(default=None),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Get chat history for a PDF
+
+    Without cursors the latest `limit` messages are returned. Use `after`
+    (newest_cursor) to poll for new messages and `before` (oldest_cursor) to
+    page backwards. Unchanged pages return 304 when If-None-Match matches.
     """
     try:
-        # Query chat messages
-        result = await db.execute(
-            select(ChatMessageModel)
-            .where(ChatMessageModel.pdf_id == pdf_id)
-            .order_by(ChatMessageModel.created_at.desc())
-            .limit(limit)
+        stmt = select(
+            ChatMessageModel.id,
+            ChatMessageModel.role,
+            ChatMessageModel.content,
+            ChatMessageModel.created_at,
+        ).where(ChatMessageModel.pdf_id == pdf_id)
+        messages, has_more = await fetch_history_page(
+            db,
+            stmt,
+            ChatMessageModel.created_at,
+            ChatMessageModel.id,
+            limit=limit,
+            before=before,
+            after=after,
         )
-        messages = result.scalars().all()
 
-        # Reverse to get chronological order
-        messages = list(reversed(messages))
+        # Messages are immutable once written, so their ids identify the page
+        etag = compute_etag([pdf_id, before, after, limit, has_more, *(m.id for m in messages)])
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
 
         # Convert to schema
         chat_messages = [ChatMessage(role=msg.role, content=msg.content) for msg in messages]
@@ -152,8 +277,59 @@ async def get_chat_history(
             pdf_id=pdf_id,
             messages=chat_messages,
             total=len(chat_messages),
+            oldest_cursor=(
+                encode_cursor(messages[0].created_at, messages[0].id) if messages else before
+            ),
+            newest_cursor=(
+                encode_cursor(messages[-1].created_at, messages[-1].id) if messages else after
+            ),
+            has_more=has_more,
         )
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting chat history: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get chat history: {str(e)}")
+
+
+@router.post("/chunks", response_model=ChunkBatchResponse)
+async def get_chunks(
+    request: ChunkBatchRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Fetch full chunks by id (used to expand citations from lean responses)
+    """
+    try:
+        stmt = select(
+            PDFChunk.id,
+            PDFChunk.pdf_id,
+            PDFChunk.chunk_text,
+            PDFChunk.page_number,
+            PDFChunk.chunk_index,
+        ).where(PDFChunk.id.in_(request.chunk_ids))
+        if request.pdf_id:
+            stmt = stmt.where(PDFChunk.pdf_id == request.pdf_id)
+
+        result = await db.execute(stmt)
+        rows = {str(row.id): row for row in result.all()}
+
+        # Preserve the requested order; unknown ids are skipped
+        chunks = [
+            ChunkDetail(
+                chunk_id=chunk_id,
+                pdf_id=str(rows[chunk_id].pdf_id),
+                chunk_text=rows[chunk_id].chunk_text,
+                page_number=rows[chunk_id].page_number,
+                chunk_index=rows[chunk_id].chunk_index,
+            )
+            for chunk_id in dict.fromkeys(str(c) for c in request.chunk_ids)
+            if chunk_id in rows
+        ]
+
+        return ChunkBatchResponse(chunks=chunks)
+
+    except Exception as e:
+        logger.error(f"Error fetching chunks: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch chunks: {str(e)}")
@@ -1,10 +1,20 @@
+import asyncio
+import hashlib
 import logging
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Literal, Optional
 from uuid import uuid4
 
+import anyio
+import orjson
+from app.config import settings
 from app.db.models import Image, ImageMessage
-from app.db.session import get_db
+from app.db.session import AsyncSessionLocal, get_db
 from app.schemas.image import (
     DeleteImageResponse,
+    ImageBatchRequest,
+    ImageBatchResult,
     ImageChatHistoryResponse,
     ImageChatMessage,
     ImageChatRequest,
@@ -12,10 +22,34 @@ from app.schemas.image import (
     ImageListResponse,
     ImageStatusResponse,
 )
-from app.services.image_service import image_service
-from app.services.minio_service import minio_service
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
-from sqlalchemy import delete, select
+from app.services.image_service import image_service, message_usage
+from app.services.storage import StorageBusyError, storage
+from app.utils.http_cache import compute_etag, etag_matches
+from app.utils.image_utils import SNIFF_LENGTH, sniff_image_type
+from app.utils.multipart_stream import MultipartFileStream, MultipartStreamError
+from app.utils.metrics import stream_cancellations, stream_tokens_saved
+from app.utils.pagination import apply_keyset, count_rows, encode_cursor, fetch_history_page
+from app.utils.streaming import (
+    ClientDisconnected,
+    FrameCoalescer,
+    iterate_until_disconnect,
+    sse_json,
+)
+from app.utils.timing import record_stage, track_pipeline
+from app.utils.tracing import trace_context
+from app.utils.usage import TokenUsage
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = logging.getLogger(__name__)
@@ -23,54 +57,230 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10 MB
-ALLOWED_CONTENT_TYPES = {"image/png", "image/jpeg", "image/jpg", "image/webp"}
-ALLOWED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp"}
+# Multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+MIME_TO_EXT = {"image/png": ".png", "image/jpeg": ".jpg", "image/webp": ".webp"}
+
+# Columns needed by ImageStatusResponse
+IMAGE_LIST_COLUMNS = (
+    Image.id,
+    Image.filename,
+    Image.status,
+    Image.file_size,
+    Image.created_at,
+    Image.updated_at,
+    Image.error_message,
+    Image.description_status,
+)
 
 
-@router.post("/upload", response_model=ImageStatusResponse)
+async def _warm_image_payload(minio_key: str) -> None:
+    try:
+        await image_service.get_image_payload(minio_key)
+    except Exception as e:
+        logger.warning(f"Failed to prepare image payload for {minio_key}: {e}")
+
+
+class _ImageUploadScanner:
+    """
+    Pass an upload's chunks through while sniffing, size-capping and hashing them
+
+    start() reads just enough to identify the image type; chunks() then
+    yields everything (including what start() read), raising 413 as soon as
+    the running size crosses MAX_IMAGE_SIZE.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks.__aiter__()
+        self._head = b""
+        self._digest = hashlib.sha256()
+        self.size = 0
+
+    async def start(self) -> str:
+        """Read the leading bytes and return the sniffed MIME type"""
+        async for chunk in self._chunks:
+            self._head += chunk
+            if len(self._head) >= SNIFF_LENGTH:
+                break
+        if not self._head:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty")
+        content_type = sniff_image_type(self._head[:SNIFF_LENGTH])
+        if content_type is None:
+            raise HTTPException(
+                status_code=400, detail="Only image files are supported (PNG, JPEG, WEBP)"
+            )
+        return content_type
+
+    def _account(self, chunk: bytes) -> bytes:
+        self.size += len(chunk)
+        if self.size > MAX_IMAGE_SIZE:
+            raise HTTPException(status_code=413, detail="Image too large (max 10 MB)")
+        self._digest.update(chunk)
+        return chunk
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        head, self._head = self._head, b""
+        yield self._account(head)
+        async for chunk in self._chunks:
+            yield self._account(chunk)
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+async def _discard_object(minio_key: str) -> None:
+    try:
+        await storage.delete_file(minio_key)
+    except Exception as e:
+        logger.warning(f"Failed to delete unused upload {minio_key}: {e}")
+
+
+async def _lock_content(db: AsyncSession, content_hash: str) -> None:
+    """Serialize uploads and deletes of identical content until the transaction ends"""
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(content_hash))))
+
+
+@router.post(
+    "/upload",
+    response_model=ImageStatusResponse,
+    # The body is parsed by hand (see below); describe it for the OpenAPI docs
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file"],
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                    }
+                }
+            },
+        }
+    },
+)
 async def upload_image(
-    file: UploadFile = File(...),
+    request: Request,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
 ):
-    content_type = file.content_type or ""
-    filename = file.filename or ""
-    ext = "." + filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
-
-    if content_type not in ALLOWED_CONTENT_TYPES and ext not in ALLOWED_EXTENSIONS:
-        raise HTTPException(
-            status_code=400,
-            detail="Only image files are supported (PNG, JPEG, WEBP)",
-        )
-
-    data = await file.read()
-
-    if len(data) > MAX_IMAGE_SIZE:
+    """
+    Upload an image (multipart/form-data, field "file")
+
+    The multipart body is parsed as it arrives rather than spooled first:
+    each chunk of the file is sniffed, size-checked, hashed and forwarded to
+    object storage in one pass. Requests whose Content-Length already
+    exceeds the cap are rejected before the body is read, and a body that
+    crosses the cap while streaming is aborted at that point.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        if not content_length.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid Content-Length")
+        if int(content_length) > MAX_IMAGE_SIZE + MULTIPART_OVERHEAD:
+            raise HTTPException(status_code=413, detail="Image too large (max 10 MB)")
+
+    upload = MultipartFileStream(request, "file")
+    scanner = _ImageUploadScanner(upload.chunks())
+    try:
+        content_type = await scanner.start()
+    except MultipartStreamError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    ext = MIME_TO_EXT[content_type]
+    filename = upload.filename or ""
+
+    # Stored under a fresh key while hashing; dropped below if the bytes turn
+    # out to duplicate an existing image
+    image_id = uuid4()
+    upload_key = f"images/{image_id}{ext}"
+    # A failed or rejected stream leaves nothing behind (partial files and
+    # multipart uploads are removed by the storage backend)
+    try:
+        await storage.upload_stream(upload_key, scanner.chunks(), content_type)
+    except MultipartStreamError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StorageBusyError:
         raise HTTPException(
-            status_code=400,
-            detail="Image too large (max 10 MB)",
+            status_code=503,
+            detail="Too many uploads in progress, please retry",
+            headers={"Retry-After": "1"},
         )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error uploading image: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to upload image: {str(e)}")
+    size, content_hash = scanner.size, scanner.hexdigest()
 
-    if len(data) == 0:
-        raise HTTPException(status_code=400, detail="Uploaded file is empty")
-
+    # Until a committed row points at the new object, it is removed on the way out
+    upload_referenced = False
     try:
-        image_id = uuid4()
-        minio_key = f"images/{image_id}{ext or '.png'}"
-
-        minio_service.upload_bytes(minio_key, data, content_type or "image/png")
-
-        image = Image(
-            id=image_id,
-            filename=filename or f"image{ext or '.png'}",
-            minio_key=minio_key,
-            file_size=len(data),
-            status="ready",
+        # Held until commit so a concurrent delete cannot drop a shared object
+        await _lock_content(db, content_hash)
+        result = await db.execute(
+            select(Image)
+            .where(Image.content_hash == content_hash, Image.status == "ready")
+            .limit(1)
         )
+        original = result.scalar_one_or_none()
+
+        if original:
+            # Identical bytes already stored: share the object and its description
+            minio_key = original.minio_key
+            image = Image(
+                id=image_id,
+                filename=filename or f"image{ext}",
+                minio_key=minio_key,
+                file_size=size,
+                content_hash=content_hash,
+                status="ready",
+                description=original.description,
+                extracted_text=original.extracted_text,
+                description_status=original.description_status,
+            )
+        else:
+            minio_key = upload_key
+            image = Image(
+                id=image_id,
+                filename=filename or f"image{ext}",
+                minio_key=minio_key,
+                file_size=size,
+                content_hash=content_hash,
+                status="ready",
+                description_status="pending",
+            )
+
         db.add(image)
         await db.commit()
+        upload_referenced = minio_key == upload_key
         await db.refresh(image)
 
-        logger.info(f"Uploaded image: {image_id}")
+        if original:
+            logger.info(f"Deduplicated image {image_id} onto {minio_key}")
+        else:
+            # Build the vision-ready derivative after responding
+            background_tasks.add_task(_warm_image_payload, minio_key)
+
+        if image.description_status != "ready":
+            # Describe the image in the background so follow-ups can be answered from text
+            try:
+                import inngest
+                from app.inngest.client import inngest_client
+
+                await inngest_client.send(
+                    inngest.Event(
+                        name="image/describe",
+                        data={
+                            "image_id": str(image_id),
+                            "minio_key": minio_key,
+                            "trace": trace_context(),
+                        },
+                    )
+                )
+            except Exception as e:
+                logger.warning(f"Failed to trigger description job for image {image_id}: {e}")
+
+        logger.info(f"Uploaded image: {image_id} ({size} bytes, sha256 {content_hash[:12]})")
         return ImageStatusResponse.model_validate(image)
 
     except HTTPException:
@@ -78,27 +288,37 @@ async def upload_image(
     except Exception as e:
         logger.error(f"Error uploading image: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to upload image: {str(e)}")
+    finally:
+        if not upload_referenced:
+            await _discard_object(upload_key)
 
 
 @router.get("/list", response_model=ImageListResponse)
 async def list_images(
-    skip: int = 0,
-    limit: int = 50,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    count: Literal["exact", "estimated", "none"] = "exact",
     db: AsyncSession = Depends(get_db),
 ):
     try:
-        count_result = await db.execute(select(Image))
-        total = len(count_result.scalars().all())
+        total = await count_rows(db, Image, count)
 
-        result = await db.execute(
-            select(Image).order_by(Image.created_at.desc()).offset(skip).limit(limit)
-        )
-        images = result.scalars().all()
+        stmt = apply_keyset(select(*IMAGE_LIST_COLUMNS), Image.created_at, Image.id, cursor)
+        result = await db.execute(stmt.limit(limit + 1))
+        rows = result.all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
 
         return ImageListResponse(
-            images=[ImageStatusResponse.model_validate(img) for img in images],
+            images=[ImageStatusResponse.model_validate(row) for row in rows],
             total=total,
+            next_cursor=next_cursor,
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing images: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to list images: {str(e)}")
@@ -107,8 +327,14 @@ async def list_images(
 @router.post("/chat/query", response_model=ImageChatResponse)
 async def image_chat_query(
     request: ImageChatRequest,
+    response: Response,
     db: AsyncSession = Depends(get_db),
 ):
+    """
+    Ask a question about an image
+
+    Stage durations are reported in the Server-Timing header.
+    """
     try:
         result = await db.execute(select(Image).where(Image.id == request.image_id))
         image = result.scalar_one_or_none()
@@ -121,19 +347,32 @@ async def image_chat_query(
 
         history = [msg.model_dump() for msg in (request.chat_history or [])]
 
-        response_text = await image_service.analyze_image(
-            minio_key=image.minio_key,
-            query=request.message,
-            chat_history=history,
-        )
+        with track_pipeline("image_chat") as timings:
+            answer = await image_service.answer_question(
+                image=image,
+                query=request.message,
+                chat_history=history,
+            )
+        response.headers["Server-Timing"] = timings.server_timing()
 
         user_msg = ImageMessage(image_id=image.id, role="user", content=request.message)
         db.add(user_msg)
-        assistant_msg = ImageMessage(image_id=image.id, role="assistant", content=response_text)
+        assistant_msg = ImageMessage(
+            image_id=image.id,
+            role="assistant",
+            content=answer["response"],
+            answer_path=answer["answer_path"],
+            latency_ms=answer["latency_ms"],
+            prompt_tokens=answer["prompt_tokens"],
+            completion_tokens=answer["completion_tokens"],
+            cached_tokens=answer["cached_tokens"],
+            cost_usd=answer["cost_usd"],
+            finish_reason="stop",
+        )
         db.add(assistant_msg)
         await db.commit()
 
-        return ImageChatResponse(response=response_text)
+        return ImageChatResponse(response=answer["response"], answer_path=answer["answer_path"])
 
     except HTTPException:
         raise
@@ -142,26 +381,249 @@ async def image_chat_query(
         raise HTTPException(status_code=500, detail=f"Failed to process query: {str(e)}")
 
 
+@router.post("/chat/stream")
+async def image_chat_stream(
+    request: ImageChatRequest,
+    http_request: Request,
+):
+    """
+    Streaming image chat response using Server-Sent Events (SSE)
+
+    No database session is held while the answer streams: the image row is
+    loaded up front and both messages are written in a fresh session once the
+    stream finishes. If the client disconnects mid-answer the upstream stream
+    is closed and the partial answer is saved with finish_reason="cancelled".
+    """
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Image).where(Image.id == request.image_id))
+            image = result.scalar_one_or_none()
+
+        if not image:
+            raise HTTPException(status_code=404, detail="Image not found")
+
+        if image.status != "ready":
+            raise HTTPException(status_code=400, detail="Image is not ready")
+
+        history = [msg.model_dump() for msg in (request.chat_history or [])]
+        asked_at = datetime.now(timezone.utc)
+
+        async def save_turn(content: str, usage: Dict, latency_ms: int, finish_reason: str):
+            async with AsyncSessionLocal() as db:
+                db.add(
+                    ImageMessage(
+                        image_id=image.id,
+                        role="user",
+                        content=request.message,
+                        created_at=asked_at,
+                    )
+                )
+                db.add(
+                    ImageMessage(
+                        image_id=image.id,
+                        role="assistant",
+                        content=content,
+                        answer_path=usage.get("answer_path"),
+                        latency_ms=latency_ms,
+                        **message_usage(usage.get("tokens") or TokenUsage()),
+                        finish_reason=finish_reason,
+                        created_at=datetime.now(timezone.utc),
+                    )
+                )
+                await db.commit()
+
+        async def event_generator():
+            """Generate SSE events"""
+            full_response = ""
+            token_count = 0
+            cancelled = False
+            usage: Dict = {}
+            frames = FrameCoalescer(settings.sse_coalesce_interval_ms / 1000)
+            start = time.perf_counter()
+
+            try:
+                async for chunk in iterate_until_disconnect(
+                    http_request,
+                    image_service.answer_question_stream(
+                        image=image,
+                        query=request.message,
+                        chat_history=history,
+                        usage=usage,
+                    ),
+                ):
+                    if token_count == 0:
+                        record_stage("llm_first_token", time.perf_counter() - start, "image_stream")
+                    full_response += chunk
+                    token_count += 1
+                    frame = frames.add(chunk)
+                    if frame:
+                        yield f"data: {sse_json({'chunk': frame})}\n\n"
+
+                frame = frames.flush()
+                if frame:
+                    yield f"data: {sse_json({'chunk': frame})}\n\n"
+                record_stage("llm", time.perf_counter() - start, "image_stream")
+
+                await save_turn(
+                    full_response, usage, int((time.perf_counter() - start) * 1000), "stop"
+                )
+
+                yield f"data: {sse_json({'done': True, 'answer_path': usage.get('answer_path')})}\n\n"
+
+            except ClientDisconnected:
+                cancelled = True
+            except (asyncio.CancelledError, GeneratorExit):
+                cancelled = True
+                raise
+            except Exception as e:
+                logger.error(f"Error in image chat streaming: {e}")
+                yield f"data: {sse_json({'error': str(e)})}\n\n"
+            finally:
+                if cancelled:
+                    tokens_saved = max(settings.openai_max_tokens - token_count, 0)
+                    stream_cancellations.inc(endpoint="image_chat")
+                    stream_tokens_saved.inc(tokens_saved, endpoint="image_chat")
+                    logger.info(
+                        f"Client disconnected from stream for image {image.id} "
+                        f"after {token_count} tokens (up to {tokens_saved} saved)"
+                    )
+                    with anyio.CancelScope(shield=True):
+                        try:
+                            await save_turn(
+                                full_response,
+                                usage,
+                                int((time.perf_counter() - start) * 1000),
+                                "cancelled",
+                            )
+                        except Exception as e:
+                            logger.error(f"Error saving partial image answer: {e}")
+
+        return StreamingResponse(
+            event_generator(),
+            media_type="text/event-stream",
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error setting up image chat streaming: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to stream response: {str(e)}")
+
+
+@router.post("/batch/query")
+async def image_batch_query(
+    request: ImageBatchRequest,
+    http_request: Request,
+):
+    """
+    Ask one or more questions about many images
+
+    Results stream back as NDJSON, one ImageBatchResult per (image, question)
+    in completion order. Unknown or unready images and failed vision calls
+    produce an error line instead of failing the batch.
+    """
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Image).where(Image.id.in_(request.image_ids)))
+            images = {image.id: image for image in result.scalars()}
+
+        ready = []
+        errors = []
+        for image_id in dict.fromkeys(request.image_ids):
+            image = images.get(image_id)
+            if image is not None and image.status == "ready":
+                ready.append(image)
+                continue
+            error = "Image not found" if image is None else "Image is not ready"
+            errors.extend(
+                ImageBatchResult(image_id=image_id, question_index=index, error=error)
+                for index in range(len(request.questions))
+            )
+
+        async def results():
+            for item in errors:
+                yield item
+            batch = image_service.answer_batch(ready, request.questions)
+            try:
+                async for image, index, answer in batch:
+                    if isinstance(answer, Exception):
+                        yield ImageBatchResult(
+                            image_id=image.id, question_index=index, error=str(answer)
+                        )
+                    else:
+                        yield ImageBatchResult(
+                            image_id=image.id,
+                            question_index=index,
+                            response=answer["response"],
+                            answer_path=answer["answer_path"],
+                            latency_ms=answer["latency_ms"],
+                        )
+            finally:
+                # Cancels vision calls still in flight
+                await batch.aclose()
+
+        async def ndjson_generator():
+            completed = 0
+            try:
+                async for item in iterate_until_disconnect(http_request, results()):
+                    completed += 1
+                    yield orjson.dumps(item.model_dump(mode="json")) + b"\n"
+            except ClientDisconnected:
+                logger.info(f"Client disconnected from image batch after {completed} results")
+
+        return StreamingResponse(ndjson_generator(), media_type="application/x-ndjson")
+
+    except Exception as e:
+        logger.error(f"Error setting up image batch query: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to run batch query: {str(e)}")
+
+
 @router.get("/chat/history/{image_id}", response_model=ImageChatHistoryResponse)
 async def get_image_chat_history(
     image_id: str,
-    limit: int = 50,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    if_none_match: Optional[str] = Header(default=None),
     db: AsyncSession = Depends(get_db),
 ):
     try:
-        result = await db.execute(
-            select(ImageMessage)
-            .where(ImageMessage.image_id == image_id)
-            .order_by(ImageMessage.created_at.desc())
-            .limit(limit)
+        stmt = select(
+            ImageMessage.id,
+            ImageMessage.role,
+            ImageMessage.content,
+            ImageMessage.created_at,
+        ).where(ImageMessage.image_id == image_id)
+        messages, has_more = await fetch_history_page(
+            db,
+            stmt,
+            ImageMessage.created_at,
+            ImageMessage.id,
+            limit=limit,
+            before=before,
+            after=after,
         )
-        messages = list(reversed(result.scalars().all()))
+
+        etag = compute_etag([image_id, before, after, limit, has_more, *(m.id for m in messages)])
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
 
         return ImageChatHistoryResponse(
             image_id=image_id,
             messages=[ImageChatMessage(role=m.role, content=m.content) for m in messages],
             total=len(messages),
+            oldest_cursor=(
+                encode_cursor(messages[0].created_at, messages[0].id) if messages else before
+            ),
+            newest_cursor=(
+                encode_cursor(messages[-1].created_at, messages[-1].id) if messages else after
+            ),
+            has_more=has_more,
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting image chat history: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get history: {str(e)}")
@@ -199,15 +661,35 @@ async def delete_image(
         if not image:
             raise HTTPException(status_code=404, detail="Image not found")
 
-        if image.minio_key:
-            try:
-                minio_service.delete_file(image.minio_key)
-            except Exception as e:
-                logger.warning(f"Failed to delete image from MinIO: {e}")
+        # The storage object may be shared by deduplicated uploads; only the
+        # last reference deletes it
+        remaining = 0
+        if image.content_hash:
+            await _lock_content(db, image.content_hash)
+            remaining = await db.scalar(
+                select(func.count())
+                .select_from(Image)
+                .where(
+                    Image.minio_key == image.minio_key,
+                    Image.content_hash == image.content_hash,
+                    Image.id != image.id,
+                )
+            )
 
         await db.execute(delete(Image).where(Image.id == image_id))
         await db.commit()
 
+        if image.minio_key and not remaining:
+            try:
+                await storage.delete_file(image.minio_key)
+            except Exception as e:
+                logger.warning(f"Failed to delete image from MinIO: {e}")
+            await image_service.delete_image_payload(image.minio_key)
+            if image.content_hash:
+                image_service.answer_cache.evict_image(image.content_hash)
+        elif remaining:
+            logger.info(f"Kept {image.minio_key}: still referenced by {remaining} image(s)")
+
         logger.info(f"Deleted image: {image_id}")
         return DeleteImageResponse(message="Image deleted successfully", image_id=image_id)
 
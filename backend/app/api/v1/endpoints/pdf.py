@@ -1,4 +1,5 @@
 import logging
+from typing import Literal, Optional
 from uuid import uuid4
 
 from app.config import settings
@@ -8,11 +9,14 @@ from app.schemas.pdf import (
     DeletePDFResponse,
     InitUploadRequest,
     InitUploadResponse,
+    PDFIngestResources,
     PDFListResponse,
     PDFStatusResponse,
 )
-from app.services.minio_service import minio_service
-from fastapi import APIRouter, Depends, HTTPException, Request
+from app.services.storage import storage
+from app.utils.pagination import apply_keyset, count_rows, encode_cursor
+from app.utils.tracing import trace_context
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -20,6 +24,19 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Columns needed by PDFStatusResponse (avoids loading full ORM entities for lists)
+PDF_LIST_COLUMNS = (
+    PDF.id,
+    PDF.filename,
+    PDF.status,
+    PDF.file_size,
+    PDF.total_pages,
+    PDF.word_count,
+    PDF.created_at,
+    PDF.updated_at,
+    PDF.error_message,
+)
+
 
 @router.post("/init-upload", response_model=InitUploadResponse)
 async def initialize_upload(
@@ -123,7 +140,11 @@ async def handle_upload_complete(
         await inngest_client.send(
             inngest.Event(
                 name="pdf/process",
-                data={"pdf_id": str(pdf_id_str), "minio_key": minio_key},
+                data={
+                    "pdf_id": str(pdf_id_str),
+                    "minio_key": minio_key,
+                    "trace": trace_context(),
+                },
             )
         )
 
@@ -140,30 +161,37 @@ async def handle_upload_complete(
 
 @router.get("/list", response_model=PDFListResponse)
 async def list_pdfs(
-    skip: int = 0,
-    limit: int = 50,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    count: Literal["exact", "estimated", "none"] = "exact",
     db: AsyncSession = Depends(get_db),
 ):
     """
-    List all PDFs with their status
+    List all PDFs with their status, newest first
+
+    Pass the returned next_cursor back as cursor to fetch the following page.
     """
     try:
-        # Get total count
-        count_result = await db.execute(select(PDF))
-        all_pdfs = count_result.scalars().all()
-        total = len(all_pdfs)
-
-        # Get paginated results
-        result = await db.execute(
-            select(PDF).order_by(PDF.created_at.desc()).offset(skip).limit(limit)
-        )
-        pdfs = result.scalars().all()
+        total = await count_rows(db, PDF, count)
+
+        # Keyset pagination on (created_at, id); fetch one extra row to detect a next page
+        stmt = apply_keyset(select(*PDF_LIST_COLUMNS), PDF.created_at, PDF.id, cursor)
+        result = await db.execute(stmt.limit(limit + 1))
+        rows = result.all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
 
         return PDFListResponse(
-            pdfs=[PDFStatusResponse.model_validate(pdf) for pdf in pdfs],
+            pdfs=[PDFStatusResponse.model_validate(row) for row in rows],
             total=total,
+            next_cursor=next_cursor,
         )
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing PDFs: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to list PDFs: {str(e)}")
@@ -193,6 +221,31 @@ async def get_pdf_details(
         raise HTTPException(status_code=500, detail=f"Failed to get PDF: {str(e)}")
 
 
+@router.get("/{pdf_id}/resources", response_model=PDFIngestResources)
+async def get_pdf_ingest_resources(
+    pdf_id: str,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Per-stage resource usage (wall/CPU time, peak RSS, top allocations) of
+    the PDF's latest ingestion run
+    """
+    try:
+        result = await db.execute(select(PDF).where(PDF.id == pdf_id))
+        pdf = result.scalar_one_or_none()
+
+        if not pdf:
+            raise HTTPException(status_code=404, detail="PDF not found")
+
+        return PDFIngestResources.from_pdf(pdf)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting PDF ingestion resources: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get PDF: {str(e)}")
+
+
 @router.get("/{pdf_id}/status", response_model=PDFStatusResponse)
 async def get_pdf_status(
     pdf_id: str,
@@ -223,7 +276,7 @@ async def delete_pdf(
         # Delete from MinIO
         if pdf.minio_key:
             try:
-                minio_service.delete_file(pdf.minio_key)
+                await storage.delete_file(pdf.minio_key)
                 logger.info(f"Deleted file from MinIO: {pdf.minio_key}")
             except Exception as e:
                 logger.warning(f"Failed to delete from MinIO: {e}")
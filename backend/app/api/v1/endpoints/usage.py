@@ -0,0 +1,255 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import Date, cast, func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import PDF, ChatMessage, Image, ImageMessage
+from app.db.session import get_db
+from app.schemas.pdf import PDFIngestResources
+from app.schemas.usage import (
+    DailyUsage,
+    DailyUsageResponse,
+    IngestionResourcesResponse,
+    PDFUsage,
+    PDFUsageResponse,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _total(column):
+    return func.coalesce(func.sum(column), 0)
+
+
+def _utc_day(column):
+    # Literal zone so the SELECT and GROUP BY expressions compile identically
+    return cast(func.timezone(literal_column("'UTC'"), column), Date)
+
+
+@router.get("/pdfs", response_model=PDFUsageResponse)
+async def usage_by_pdf(
+    limit: int = Query(50, ge=1, le=200),
+    since: Optional[date] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    PDFs ranked by total model spend (ingestion plus chat turns)
+
+    since restricts the chat turns counted to those on or after that UTC day.
+    """
+    try:
+        chat_stmt = select(
+            ChatMessage.pdf_id.label("pdf_id"),
+            func.count().label("messages"),
+            _total(ChatMessage.prompt_tokens).label("prompt_tokens"),
+            _total(ChatMessage.completion_tokens).label("completion_tokens"),
+            _total(ChatMessage.cached_tokens).label("cached_tokens"),
+            _total(ChatMessage.embedding_tokens).label("embedding_tokens"),
+            _total(ChatMessage.cost_usd).label("cost_usd"),
+        ).where(ChatMessage.role == "assistant")
+        if since is not None:
+            chat_stmt = chat_stmt.where(
+                ChatMessage.created_at >= datetime.combine(since, time.min, tzinfo=timezone.utc)
+            )
+        chat = chat_stmt.group_by(ChatMessage.pdf_id).subquery()
+
+        chat_cost = func.coalesce(chat.c.cost_usd, 0)
+        ingestion_cost = func.coalesce(PDF.cost_usd, 0)
+        stmt = (
+            select(
+                PDF.id,
+                PDF.filename,
+                func.coalesce(chat.c.messages, 0).label("messages"),
+                func.coalesce(chat.c.prompt_tokens, 0).label("prompt_tokens"),
+                func.coalesce(chat.c.completion_tokens, 0).label("completion_tokens"),
+                func.coalesce(chat.c.cached_tokens, 0).label("cached_tokens"),
+                func.coalesce(chat.c.embedding_tokens, 0).label("chat_embedding_tokens"),
+                func.coalesce(PDF.embedding_tokens, 0).label("ingestion_embedding_tokens"),
+                chat_cost.label("chat_cost_usd"),
+                ingestion_cost.label("ingestion_cost_usd"),
+                (chat_cost + ingestion_cost).label("total_cost_usd"),
+            )
+            .outerjoin(chat, chat.c.pdf_id == PDF.id)
+            .order_by((chat_cost + ingestion_cost).desc(), PDF.created_at.desc())
+            .limit(limit)
+        )
+        rows = (await db.execute(stmt)).all()
+
+        return PDFUsageResponse(
+            pdfs=[
+                PDFUsage(
+                    pdf_id=row.id,
+                    filename=row.filename,
+                    messages=row.messages,
+                    prompt_tokens=row.prompt_tokens,
+                    completion_tokens=row.completion_tokens,
+                    cached_tokens=row.cached_tokens,
+                    chat_embedding_tokens=row.chat_embedding_tokens,
+                    ingestion_embedding_tokens=row.ingestion_embedding_tokens,
+                    chat_cost_usd=float(row.chat_cost_usd),
+                    ingestion_cost_usd=float(row.ingestion_cost_usd),
+                    total_cost_usd=float(row.total_cost_usd),
+                )
+                for row in rows
+            ],
+            since=since,
+        )
+    except Exception as e:
+        logger.error(f"Error aggregating usage by PDF: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get usage: {str(e)}")
+
+
+@router.get("/daily", response_model=DailyUsageResponse)
+async def usage_by_day(
+    days: int = Query(30, ge=1, le=366),
+    db: AsyncSession = Depends(get_db),
+):
+    """Model usage per UTC day over the last N days, newest first"""
+    try:
+        start = datetime.combine(
+            datetime.now(timezone.utc).date() - timedelta(days=days - 1),
+            time.min,
+            tzinfo=timezone.utc,
+        )
+        totals: Dict[date, Dict] = defaultdict(
+            lambda: {
+                "chat_messages": 0,
+                "image_messages": 0,
+                "images_described": 0,
+                "documents_ingested": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cached_tokens": 0,
+                "embedding_tokens": 0,
+                "cost_usd": 0.0,
+            }
+        )
+
+        chat_day = _utc_day(ChatMessage.created_at)
+        chat_rows = await db.execute(
+            select(
+                chat_day.label("day"),
+                func.count().label("messages"),
+                _total(ChatMessage.prompt_tokens).label("prompt_tokens"),
+                _total(ChatMessage.completion_tokens).label("completion_tokens"),
+                _total(ChatMessage.cached_tokens).label("cached_tokens"),
+                _total(ChatMessage.embedding_tokens).label("embedding_tokens"),
+                _total(ChatMessage.cost_usd).label("cost_usd"),
+            )
+            .where(ChatMessage.role == "assistant", ChatMessage.created_at >= start)
+            .group_by(chat_day)
+        )
+        for row in chat_rows:
+            day = totals[row.day]
+            day["chat_messages"] += row.messages
+            day["prompt_tokens"] += row.prompt_tokens
+            day["completion_tokens"] += row.completion_tokens
+            day["cached_tokens"] += row.cached_tokens
+            day["embedding_tokens"] += row.embedding_tokens
+            day["cost_usd"] += float(row.cost_usd)
+
+        image_day = _utc_day(ImageMessage.created_at)
+        image_rows = await db.execute(
+            select(
+                image_day.label("day"),
+                func.count().label("messages"),
+                _total(ImageMessage.prompt_tokens).label("prompt_tokens"),
+                _total(ImageMessage.completion_tokens).label("completion_tokens"),
+                _total(ImageMessage.cached_tokens).label("cached_tokens"),
+                _total(ImageMessage.cost_usd).label("cost_usd"),
+            )
+            .where(ImageMessage.role == "assistant", ImageMessage.created_at >= start)
+            .group_by(image_day)
+        )
+        for row in image_rows:
+            day = totals[row.day]
+            day["image_messages"] += row.messages
+            day["prompt_tokens"] += row.prompt_tokens
+            day["completion_tokens"] += row.completion_tokens
+            day["cached_tokens"] += row.cached_tokens
+            day["cost_usd"] += float(row.cost_usd)
+
+        # Description calls are charged to the day the image was uploaded
+        described_day = _utc_day(Image.created_at)
+        described_rows = await db.execute(
+            select(
+                described_day.label("day"),
+                func.count().label("images"),
+                _total(Image.prompt_tokens).label("prompt_tokens"),
+                _total(Image.completion_tokens).label("completion_tokens"),
+                _total(Image.cached_tokens).label("cached_tokens"),
+                _total(Image.cost_usd).label("cost_usd"),
+            )
+            .where(Image.created_at >= start, Image.cost_usd.is_not(None))
+            .group_by(described_day)
+        )
+        for row in described_rows:
+            day = totals[row.day]
+            day["images_described"] += row.images
+            day["prompt_tokens"] += row.prompt_tokens
+            day["completion_tokens"] += row.completion_tokens
+            day["cached_tokens"] += row.cached_tokens
+            day["cost_usd"] += float(row.cost_usd)
+
+        pdf_day = _utc_day(PDF.created_at)
+        pdf_rows = await db.execute(
+            select(
+                pdf_day.label("day"),
+                func.count().label("documents"),
+                _total(PDF.embedding_tokens).label("embedding_tokens"),
+                _total(PDF.cost_usd).label("cost_usd"),
+            )
+            .where(PDF.created_at >= start, PDF.status == "completed")
+            .group_by(pdf_day)
+        )
+        for row in pdf_rows:
+            day = totals[row.day]
+            day["documents_ingested"] += row.documents
+            day["embedding_tokens"] += row.embedding_tokens
+            day["cost_usd"] += float(row.cost_usd)
+
+        daily = [
+            DailyUsage(date=day, **{**values, "cost_usd": round(values["cost_usd"], 6)})
+            for day, values in sorted(totals.items(), reverse=True)
+        ]
+        return DailyUsageResponse(
+            days=daily,
+            total_cost_usd=round(sum(d.cost_usd for d in daily), 6),
+        )
+    except Exception as e:
+        logger.error(f"Error aggregating daily usage: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get usage: {str(e)}")
+
+
+@router.get("/ingestion", response_model=IngestionResourcesResponse)
+async def ingestion_resources(
+    limit: int = Query(20, ge=1, le=200),
+    min_peak_rss_mb: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    PDFs whose ingestion used the most memory, heaviest first
+
+    Includes runs that never finished (running_stage is set when a worker
+    died mid-stage), so documents behind OOM kills show up here.
+    """
+    try:
+        stmt = (
+            select(PDF)
+            .where(PDF.peak_rss_bytes.is_not(None))
+            .order_by(PDF.peak_rss_bytes.desc())
+            .limit(limit)
+        )
+        if min_peak_rss_mb:
+            stmt = stmt.where(PDF.peak_rss_bytes >= min_peak_rss_mb * 1024 * 1024)
+        pdfs = (await db.execute(stmt)).scalars().all()
+        return IngestionResourcesResponse(pdfs=[PDFIngestResources.from_pdf(pdf) for pdf in pdfs])
+    except Exception as e:
+        logger.error(f"Error listing ingestion resources: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get usage: {str(e)}")
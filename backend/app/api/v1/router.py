@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import auth, chat, health, image, pdf
+from app.api.v1.endpoints import admin, auth, chat, health, image, pdf, usage
 
 # Create main API router
 api_router = APIRouter()
@@ -11,3 +11,5 @@ api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(pdf.router, prefix="/pdf", tags=["pdf"])
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
 api_router.include_router(image.router, prefix="/image", tags=["image"])
+api_router.include_router(usage.router, prefix="/usage", tags=["usage"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
@@ -1,5 +1,5 @@
 import json
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -36,10 +36,27 @@ class Settings(BaseSettings):
 
     # OpenAI
     openai_api_key: str
+    openai_base_url: Optional[str] = None  # e.g. the offline stand-in (benchmarks.openai_standin)
     openai_model: str = "gpt-4o-mini"
     openai_embedding_model: str = "text-embedding-3-small"
     openai_temperature: float = 1.0
     openai_max_tokens: int = 1000
+    # USD per 1M tokens, used for cost accounting (JSON object in the environment)
+    openai_prices: Dict[str, Dict[str, float]] = {
+        "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+        "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+        "text-embedding-3-small": {"input": 0.02},
+        "text-embedding-3-large": {"input": 0.13},
+    }
+
+    # Vision (image chat)
+    vision_detail: str = "high"  # "high", "low" or "auto"
+    image_payload_cache_size: int = 256  # Ready-to-send data URLs kept in memory
+    image_payload_cache_max_bytes: int = 256 * 1024 * 1024
+    image_text_followups: bool = True  # Answer follow-ups from the stored description
+    image_answer_cache_size: int = 1024  # Answers cached by (image hash, question, history)
+    image_batch_concurrency: int = 8  # Concurrent vision calls per batch request
+    image_batch_prefetch_concurrency: int = 16  # Concurrent payload fetches per batch request
 
     # Inngest (keys are optional for dev server)
     inngest_event_key: Optional[str] = None
@@ -53,6 +70,16 @@ class Settings(BaseSettings):
     minio_secret_key: str
     minio_bucket: str = "pdfs"
     minio_secure: bool = False
+    minio_part_size: int = 16 * 1024 * 1024  # Multipart/ranged transfer part size (min 5 MiB)
+    minio_parallelism: int = 4  # Concurrent parts per upload or download
+
+    # Object storage backend: "minio" or "local" (filesystem, for tests and benchmarks)
+    storage_backend: str = "minio"
+    storage_local_root: str = "/tmp/chatpdf-storage"
+    storage_max_workers: int = 16
+    # Concurrent streamed image uploads; each holds a thread while the client sends the body
+    storage_stream_upload_workers: int = 8
+    ingest_spool_dir: Optional[str] = None  # Temp dir for ingestion downloads (default: system)
 
     # Tusd
     tusd_endpoint: str  # Internal Docker URL for webhooks
@@ -63,6 +90,14 @@ class Settings(BaseSettings):
     secret_key: str = "dev-secret-key-please-change-in-production-use-32-chars"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 43200  # 30 days
+    user_cache_ttl_seconds: int = 60  # 0 disables the authenticated-user cache
+    user_cache_max_size: int = 10000
+    token_cache_size: int = 4096
+
+    # Password hashing (bcrypt runs on a dedicated thread pool)
+    password_hash_workers: int = 4
+    password_hash_max_pending: int = 64
+    password_hash_timeout_seconds: float = 10.0
 
     # SMTP Email (optional — if not set, reset links are logged to console)
     smtp_host: Optional[str] = None
@@ -82,6 +117,40 @@ class Settings(BaseSettings):
     similarity_threshold: float = 0.7
     max_chat_history: int = 5
 
+    # Observability
+    metrics_enabled: bool = True  # Serve Prometheus metrics on /metrics
+    tracing_enabled: bool = False  # Record spans (request ids are always assigned)
+    tracing_sample_rate: float = 1.0  # Fraction of requests/jobs whose spans are recorded
+    tracing_exporter: str = "file"  # "file" (JSON lines) or "otlp" (OTLP/HTTP JSON)
+    tracing_file_path: str = "traces.jsonl"
+    tracing_otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    tracing_service_name: str = "chatpdf-backend"
+    tracing_export_interval_ms: int = 1000  # Max delay before queued spans are exported
+    loop_monitor_enabled: bool = False  # Measure event-loop lag and report blocking calls
+    loop_monitor_interval_ms: int = 50  # Heartbeat period
+    loop_monitor_threshold_ms: int = 100  # Lag above which the blocking stack is reported
+    loop_monitor_report_interval_s: float = 30.0  # Min gap between logged slow-callback reports
+
+    # Profiling (armed on demand by admins)
+    profiling_max_capture_seconds: float = 30.0  # Captures are cut off after this long
+    profiling_max_duty_cycle: float = 0.1  # Max fraction of the last 5 minutes spent profiling
+    profiling_sample_interval_ms: int = 5  # Stack sampler period
+
+    # Ingestion resource accounting
+    ingest_rss_sample_interval_ms: int = 20  # RSS sampling period during process_pdf
+    ingest_tracemalloc_sample_rate: float = 0.05  # Fraction of runs traced with tracemalloc
+
+    # Slow-query log
+    slow_query_enabled: bool = True
+    slow_query_threshold_ms: int = 250  # Statements at least this slow are recorded
+    slow_query_buffer_size: int = 200  # Recent slow queries kept per process
+    slow_query_explain: bool = False  # Re-run slow vector-search/list queries under EXPLAIN ANALYZE
+    slow_query_explain_interval_s: float = 300.0  # Min gap between plans for one fingerprint
+
+    # Streaming
+    sse_coalesce_interval_ms: int = 40  # Min gap between SSE frames after the first token
+    chat_stream_record_metrics: bool = False  # Store stream telemetry on chat_messages
+
     model_config = SettingsConfigDict(
         env_file=".env", env_file_encoding="utf-8", case_sensitive=False, extra="ignore"
     )
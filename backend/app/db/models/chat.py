@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Index, ARRAY
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Integer, Numeric, Text, DateTime, ForeignKey, Index, ARRAY
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.sql import func
 import uuid
 
@@ -16,6 +16,16 @@ class ChatMessage(Base):
     role = Column(String(20), nullable=False)  # 'user' or 'assistant'
     content = Column(Text, nullable=False)
     retrieved_chunk_ids = Column(ARRAY(UUID(as_uuid=True)), nullable=True)  # For citations
+    # 'stop' for complete answers, 'cancelled' when the client disconnected mid-stream
+    finish_reason = Column(String(20), nullable=True)
+    # Streamed answers: TTFT, first byte, tokens/s and inter-token gap percentiles
+    stream_metrics = Column(JSONB, nullable=True)
+    # Assistant turns: model usage of the whole turn (query embedding included)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    cached_tokens = Column(Integer, nullable=True)
+    embedding_tokens = Column(Integer, nullable=True)
+    cost_usd = Column(Numeric(12, 6), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     # Index for efficient queries
@@ -1,4 +1,14 @@
-from sqlalchemy import Column, String, BigInteger, Text, DateTime, ForeignKey, Index
+from sqlalchemy import (
+    Column,
+    String,
+    BigInteger,
+    Integer,
+    Numeric,
+    Text,
+    DateTime,
+    ForeignKey,
+    Index,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -13,13 +23,28 @@ class Image(Base):
     filename = Column(String(255), nullable=False)
     minio_key = Column(String(500), nullable=False)
     file_size = Column(BigInteger, nullable=False)
+    content_hash = Column(String(64), nullable=True)  # sha256 of the original bytes
     status = Column(String(20), nullable=False, default="ready")
     error_message = Column(Text, nullable=True)
+    # Filled by the image/describe job; used for text-only follow-up answers
+    description = Column(Text, nullable=True)
+    extracted_text = Column(Text, nullable=True)
+    description_status = Column(String(20), nullable=True)  # pending, ready, failed
+    # Description usage (the image/describe vision call; unset on deduplicated copies)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    cached_tokens = Column(Integer, nullable=True)
+    cost_usd = Column(Numeric(12, 6), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
     )
 
+    __table_args__ = (
+        Index("idx_images_created_at_id", "created_at", "id"),
+        Index("idx_images_content_hash", "content_hash"),
+    )
+
     def __repr__(self):
         return f"<Image {self.filename} (status={self.status})>"
 
@@ -33,6 +58,14 @@ class ImageMessage(Base):
     )
     role = Column(String(20), nullable=False)
     content = Column(Text, nullable=False)
+    # Assistant turns only: how the answer was produced and what it cost
+    answer_path = Column(String(20), nullable=True)  # text, vision, escalated, cached
+    latency_ms = Column(Integer, nullable=True)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    cached_tokens = Column(Integer, nullable=True)
+    cost_usd = Column(Numeric(12, 6), nullable=True)
+    finish_reason = Column(String(20), nullable=True)  # stop, cancelled
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     __table_args__ = (Index("idx_image_messages_image_id_created_at", "image_id", "created_at"),)
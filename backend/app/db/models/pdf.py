@@ -1,5 +1,15 @@
-from sqlalchemy import Column, String, BigInteger, Integer, Text, DateTime, ForeignKey, Index
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (
+    Column,
+    String,
+    BigInteger,
+    Integer,
+    Numeric,
+    Text,
+    DateTime,
+    ForeignKey,
+    Index,
+)
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.sql import func
 from pgvector.sqlalchemy import Vector
 import uuid
@@ -25,11 +35,20 @@ class PDF(Base):
         # pending, processing, completed, failed
     )
     error_message = Column(Text, nullable=True)
+    # Ingestion usage (chunk embeddings)
+    embedding_tokens = Column(Integer, nullable=True)
+    cost_usd = Column(Numeric(12, 6), nullable=True)
+    # Ingestion resource accounting (per-stage wall/CPU time, RSS, allocations)
+    peak_rss_bytes = Column(BigInteger, nullable=True)
+    ingest_resources = Column(JSONB, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
     )
 
+    # Supports keyset pagination on (created_at, id)
+    __table_args__ = (Index("idx_pdfs_created_at_id", "created_at", "id"),)
+
     def __repr__(self):
         return f"<PDF {self.filename} (status={self.status})>"
 
@@ -1,5 +1,7 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from app.config import settings
+from app.utils.slow_queries import slow_query_log
+from app.utils.tracing import instrument_engine
 
 # Create async engine
 engine = create_async_engine(
@@ -9,6 +11,8 @@ engine = create_async_engine(
     pool_size=settings.db_pool_size,
     max_overflow=10,
 )
+instrument_engine(engine)
+slow_query_log.instrument(engine)
 
 # Create async session factory
 AsyncSessionLocal = async_sessionmaker(
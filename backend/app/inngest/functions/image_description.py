@@ -0,0 +1,78 @@
+import logging
+
+import inngest
+from sqlalchemy import select
+
+from app.db.models import Image
+from app.db.session import AsyncSessionLocal
+from app.inngest.client import inngest_client
+from app.services.image_service import image_service
+from app.utils.timing import track_pipeline
+from app.utils.tracing import continue_trace, traced
+from app.utils.usage import track_usage
+
+logger = logging.getLogger(__name__)
+
+
+@inngest_client.create_function(
+    fn_id="image-describe",
+    trigger=inngest.TriggerEvent(event="image/describe"),
+)
+async def describe_image(ctx, step):
+    """
+    Background job to describe an uploaded image:
+    1. Ask the vision model for a structured description and text transcription
+    2. Store both on the image row so follow-up questions can skip the image
+    """
+    image_id = ctx.event.data.get("image_id")
+    minio_key = ctx.event.data.get("minio_key")
+
+    with continue_trace(ctx.event.data.get("trace"), "inngest image-describe", image_id=image_id):
+        logger.info(f"Starting image description for {image_id}")
+
+        try:
+
+            @traced("step describe-and-store")
+            async def describe_and_store():
+                with track_pipeline("image_describe"), track_usage() as usage:
+                    result = await image_service.describe_image(minio_key)
+
+                async with AsyncSessionLocal() as db:
+                    row = await db.execute(select(Image).where(Image.id == image_id))
+                    image = row.scalar_one_or_none()
+                    if image:
+                        image.description = result["description"]
+                        image.extracted_text = result["text"]
+                        image.description_status = "ready"
+                        image.prompt_tokens = usage.prompt_tokens
+                        image.completion_tokens = usage.completion_tokens
+                        image.cached_tokens = usage.cached_tokens
+                        image.cost_usd = round(usage.cost_usd, 6)
+                        await db.commit()
+
+                columns = usage.columns()
+                columns.pop("embedding_tokens")
+                return columns
+
+            usage = await step.run("describe-and-store", describe_and_store)
+
+            logger.info(
+                f"Image description completed for {image_id}: "
+                f"{usage['prompt_tokens']} prompt / {usage['completion_tokens']} completion "
+                f"tokens, ${usage['cost_usd']:.6f}"
+            )
+
+        except Exception as exc:
+            logger.error(f"Error describing image {image_id}: {exc}")
+
+            @traced("step update-status-failed")
+            async def update_status_failed():
+                async with AsyncSessionLocal() as db:
+                    row = await db.execute(select(Image).where(Image.id == image_id))
+                    image = row.scalar_one_or_none()
+                    if image:
+                        image.description_status = "failed"
+                        await db.commit()
+
+            await step.run("update-status-failed", update_status_failed)
+            raise
@@ -1,15 +1,25 @@
+import asyncio
+import functools
 import logging
+import random
+from typing import Dict
 
 import inngest
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 from app.inngest.client import inngest_client
-from app.services.minio_service import minio_service
+from app.services.profiling_service import profiling_service
+from app.services.storage import storage
 from app.services.embeddings import embedding_service
-from app.utils.pdf_utils import extract_text_from_pdf_bytes
+from app.utils.pdf_utils import extract_text_from_pdf
 from app.utils.text_splitter import text_splitter
+from app.utils.resources import ResourceTracker
+from app.utils.slow_queries import slow_query_log
+from app.utils.timing import track_pipeline
+from app.utils.tracing import continue_trace, instrument_engine, traced
+from app.utils.usage import track_usage
 from app.db.models import PDF, PDFChunk
 from app.config import settings
 
@@ -17,115 +27,182 @@ logger = logging.getLogger(__name__)
 
 # Create async database engine for Inngest functions
 engine = create_async_engine(settings.database_url)
+instrument_engine(engine)
+slow_query_log.instrument(engine)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
-@inngest_client.create_function(
-    fn_id="pdf-process",
-    trigger=inngest.TriggerEvent(event="pdf/process"),
-)
-async def process_pdf(ctx, step):
+async def save_ingest_resources(pdf_id: str, report: Dict) -> None:
     """
-    Background job to process PDF:
-    1. Update status to processing
-    2. Download from MinIO, extract text, chunk, generate embeddings, and store
+    Store an ingestion resource report on the PDF row (best effort)
 
-    Note: Steps 2-5 are combined into one step to avoid Inngest's output size limits
-    when passing large extracted text data between steps.
+    Also written when each stage begins, so a worker killed for running out
+    of memory leaves the stage it was in on the row.
     """
-    pdf_id = ctx.event.data.get("pdf_id")
-    minio_key = ctx.event.data.get("minio_key")
-
-    logger.info(f"Starting PDF processing for {pdf_id}")
-
     try:
-        # Step 1: Update status to processing
-        async def update_status_processing():
-            async with AsyncSessionLocal() as db:
-                result = await db.execute(select(PDF).where(PDF.id == pdf_id))
-                pdf = result.scalar_one_or_none()
-                if pdf:
-                    pdf.status = "processing"
-                    await db.commit()
-                    logger.info(f"Updated PDF status to processing: {pdf_id}")
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(PDF)
+                .where(PDF.id == pdf_id)
+                .values(ingest_resources=report, peak_rss_bytes=report["peak_rss_bytes"])
+            )
+            await db.commit()
+    except Exception as e:
+        logger.warning(f"Failed to save ingestion resources for PDF {pdf_id}: {e}")
+
+
+async def ingest_pdf(pdf_id: str, minio_key: str) -> Dict:
+    """
+    Download, parse, chunk, embed and store a PDF, and mark it completed
 
-        await step.run("update-status-processing", update_status_processing)
+    The body of the process-and-store step; also driven directly by the
+    ingestion benchmark (benchmarks/ingestion.py).
 
-        # Step 2: Process PDF (extract, chunk, embed, store)
-        # Combined into one step to avoid passing large data between steps
-        async def process_and_store():
-            # Download PDF bytes from MinIO
-            pdf_bytes = minio_service.download_file_bytes(minio_key)
-            logger.info(f"Downloaded PDF bytes from {minio_key}")
+    Args:
+        pdf_id: PDF row to fill in
+        minio_key: Object key of the uploaded PDF
 
-            # Extract text from bytes
-            extracted_data = extract_text_from_pdf_bytes(pdf_bytes)
+    Returns:
+        Dict with total_pages and total_chunks
+    """
+    resources = ResourceTracker(
+        sample_interval=settings.ingest_rss_sample_interval_ms / 1000,
+        trace_allocations=random.random() < settings.ingest_tracemalloc_sample_rate,
+        checkpoint=functools.partial(save_ingest_resources, pdf_id),
+    )
+    try:
+        with track_pipeline("pdf_ingest"), resources:
+            # Stream the PDF to a temp file and parse from a path-backed Blob,
+            # so the whole document is never held in memory as bytes
+            await resources.begin("download")
+            async with storage.spooled_download(minio_key, suffix=".pdf") as pdf_path:
+                resources.end()
+                logger.info(f"Downloaded PDF from {minio_key} to {pdf_path}")
+
+                # Parsing is CPU-bound; keep it off the event loop
+                async with resources.stage("parse"):
+                    extracted_data = await asyncio.to_thread(extract_text_from_pdf, pdf_path)
             logger.info(f"Extracted {extracted_data['total_pages']} pages from PDF {pdf_id}")
 
             # Calculate word count from all pages
-            full_text = " ".join(page["text"] for page in extracted_data["pages"])
-            word_count = len(full_text.split())
+            word_count = sum(len(page["text"].split()) for page in extracted_data["pages"])
             logger.info(f"Calculated word count: {word_count} words")
 
             # Chunk text
-            chunks = text_splitter.split_pages(extracted_data["pages"])
+            async with resources.stage("chunk"):
+                chunks = text_splitter.split_pages(extracted_data["pages"])
             logger.info(f"Created {len(chunks)} chunks from PDF {pdf_id}")
 
             # Generate embeddings
             chunk_texts = [chunk["chunk_text"] for chunk in chunks]
-            embeddings = await embedding_service.generate_embeddings_batch(chunk_texts)
+            async with resources.stage("embed"):
+                with track_usage() as usage:
+                    embeddings = await embedding_service.generate_embeddings_batch(chunk_texts)
             logger.info(f"Generated {len(embeddings)} embeddings for PDF {pdf_id}")
 
             # Store chunks and embeddings in database
-            async with AsyncSessionLocal() as db:
-                # Create PDFChunk records
-                chunk_records = []
-                for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                    chunk_record = PDFChunk(
-                        pdf_id=pdf_id,
-                        chunk_text=chunk["chunk_text"],
-                        page_number=chunk["page_number"],
-                        chunk_index=chunk["chunk_index"],
-                        embedding=embedding,
-                    )
-                    chunk_records.append(chunk_record)
-
-                db.add_all(chunk_records)
-
-                # Update PDF with total pages, word count, and status
-                result = await db.execute(select(PDF).where(PDF.id == pdf_id))
-                pdf = result.scalar_one_or_none()
-                if pdf:
-                    pdf.total_pages = extracted_data["total_pages"]
-                    pdf.word_count = word_count
-                    pdf.status = "completed"
-
-                await db.commit()
-                logger.info(f"Stored {len(chunk_records)} chunks for PDF {pdf_id}")
-
-            return {"total_pages": extracted_data["total_pages"], "total_chunks": len(chunks)}
-
-        result = await step.run("process-and-store", process_and_store)
-
-        logger.info(
-            f"PDF processing completed successfully for {pdf_id}: "
-            f"{result['total_pages']} pages, {result['total_chunks']} chunks"
-        )
-
-    except Exception as exc:
-        # Update status to failed
-        logger.error(f"Error processing PDF {pdf_id}: {exc}")
-        error_msg = str(exc)
-
-        async def update_status_failed():
-            async with AsyncSessionLocal() as db:
-                result = await db.execute(select(PDF).where(PDF.id == pdf_id))
-                pdf = result.scalar_one_or_none()
-                if pdf:
-                    pdf.status = "failed"
-                    pdf.error_message = error_msg
+            async with resources.stage("store"):
+                async with AsyncSessionLocal() as db:
+                    # Create PDFChunk records
+                    chunk_records = []
+                    for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+                        chunk_record = PDFChunk(
+                            pdf_id=pdf_id,
+                            chunk_text=chunk["chunk_text"],
+                            page_number=chunk["page_number"],
+                            chunk_index=chunk["chunk_index"],
+                            embedding=embedding,
+                        )
+                        chunk_records.append(chunk_record)
+
+                    db.add_all(chunk_records)
+
+                    # Update PDF with total pages, word count, and status
+                    result = await db.execute(select(PDF).where(PDF.id == pdf_id))
+                    pdf = result.scalar_one_or_none()
+                    if pdf:
+                        pdf.total_pages = extracted_data["total_pages"]
+                        pdf.word_count = word_count
+                        pdf.status = "completed"
+                        pdf.embedding_tokens = usage.embedding_tokens
+                        pdf.cost_usd = round(usage.cost_usd, 6)
+
                     await db.commit()
-                    logger.info(f"Updated PDF status to failed: {pdf_id}")
+                    logger.info(f"Stored {len(chunk_records)} chunks for PDF {pdf_id}")
+    finally:
+        # Success or failure, keep the final per-stage report on the row
+        await save_ingest_resources(pdf_id, resources.report())
+
+    return {
+        "total_pages": extracted_data["total_pages"],
+        "total_chunks": len(chunks),
+    }
+
+
+@inngest_client.create_function(
+    fn_id="pdf-process",
+    trigger=inngest.TriggerEvent(event="pdf/process"),
+)
+async def process_pdf(ctx, step):
+    """
+    Background job to process PDF:
+    1. Update status to processing
+    2. Download from MinIO, extract text, chunk, generate embeddings, and store
+
+    Note: Steps 2-5 are combined into one step to avoid Inngest's output size limits
+    when passing large extracted text data between steps.
+    """
+    pdf_id = ctx.event.data.get("pdf_id")
+    minio_key = ctx.event.data.get("minio_key")
 
-        await step.run("update-status-failed", update_status_failed)
-        raise
+    with continue_trace(ctx.event.data.get("trace"), "inngest pdf-process", pdf_id=pdf_id):
+        logger.info(f"Starting PDF processing for {pdf_id}")
+
+        try:
+            # Step 1: Update status to processing
+            @traced("step update-status-processing")
+            async def update_status_processing():
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(select(PDF).where(PDF.id == pdf_id))
+                    pdf = result.scalar_one_or_none()
+                    if pdf:
+                        pdf.status = "processing"
+                        await db.commit()
+                        logger.info(f"Updated PDF status to processing: {pdf_id}")
+
+            await step.run("update-status-processing", update_status_processing)
+
+            # Step 2: Process PDF (extract, chunk, embed, store)
+            # Combined into one step to avoid passing large data between steps
+            @traced("step process-and-store")
+            async def process_and_store():
+                return await ingest_pdf(pdf_id, minio_key)
+
+            result = await step.run(
+                "process-and-store",
+                profiling_service.wrap("pdf_ingest", str(pdf_id), process_and_store),
+            )
+
+            logger.info(
+                f"PDF processing completed successfully for {pdf_id}: "
+                f"{result['total_pages']} pages, {result['total_chunks']} chunks"
+            )
+
+        except Exception as exc:
+            # Update status to failed
+            logger.error(f"Error processing PDF {pdf_id}: {exc}")
+            error_msg = str(exc)
+
+            @traced("step update-status-failed")
+            async def update_status_failed():
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(select(PDF).where(PDF.id == pdf_id))
+                    pdf = result.scalar_one_or_none()
+                    if pdf:
+                        pdf.status = "failed"
+                        pdf.error_message = error_msg
+                        await db.commit()
+                        logger.info(f"Updated PDF status to failed: {pdf_id}")
+
+            await step.run("update-status-failed", update_status_failed)
+            raise
@@ -8,15 +8,24 @@ from alembic.config import Config
 from app.api.v1.router import api_router
 from app.config import settings
 from app.inngest.client import inngest_client
+from app.inngest.functions.image_description import describe_image
 from app.inngest.functions.pdf_processing import process_pdf
-from fastapi import FastAPI
+from app.services.password_hasher import PasswordHasherBusyError, password_hasher
+from app.services.profiling_service import ProfilingMiddleware
+from app.utils.loop_monitor import loop_monitor
+from app.utils.metrics import metrics
+from app.utils.tracing import RequestIdLogFilter, TracingMiddleware, shutdown_tracing
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 
 # Configure logging
 logging.basicConfig(
     level=getattr(logging, settings.log_level),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    format="%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] - %(message)s",
 )
+for handler in logging.getLogger().handlers:
+    handler.addFilter(RequestIdLogFilter())
 logger = logging.getLogger(__name__)
 
 
@@ -26,6 +35,8 @@ def run_migrations() -> None:
         os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini"
     )
     alembic_cfg = Config(alembic_ini)
+    # Keep the app's handlers (request-id filter and format); env.py would replace them
+    alembic_cfg.attributes["configure_logger"] = False
     logger.info("Running database migrations...")
     command.upgrade(alembic_cfg, "head")
     logger.info("Database migrations complete.")
@@ -41,6 +52,9 @@ async def lifespan(app: FastAPI):
 
     run_migrations()
 
+    if settings.loop_monitor_enabled:
+        loop_monitor.start()
+
     # TODO: Initialize MinIO client
     # TODO: Initialize Inngest client
 
@@ -48,6 +62,9 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     logger.info("Shutting down...")
+    await loop_monitor.stop()
+    password_hasher.shutdown()
+    shutdown_tracing()
     # TODO: Close database connections
     # TODO: Close other connections
 
@@ -59,6 +76,7 @@ app = FastAPI(
     version="0.1.0",
     lifespan=lifespan,
     debug=settings.debug,
+    default_response_class=ORJSONResponse,
 )
 
 # Configure CORS
@@ -70,13 +88,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-ID"],
 )
+app.add_middleware(ProfilingMiddleware)
+# Added last so it wraps CORS: every response, preflights included, carries a request id
+app.add_middleware(TracingMiddleware)
+
+
+@app.exception_handler(PasswordHasherBusyError)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusyError):
+    """Shed auth load instead of queueing unboundedly behind bcrypt"""
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": "Authentication is temporarily busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
 
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
 
 # Serve Inngest functions
-inngest.fast_api.serve(app, inngest_client, [process_pdf])
+inngest.fast_api.serve(app, inngest_client, [process_pdf, describe_image])
 
 
 @app.get("/")
@@ -89,3 +122,13 @@ async def root():
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "app": settings.app_name, "environment": settings.environment}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint (counters and stage latency histograms)"""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(
+        metrics.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
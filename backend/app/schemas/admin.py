@@ -0,0 +1,90 @@
+from datetime import datetime
+from typing import Any, Literal, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field, model_validator
+
+
+class ProfileArmRequest(BaseModel):
+    """Profile the next runs of a route (requests) or of a PDF's ingestion"""
+
+    target: Literal["request", "pdf_ingest"]
+    mode: Literal["cprofile", "sampling"] = "sampling"
+    route_prefix: Optional[str] = Field(None, description="Request path prefix, e.g. /api/v1/chat")
+    pdf_id: Optional[UUID] = Field(None, description="PDF whose ingestion to profile")
+    count: int = Field(1, ge=1, le=20)
+    expires_in_s: int = Field(900, ge=10, le=86400)
+
+    @model_validator(mode="after")
+    def check_matcher(self):
+        if self.target == "request" and self.pdf_id is not None:
+            raise ValueError("pdf_id only applies to pdf_ingest profiling")
+        if self.target == "pdf_ingest" and self.route_prefix is not None:
+            raise ValueError("route_prefix only applies to request profiling")
+        return self
+
+
+class ProfileRuleResponse(BaseModel):
+    id: str
+    target: str
+    mode: str
+    route_prefix: Optional[str] = None
+    pdf_id: Optional[str] = None
+    remaining: int
+    expires_at: datetime
+    created_by: str
+    profile_ids: list[str]
+
+    model_config = {"from_attributes": True}
+
+
+class ProfileResponse(BaseModel):
+    id: str
+    rule_id: str
+    target: str
+    subject: str
+    mode: str
+    format: str  # "pstats" or "speedscope"
+    started_at: datetime
+    duration_s: float
+    size_bytes: int
+    truncated: bool  # Cut off at the capture time limit
+    request_id: Optional[str] = None
+
+
+class ProfilingStatusResponse(BaseModel):
+    rules: list[ProfileRuleResponse]
+    profiles: list[ProfileResponse]
+
+
+class SlowQueryResponse(BaseModel):
+    id: str
+    fingerprint: str
+    kind: str  # "vector_search", "list", or the statement verb
+    statement: str  # Normalised: literals and parameters replaced with ?
+    duration_ms: float
+    parameters: dict[str, Any]  # Parameter types and sizes only
+    rowcount: Optional[int] = None
+    occurred_at: datetime
+    request_id: Optional[str] = None
+    explain: Optional[Any] = None  # EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) output
+    explain_error: Optional[str] = None
+
+    model_config = {"from_attributes": True}
+
+
+class SlowQueryFingerprintResponse(BaseModel):
+    fingerprint: str
+    kind: str
+    statement: str
+    count: int
+    total_ms: float
+    avg_ms: float
+    max_ms: float
+    last_seen: Optional[datetime] = None
+
+
+class SlowQueryLogResponse(BaseModel):
+    threshold_ms: int
+    queries: list[SlowQueryResponse]
+    fingerprints: list[SlowQueryFingerprintResponse]
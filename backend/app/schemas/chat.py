@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, Union
 from uuid import UUID
 
 
@@ -18,28 +18,78 @@ class ChatQueryRequest(BaseModel):
     chat_history: Optional[list[ChatMessage]] = Field(
         default=[], description="Previous chat messages for context"
     )
+    lean: bool = Field(
+        default=False,
+        description="Return chunk ids and highlighted snippets instead of full chunk text",
+    )
 
 
 class RetrievedChunk(BaseModel):
     """Retrieved text chunk with metadata"""
 
+    chunk_id: Optional[str] = None
     chunk_text: str
     page_number: Optional[int] = None
     similarity_score: float
 
 
+class LeanRetrievedChunk(BaseModel):
+    """Retrieved chunk reference with a short highlighted snippet"""
+
+    chunk_id: str
+    page_number: Optional[int] = None
+    similarity_score: float
+    snippet: str = Field(..., description="Short excerpt of the chunk around the query terms")
+    snippet_offset: int = Field(..., description="Start of the snippet within the chunk text")
+    highlights: list[list[int]] = Field(
+        default=[], description="[start, end] offsets of matched terms within the snippet"
+    )
+
+
 class ChatQueryResponse(BaseModel):
     """Response to chat query"""
 
     response: str = Field(..., description="Assistant's response")
-    retrieved_chunks: Optional[list[RetrievedChunk]] = Field(
+    retrieved_chunks: Optional[list[Union[RetrievedChunk, LeanRetrievedChunk]]] = Field(
         default=[], description="Source chunks used for the response"
     )
 
 
+class ChunkBatchRequest(BaseModel):
+    """Request to fetch full chunks by id"""
+
+    chunk_ids: list[UUID] = Field(..., min_length=1, max_length=100)
+    pdf_id: Optional[UUID] = Field(default=None, description="Restrict results to this PDF")
+
+
+class ChunkDetail(BaseModel):
+    """Full text chunk"""
+
+    chunk_id: str
+    pdf_id: str
+    chunk_text: str
+    page_number: Optional[int] = None
+    chunk_index: int
+
+
+class ChunkBatchResponse(BaseModel):
+    """Chunks fetched by id"""
+
+    chunks: list[ChunkDetail]
+
+
 class ChatHistoryResponse(BaseModel):
     """Chat history for a PDF"""
 
     pdf_id: UUID
     messages: list[ChatMessage]
     total: int
+    oldest_cursor: Optional[str] = Field(
+        default=None, description="Pass as 'before' to page further back"
+    )
+    newest_cursor: Optional[str] = Field(
+        default=None, description="Pass as 'after' to fetch only newer messages"
+    )
+    has_more: bool = Field(
+        default=False, description="More messages exist in the requested direction"
+    )
@@ -12,6 +12,7 @@ class ImageStatusResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     error_message: Optional[str] = None
+    description_status: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -20,7 +21,8 @@ class ImageStatusResponse(BaseModel):
 
 class ImageListResponse(BaseModel):
     images: list[ImageStatusResponse]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 class DeleteImageResponse(BaseModel):
@@ -41,9 +43,31 @@ class ImageChatRequest(BaseModel):
 
 class ImageChatResponse(BaseModel):
     response: str
+    answer_path: Optional[str] = None  # "text", "vision", "escalated" or "cached"
+
+
+class ImageBatchRequest(BaseModel):
+    """Ask one or more questions about many images"""
+
+    image_ids: list[UUID] = Field(..., min_length=1, max_length=100)
+    questions: list[str] = Field(..., min_length=1, max_length=10)
+
+
+class ImageBatchResult(BaseModel):
+    """One NDJSON line of a batch response (error is set instead of response on failure)"""
+
+    image_id: UUID
+    question_index: int
+    response: Optional[str] = None
+    answer_path: Optional[str] = None
+    latency_ms: Optional[int] = None
+    error: Optional[str] = None
 
 
 class ImageChatHistoryResponse(BaseModel):
     image_id: UUID
     messages: list[ImageChatMessage]
     total: int
+    oldest_cursor: Optional[str] = None
+    newest_cursor: Optional[str] = None
+    has_more: bool = False
@@ -41,7 +41,8 @@ class PDFListResponse(BaseModel):
     """List of PDFs"""
 
     pdfs: list[PDFStatusResponse]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 class DeletePDFResponse(BaseModel):
@@ -49,3 +50,59 @@ class DeletePDFResponse(BaseModel):
 
     message: str
     pdf_id: str
+
+
+class IngestAllocation(BaseModel):
+    """Allocation site that grew the most during a stage (tracemalloc)"""
+
+    site: str
+    size_bytes: int
+    count: int
+
+
+class IngestStageResources(BaseModel):
+    """Resources used by one ingestion stage"""
+
+    stage: str  # download, parse, chunk, embed, store
+    wall_s: float
+    cpu_s: float
+    rss_start_bytes: int
+    rss_end_bytes: int
+    peak_rss_bytes: int
+    failed: bool = False
+    traced_peak_bytes: Optional[int] = None
+    top_allocations: Optional[list[IngestAllocation]] = None
+
+
+class PDFIngestResources(BaseModel):
+    """Resource accounting of a PDF's latest ingestion run"""
+
+    pdf_id: UUID
+    filename: str
+    status: str
+    file_size: int
+    total_pages: Optional[int] = None
+    peak_rss_bytes: Optional[int] = None
+    # Stage in progress when the report was last saved (set after a worker crash)
+    running_stage: Optional[str] = None
+    wall_s: Optional[float] = None
+    cpu_s: Optional[float] = None
+    tracemalloc: bool = False
+    stages: list[IngestStageResources] = []
+
+    @classmethod
+    def from_pdf(cls, pdf) -> "PDFIngestResources":
+        report = pdf.ingest_resources or {}
+        return cls(
+            pdf_id=pdf.id,
+            filename=pdf.filename,
+            status=pdf.status,
+            file_size=pdf.file_size,
+            total_pages=pdf.total_pages,
+            peak_rss_bytes=pdf.peak_rss_bytes,
+            running_stage=report.get("running_stage"),
+            wall_s=report.get("wall_s"),
+            cpu_s=report.get("cpu_s"),
+            tracemalloc=report.get("tracemalloc", False),
+            stages=report.get("stages", []),
+        )
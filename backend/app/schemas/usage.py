@@ -0,0 +1,54 @@
+from datetime import date
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from app.schemas.pdf import PDFIngestResources
+
+
+class PDFUsage(BaseModel):
+    """Model usage attributed to one PDF: ingestion plus every chat turn about it"""
+
+    pdf_id: UUID
+    filename: str
+    messages: int
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    chat_embedding_tokens: int
+    ingestion_embedding_tokens: int
+    chat_cost_usd: float
+    ingestion_cost_usd: float
+    total_cost_usd: float
+
+
+class PDFUsageResponse(BaseModel):
+    pdfs: list[PDFUsage]
+    since: Optional[date] = None
+
+
+class DailyUsage(BaseModel):
+    """Model usage of one UTC day across chat, image chat, image descriptions and ingestion"""
+
+    date: date
+    chat_messages: int
+    image_messages: int
+    images_described: int
+    documents_ingested: int
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    embedding_tokens: int
+    cost_usd: float
+
+
+class DailyUsageResponse(BaseModel):
+    days: list[DailyUsage]
+    total_cost_usd: float
+
+
+class IngestionResourcesResponse(BaseModel):
+    """PDFs ranked by peak RSS during their latest ingestion run"""
+
+    pdfs: list[PDFIngestResources]
@@ -1,9 +1,10 @@
 import secrets
+import time
 import uuid
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
 
-import bcrypt
 from jose import JWTError, jwt
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -11,14 +12,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
 from app.db.models.user import User
 from app.schemas.auth import TokenData, UserCreate
+from app.services.password_hasher import password_hasher
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
 
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
 
 
 def create_access_token(user_id: str, expires_delta: Optional[timedelta] = None) -> str:
@@ -33,15 +35,27 @@ def create_access_token(user_id: str, expires_delta: Optional[timedelta] = None)
     return jwt.encode(payload, settings.secret_key, algorithm=settings.algorithm)
 
 
-def decode_token(token: str) -> Optional[TokenData]:
+@lru_cache(maxsize=settings.token_cache_size)
+def _decode_claims(token: str) -> Optional[Tuple[str, float]]:
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            return None
-        return TokenData(user_id=user_id)
     except JWTError:
         return None
+    user_id = payload.get("sub")
+    if user_id is None:
+        return None
+    return user_id, float(payload.get("exp", float("inf")))
+
+
+def decode_token(token: str) -> Optional[TokenData]:
+    # Signature checks are memoized per token; expiry is re-checked on every call
+    claims = _decode_claims(token)
+    if claims is None:
+        return None
+    user_id, expires_at = claims
+    if expires_at <= time.time():
+        return None
+    return TokenData(user_id=user_id)
 
 
 async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
@@ -64,7 +78,7 @@ async def create_user(db: AsyncSession, user_data: UserCreate) -> User:
         email=user_data.email,
         username=user_data.username,
         full_name=user_data.full_name,
-        hashed_password=hash_password(user_data.password),
+        hashed_password=await hash_password(user_data.password),
     )
     db.add(user)
     await db.flush()
@@ -74,7 +88,7 @@ async def create_user(db: AsyncSession, user_data: UserCreate) -> User:
 
 async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
     user = await get_user_by_email(db, email)
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not await verify_password(password, user.hashed_password):
         return None
     return user
 
@@ -103,7 +117,7 @@ async def reset_password_with_token(db: AsyncSession, token: str, new_password:
         expires = expires.replace(tzinfo=timezone.utc)
     if expires < datetime.now(timezone.utc):
         return False
-    user.hashed_password = hash_password(new_password)
+    user.hashed_password = await hash_password(new_password)
     user.password_reset_token = None
     user.password_reset_expires = None
     db.add(user)
@@ -1,11 +1,14 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Dict
+from typing import List, Dict, Optional
 import logging
 
 from app.services.vector_store import vector_store_service
 from app.services.llm_service import llm_service
 from app.db.models import ChatMessage
-from app.schemas.chat import RetrievedChunk
+from app.schemas.chat import LeanRetrievedChunk, RetrievedChunk
+from app.utils.snippets import build_snippet
+from app.utils.timing import timed
+from app.utils.usage import TokenUsage, track_usage
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +22,7 @@ class ChatService:
         pdf_id: str,
         query: str,
         chat_history: List[Dict] = None,
+        lean: bool = False,
     ) -> Dict:
         """
         Process user query using RAG pipeline
@@ -28,53 +32,52 @@ class ChatService:
             pdf_id: PDF document ID
             query: User's question
             chat_history: Previous chat messages
+            lean: Return snippets instead of full chunk text
 
         Returns:
             Dict with response and retrieved chunks
         """
         try:
-            # Step 1: Retrieve relevant chunks using vector search
-            similar_chunks = await vector_store_service.search_similar_chunks(
-                db=db,
-                pdf_id=pdf_id,
-                query=query,
-            )
+            with track_usage() as usage:
+                # Step 1: Retrieve relevant chunks using vector search
+                similar_chunks = await vector_store_service.search_similar_chunks(
+                    db=db,
+                    pdf_id=pdf_id,
+                    query=query,
+                )
 
-            logger.info(f"Retrieved {len(similar_chunks)} chunks for query")
+                logger.info(f"Retrieved {len(similar_chunks)} chunks for query")
 
-            # Step 2: Generate response using LLM
-            response = await llm_service.generate_response(
-                query=query,
-                context_chunks=similar_chunks,
-                chat_history=chat_history,
-            )
+                # Step 2: Generate response using LLM
+                with timed("llm"):
+                    response = await llm_service.generate_response(
+                        query=query,
+                        context_chunks=similar_chunks,
+                        chat_history=chat_history,
+                    )
 
             # Step 3: Save to chat history
-            await self.save_chat_message(
-                db=db,
-                pdf_id=pdf_id,
-                role="user",
-                content=query,
-            )
+            with timed("save"):
+                await self.save_chat_message(
+                    db=db,
+                    pdf_id=pdf_id,
+                    role="user",
+                    content=query,
+                )
 
-            chunk_ids = [chunk["id"] for chunk in similar_chunks]
-            await self.save_chat_message(
-                db=db,
-                pdf_id=pdf_id,
-                role="assistant",
-                content=response,
-                retrieved_chunk_ids=chunk_ids,
-            )
+                chunk_ids = [chunk["id"] for chunk in similar_chunks]
+                await self.save_chat_message(
+                    db=db,
+                    pdf_id=pdf_id,
+                    role="assistant",
+                    content=response,
+                    retrieved_chunk_ids=chunk_ids,
+                    finish_reason="stop",
+                    usage=usage,
+                )
 
             # Format retrieved chunks for response
-            retrieved_chunks = [
-                RetrievedChunk(
-                    chunk_text=chunk["chunk_text"],
-                    page_number=chunk.get("page_number"),
-                    similarity_score=chunk["similarity"],
-                )
-                for chunk in similar_chunks
-            ]
+            retrieved_chunks = self.format_retrieved_chunks(similar_chunks, query, lean=lean)
 
             return {
                 "response": response,
@@ -85,6 +88,49 @@ class ChatService:
             logger.error(f"Error processing query: {e}")
             raise
 
+    def format_retrieved_chunks(
+        self,
+        chunks: List[Dict],
+        query: str,
+        lean: bool = False,
+    ) -> List:
+        """
+        Format retrieved chunks for an API response
+
+        Args:
+            chunks: Chunk dicts from the vector store
+            query: User's question (used to highlight snippets)
+            lean: Return snippets with offsets instead of full chunk text
+
+        Returns:
+            List of RetrievedChunk or LeanRetrievedChunk
+        """
+        if not lean:
+            return [
+                RetrievedChunk(
+                    chunk_id=chunk["id"],
+                    chunk_text=chunk["chunk_text"],
+                    page_number=chunk.get("page_number"),
+                    similarity_score=chunk["similarity"],
+                )
+                for chunk in chunks
+            ]
+
+        lean_chunks = []
+        for chunk in chunks:
+            snippet = build_snippet(chunk["chunk_text"], query)
+            lean_chunks.append(
+                LeanRetrievedChunk(
+                    chunk_id=chunk["id"],
+                    page_number=chunk.get("page_number"),
+                    similarity_score=chunk["similarity"],
+                    snippet=snippet["snippet"],
+                    snippet_offset=snippet["offset"],
+                    highlights=snippet["highlights"],
+                )
+            )
+        return lean_chunks
+
     async def save_chat_message(
         self,
         db: AsyncSession,
@@ -92,6 +138,9 @@ class ChatService:
         role: str,
         content: str,
         retrieved_chunk_ids: List[str] = None,
+        finish_reason: Optional[str] = None,
+        stream_metrics: Optional[Dict] = None,
+        usage: Optional[TokenUsage] = None,
     ):
         """
         Save chat message to database
@@ -102,6 +151,9 @@ class ChatService:
             role: Message role ('user' or 'assistant')
             content: Message content
             retrieved_chunk_ids: IDs of chunks used (for assistant messages)
+            finish_reason: Why generation ended (for assistant messages)
+            stream_metrics: Streaming latency/throughput record (for streamed answers)
+            usage: Token usage and cost of the turn (for assistant messages)
         """
         try:
             message = ChatMessage(
@@ -109,6 +161,9 @@ class ChatService:
                 role=role,
                 content=content,
                 retrieved_chunk_ids=retrieved_chunk_ids,
+                finish_reason=finish_reason,
+                stream_metrics=stream_metrics,
+                **(usage.columns() if usage is not None else {}),
             )
             db.add(message)
             await db.commit()
@@ -3,6 +3,8 @@ from typing import List
 import logging
 
 from app.config import settings
+from app.utils.tracing import span
+from app.utils.usage import record_embedding_usage
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +14,9 @@ class EmbeddingService:
 
     def __init__(self):
         """Initialize OpenAI client"""
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+        self.client = AsyncOpenAI(
+            api_key=settings.openai_api_key, base_url=settings.openai_base_url
+        )
         self.model = settings.openai_embedding_model
 
     async def generate_embedding(self, text: str) -> List[float]:
@@ -26,11 +30,16 @@ class EmbeddingService:
             Embedding vector as list of floats
         """
         try:
-            response = await self.client.embeddings.create(
-                model=self.model,
-                input=text,
-            )
+            with span("openai embeddings", kind="client", model=self.model, inputs=1) as s:
+                response = await self.client.embeddings.create(
+                    model=self.model,
+                    input=text,
+                )
+                if s is not None and response.usage:
+                    s.set_attribute("tokens", response.usage.prompt_tokens)
             embedding = response.data[0].embedding
+            if response.usage:
+                record_embedding_usage(self.model, response.usage.prompt_tokens)
             logger.debug(f"Generated embedding for text (length: {len(text)})")
             return embedding
 
@@ -56,12 +65,19 @@ class EmbeddingService:
             for i in range(0, len(texts), batch_size):
                 batch = texts[i : i + batch_size]
 
-                response = await self.client.embeddings.create(
-                    model=self.model,
-                    input=batch,
-                )
+                with span(
+                    "openai embeddings", kind="client", model=self.model, inputs=len(batch)
+                ) as s:
+                    response = await self.client.embeddings.create(
+                        model=self.model,
+                        input=batch,
+                    )
+                    if s is not None and response.usage:
+                        s.set_attribute("tokens", response.usage.prompt_tokens)
 
                 embeddings = [item.embedding for item in response.data]
+                if response.usage:
+                    record_embedding_usage(self.model, response.usage.prompt_tokens)
                 all_embeddings.extend(embeddings)
 
                 logger.info(f"Generated {len(embeddings)} embeddings (batch {i // batch_size + 1})")
@@ -1,10 +1,22 @@
+import asyncio
 import base64
+import hashlib
 import logging
 import os
-from typing import Dict, List
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import orjson
 
 from app.config import settings
-from app.services.minio_service import minio_service
+from app.services.storage import storage
+from app.utils.image_utils import prepare_vision_image
+from app.utils.timing import timed, track_pipeline
+from app.utils.tracing import set_token_attributes, span, start_span
+from app.utils.usage import TokenUsage, record_chat_usage, track_usage
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 
@@ -19,6 +31,132 @@ Instructions:
 - If you cannot determine something from the image, say so clearly
 - If the image contains text, read and interpret it accurately"""
 
+DESCRIPTION_PROMPT = """Describe this image for someone who will answer questions about it without seeing it.
+
+Respond with a JSON object with two keys:
+- "description": a detailed, structured description covering the overall subject, every notable object or element, layout and positions, colors, and any charts, tables or diagrams (including their values)
+- "text": all text visible in the image, transcribed verbatim in reading order (empty string if there is none)"""
+
+# Returned by the text-only path when the description cannot answer the question
+ESCALATION_MARKER = "NEEDS_IMAGE"
+
+TEXT_ONLY_SYSTEM_PROMPT = f"""You are a helpful AI assistant answering questions about an image. You cannot see the image; instead you are given a detailed description of it and a transcription of any text it contains.
+
+Instructions:
+- Answer using ONLY the description and the transcribed text
+- Be descriptive and thorough, referencing specific visual elements when relevant
+- If they do not contain enough detail to answer confidently, reply with exactly {ESCALATION_MARKER} and nothing else"""
+
+
+EXT_TO_MIME = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+}
+
+
+def derivative_key(minio_key: str) -> str:
+    """Object key of the vision-ready derivative of an image"""
+    return f"derivatives/{os.path.splitext(minio_key)[0]}.vision.jpg"
+
+
+class ImagePayloadCache:
+    """Bounded LRU of ready-to-send image data URLs keyed by object key"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = value
+            self._size += len(value)
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._size > self.max_bytes
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def evict(self, key: str) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+
+
+def normalize_question(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return re.sub(r"\s+", " ", query).strip().lower().rstrip("?!. ")
+
+
+def history_fingerprint(chat_history: List[Dict] = None) -> str:
+    """Digest of the part of the chat history that is sent to the model"""
+    digest = hashlib.blake2b(digest_size=16)
+    for msg in (chat_history or [])[-settings.max_chat_history :]:
+        digest.update(orjson.dumps([msg["role"], msg["content"]]))
+    return digest.hexdigest()
+
+
+class VisionAnswerCache:
+    """Bounded LRU of answers keyed by (image hash, question, history fingerprint)
+
+    Identical images share a content hash, so a repeated question on a
+    re-uploaded screenshot is answered without a model call or a download.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(content_hash: str, query: str, chat_history: List[Dict] = None) -> Tuple[str, str, str]:
+        return content_hash, normalize_question(query), history_fingerprint(chat_history)
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[Dict]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Tuple[str, str, str], value: Dict) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict_image(self, content_hash: str) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == content_hash]:
+                del self._entries[key]
+
+
+def message_usage(usage: TokenUsage) -> Dict:
+    """Usage values stored on an ImageMessage"""
+    columns = usage.columns()
+    columns.pop("embedding_tokens")
+    return columns
+
 
 class ImageService:
     def __init__(self):
@@ -26,66 +164,507 @@ class ImageService:
             model=settings.openai_model,
             max_completion_tokens=settings.openai_max_tokens,
             api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
             temperature=1.0,
         )
+        self.payload_cache = ImagePayloadCache(
+            max_entries=settings.image_payload_cache_size,
+            max_bytes=settings.image_payload_cache_max_bytes,
+        )
+        self.answer_cache = VisionAnswerCache(max_entries=settings.image_answer_cache_size)
+
+    async def get_image_payload(self, minio_key: str, image_bytes: bytes = None) -> str:
+        """
+        Get the data URL sent to the vision model for an image
+
+        Served from the in-process LRU when possible; otherwise the stored
+        derivative is used, and as a last resort the original is downscaled,
+        re-encoded and the derivative written back for later turns.
+
+        Args:
+            minio_key: Object key of the original image
+            image_bytes: Original bytes if the caller already has them (upload time)
+
+        Returns:
+            data: URL ready to place in an image_url content block
+        """
+        cached = self.payload_cache.get(minio_key)
+        if cached is not None:
+            return cached
+
+        derivative = None
+        if image_bytes is None:
+            try:
+                derivative = await storage.download_file_bytes(derivative_key(minio_key))
+            except Exception:
+                derivative = None
+
+        if derivative is None:
+            if image_bytes is None:
+                image_bytes = await storage.download_file_bytes(minio_key)
+            try:
+                derivative = await asyncio.to_thread(prepare_vision_image, image_bytes)
+            except Exception as e:
+                # Undecodable by Pillow: send the original as before
+                logger.warning(f"Could not prepare vision derivative for {minio_key}: {e}")
+                mime_type = EXT_TO_MIME.get(os.path.splitext(minio_key)[1].lower(), "image/png")
+                return f"data:{mime_type};base64,{base64.b64encode(image_bytes).decode('utf-8')}"
+
+            try:
+                await storage.upload_bytes(derivative_key(minio_key), derivative, "image/jpeg")
+            except Exception as e:
+                logger.warning(f"Failed to store vision derivative for {minio_key}: {e}")
+
+        data_url = f"data:image/jpeg;base64,{base64.b64encode(derivative).decode('utf-8')}"
+        self.payload_cache.put(minio_key, data_url)
+        return data_url
+
+    async def delete_image_payload(self, minio_key: str) -> None:
+        """Drop the cached payload and stored derivative of an image"""
+        self.payload_cache.evict(minio_key)
+        try:
+            await storage.delete_file(derivative_key(minio_key))
+        except Exception as e:
+            logger.warning(f"Failed to delete vision derivative for {minio_key}: {e}")
+
+    def _history_messages(self, chat_history: List[Dict] = None) -> List:
+        messages = []
+        if chat_history:
+            for msg in chat_history[-settings.max_chat_history :]:
+                if msg["role"] == "user":
+                    messages.append(HumanMessage(content=msg["content"]))
+                elif msg["role"] == "assistant":
+                    messages.append(AIMessage(content=msg["content"]))
+        return messages
+
+    async def _vision_messages(
+        self, minio_key: str, query: str, chat_history: List[Dict] = None
+    ) -> List:
+        with timed("payload"):
+            image_url = await self.get_image_payload(minio_key)
+        messages = [SystemMessage(content=SYSTEM_PROMPT)]
+        messages.extend(self._history_messages(chat_history))
+        messages.append(
+            HumanMessage(
+                content=[
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": image_url, "detail": settings.vision_detail},
+                    },
+                    {"type": "text", "text": query},
+                ]
+            )
+        )
+        return messages
+
+    def _description_messages(
+        self,
+        description: str,
+        extracted_text: str,
+        query: str,
+        chat_history: List[Dict] = None,
+    ) -> List:
+        messages = [
+            SystemMessage(content=TEXT_ONLY_SYSTEM_PROMPT),
+            SystemMessage(
+                content=f"Image description:\n{description}\n\n"
+                f"Text in the image:\n{extracted_text or '(none)'}"
+            ),
+        ]
+        messages.extend(self._history_messages(chat_history))
+        messages.append(HumanMessage(content=query))
+        return messages
+
+    @staticmethod
+    def _use_text_path(image, chat_history: List[Dict] = None) -> bool:
+        return bool(
+            settings.image_text_followups
+            and chat_history
+            and image.description_status == "ready"
+            and image.description
+        )
+
+    @staticmethod
+    def _response_text(response) -> str:
+        content = response.content
+        if isinstance(content, list):
+            content = " ".join(
+                block.get("text", "") if isinstance(block, dict) else str(block)
+                for block in content
+            )
+        return content
+
+    @staticmethod
+    def _record_usage(response) -> Tuple[int, int]:
+        """Attribute a response's usage to the current turn and return its token counts"""
+        usage = getattr(response, "usage_metadata", None) or {}
+        record_chat_usage(settings.openai_model, usage)
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
 
     async def analyze_image(
         self,
         minio_key: str,
         query: str,
         chat_history: List[Dict] = None,
-    ) -> str:
-        ext_to_mime = {
-            ".png": "image/png",
-            ".jpg": "image/jpeg",
-            ".jpeg": "image/jpeg",
-            ".webp": "image/webp",
-        }
+    ) -> Dict:
+        """
+        Answer a question by sending the image to the vision model
 
+        Returns:
+            Dict with response, prompt_tokens and completion_tokens
+        """
         try:
-            image_bytes = minio_service.download_file_bytes(minio_key)
-            base64_image = base64.b64encode(image_bytes).decode("utf-8")
-
-            ext = os.path.splitext(minio_key)[1].lower()
-            mime_type = ext_to_mime.get(ext, "image/png")
-
-            messages = [SystemMessage(content=SYSTEM_PROMPT)]
-
-            if chat_history:
-                for msg in chat_history[-settings.max_chat_history :]:
-                    if msg["role"] == "user":
-                        messages.append(HumanMessage(content=msg["content"]))
-                    elif msg["role"] == "assistant":
-                        messages.append(AIMessage(content=msg["content"]))
-
-            messages.append(
-                HumanMessage(
-                    content=[
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:{mime_type};base64,{base64_image}",
-                                "detail": "high",
-                            },
-                        },
-                        {"type": "text", "text": query},
-                    ]
-                )
+            messages = await self._vision_messages(minio_key, query, chat_history)
+            with timed("llm"), span("openai chat", kind="client", model=settings.openai_model) as s:
+                response = await self.llm.ainvoke(messages)
+                set_token_attributes(s, response.usage_metadata)
+            content = self._response_text(response)
+            prompt_tokens, completion_tokens = self._record_usage(response)
+            logger.info(f"Generated image analysis response (length: {len(content)})")
+            return {
+                "response": content,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+            }
+
+        except Exception as e:
+            logger.error(f"Error analyzing image: {e}")
+            raise
+
+    async def describe_image(self, minio_key: str) -> Dict:
+        """
+        Produce a structured description and text transcription of an image
+
+        Returns:
+            Dict with description, text, prompt_tokens and completion_tokens
+        """
+        with timed("payload"):
+            image_url = await self.get_image_payload(minio_key)
+        messages = [
+            HumanMessage(
+                content=[
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": image_url, "detail": settings.vision_detail},
+                    },
+                    {"type": "text", "text": DESCRIPTION_PROMPT},
+                ]
             )
+        ]
+
+        with timed("llm"), span("openai chat", kind="client", model=settings.openai_model) as s:
+            response = await self.llm.bind(response_format={"type": "json_object"}).ainvoke(
+                messages
+            )
+            set_token_attributes(s, response.usage_metadata)
+        content = self._response_text(response)
+        prompt_tokens, completion_tokens = self._record_usage(response)
+        try:
+            parsed = orjson.loads(content)
+            description = str(parsed.get("description", "")).strip()
+            text = str(parsed.get("text", "")).strip()
+        except (orjson.JSONDecodeError, AttributeError):
+            description, text = content.strip(), ""
+
+        logger.info(f"Described image {minio_key} (description length: {len(description)})")
+        return {
+            "description": description,
+            "text": text,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        }
+
+    async def answer_from_description(
+        self,
+        description: str,
+        extracted_text: str,
+        query: str,
+        chat_history: List[Dict] = None,
+    ) -> Dict:
+        """
+        Answer a question from the stored description without sending the image
 
+        Returns:
+            Dict with response (None if the model asked for the image),
+            prompt_tokens and completion_tokens
+        """
+        messages = self._description_messages(description, extracted_text, query, chat_history)
+        with (
+            timed("llm_text"),
+            span("openai chat", kind="client", model=settings.openai_model) as s,
+        ):
             response = await self.llm.ainvoke(messages)
-            content = response.content
-            if isinstance(content, list):
-                content = " ".join(
-                    block.get("text", "") if isinstance(block, dict) else str(block)
-                    for block in content
+            set_token_attributes(s, response.usage_metadata)
+        content = self._response_text(response)
+        prompt_tokens, completion_tokens = self._record_usage(response)
+        needs_image = content.strip().startswith(ESCALATION_MARKER)
+        return {
+            "response": None if needs_image else content,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        }
+
+    async def answer_question(
+        self,
+        image,
+        query: str,
+        chat_history: List[Dict] = None,
+    ) -> Dict:
+        """
+        Answer a question about an image, preferring the text-only path
+
+        Follow-up turns on images with a ready description are answered from
+        the description; the model escalates to a full vision call when the
+        description is not enough.
+
+        Args:
+            image: Image row (needs minio_key, description, extracted_text,
+                description_status)
+            query: User's question
+            chat_history: Previous chat messages
+
+        Returns:
+            Dict with response, answer_path ('text', 'vision', 'escalated' or
+            'cached'), latency_ms, prompt_tokens, completion_tokens,
+            cached_tokens and cost_usd
+        """
+        start = time.perf_counter()
+
+        cache_key = None
+        if image.content_hash:
+            cache_key = self.answer_cache.key(image.content_hash, query, chat_history)
+            cached = self.answer_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Answered image question from cache ({cached['answer_path']} answer)")
+                return {
+                    "response": cached["response"],
+                    "answer_path": "cached",
+                    "latency_ms": int((time.perf_counter() - start) * 1000),
+                    **message_usage(TokenUsage()),
+                }
+
+        answer_path = "vision"
+
+        with track_usage() as usage:
+            if self._use_text_path(image, chat_history):
+                result = await self.answer_from_description(
+                    image.description, image.extracted_text, query, chat_history
                 )
-            logger.info(f"Generated image analysis response (length: {len(content)})")
-            return content
+                if result["response"] is not None:
+                    answer_path = "text"
+                    response = result["response"]
+                else:
+                    answer_path = "escalated"
+
+            if answer_path != "text":
+                result = await self.analyze_image(image.minio_key, query, chat_history)
+                response = result["response"]
 
+        if cache_key is not None:
+            self.answer_cache.put(cache_key, {"response": response, "answer_path": answer_path})
+
+        latency_ms = int((time.perf_counter() - start) * 1000)
+        logger.info(
+            f"Answered image question via {answer_path} path in {latency_ms} ms "
+            f"({usage.prompt_tokens} prompt / {usage.completion_tokens} completion tokens)"
+        )
+        return {
+            "response": response,
+            "answer_path": answer_path,
+            "latency_ms": latency_ms,
+            **message_usage(usage),
+        }
+
+    async def _stream_text(self, messages: List, usage: Dict) -> AsyncIterator[str]:
+        # Not made current: the generator is suspended between chunks
+        llm_span = start_span("openai chat stream", kind="client", model=settings.openai_model)
+        try:
+            async for chunk in self.llm.astream(messages, stream_usage=True):
+                if chunk.usage_metadata:
+                    set_token_attributes(llm_span, chunk.usage_metadata)
+                    usage["tokens"].add_chat(settings.openai_model, chunk.usage_metadata)
+                text = self._response_text(chunk)
+                if text:
+                    yield text
         except Exception as e:
-            logger.error(f"Error analyzing image: {e}")
+            if llm_span is not None:
+                llm_span.record_error(e)
             raise
+        finally:
+            if llm_span is not None:
+                llm_span.end()
+
+    async def answer_question_stream(
+        self,
+        image,
+        query: str,
+        chat_history: List[Dict] = None,
+        usage: Optional[Dict] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream an answer about an image, preferring the text-only path
+
+        Follows the same routing and answer cache as answer_question. On the
+        text path the first few characters are held back until they rule out
+        the escalation marker, so an escalated turn never leaks the marker to
+        the client.
+
+        Args:
+            image: Image row (needs minio_key, description, extracted_text,
+                description_status)
+            query: User's question
+            chat_history: Previous chat messages
+            usage: Optional dict updated in place with answer_path and tokens
+                (a TokenUsage) as the stream progresses
+
+        Yields:
+            Response chunks
+        """
+        if usage is None:
+            usage = {}
+        usage.update(answer_path="vision", tokens=TokenUsage())
+
+        cache_key = None
+        if image.content_hash:
+            cache_key = self.answer_cache.key(image.content_hash, query, chat_history)
+            cached = self.answer_cache.get(cache_key)
+            if cached is not None:
+                usage["answer_path"] = "cached"
+                yield cached["response"]
+                return
+
+        parts: List[str] = []
+        stream = self._route_stream(image, query, chat_history, usage)
+        try:
+            async for chunk in stream:
+                parts.append(chunk)
+                yield chunk
+        finally:
+            await stream.aclose()
+
+        # Only completed answers are cached; a cancelled stream never gets here
+        if cache_key is not None:
+            self.answer_cache.put(
+                cache_key, {"response": "".join(parts), "answer_path": usage["answer_path"]}
+            )
+
+    async def _route_stream(
+        self,
+        image,
+        query: str,
+        chat_history: List[Dict],
+        usage: Dict,
+    ) -> AsyncIterator[str]:
+        if self._use_text_path(image, chat_history):
+            messages = self._description_messages(
+                image.description, image.extracted_text, query, chat_history
+            )
+            stream = self._stream_text(messages, usage)
+            held = ""
+            decided = False
+            try:
+                async for chunk in stream:
+                    if decided:
+                        yield chunk
+                        continue
+                    held += chunk
+                    stripped = held.lstrip()
+                    if len(stripped) < len(ESCALATION_MARKER) and ESCALATION_MARKER.startswith(
+                        stripped
+                    ):
+                        continue
+                    if stripped.startswith(ESCALATION_MARKER):
+                        break
+                    decided = True
+                    usage["answer_path"] = "text"
+                    yield held
+                else:
+                    if not decided and not held.lstrip().startswith(ESCALATION_MARKER):
+                        usage["answer_path"] = "text"
+                        if held:
+                            yield held
+            finally:
+                await stream.aclose()
+
+            if usage["answer_path"] == "text":
+                return
+            usage["answer_path"] = "escalated"
+
+        messages = await self._vision_messages(image.minio_key, query, chat_history)
+        stream = self._stream_text(messages, usage)
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    async def answer_batch(
+        self, images: List, questions: List[str]
+    ) -> AsyncIterator[Tuple[object, int, Dict]]:
+        """
+        Answer every question about every image, yielding results as they complete
+
+        Payloads of images with any uncached question are prefetched
+        concurrently, and vision calls are bounded by
+        settings.image_batch_concurrency. A failed item yields its exception
+        instead of failing the batch. Closing the iterator cancels the work
+        still in flight.
+
+        Args:
+            images: Image rows
+            questions: Questions asked about each image
+
+        Yields:
+            (image, question index, answer dict or exception)
+        """
+        fetch_slots = asyncio.Semaphore(settings.image_batch_prefetch_concurrency)
+        vision_slots = asyncio.Semaphore(settings.image_batch_concurrency)
+
+        async def prefetch(minio_key: str) -> None:
+            async with fetch_slots:
+                await self.get_image_payload(minio_key)
+
+        prefetches: Dict[str, asyncio.Task] = {}
+        for image in images:
+            if image.minio_key in prefetches:
+                continue
+            cached = image.content_hash and all(
+                self.answer_cache.get(self.answer_cache.key(image.content_hash, q)) is not None
+                for q in questions
+            )
+            if not cached:
+                prefetches[image.minio_key] = asyncio.create_task(prefetch(image.minio_key))
+
+        async def run_item(image, index: int):
+            try:
+                if image.minio_key in prefetches:
+                    await prefetches[image.minio_key]
+                async with vision_slots:
+                    with track_pipeline("image_batch"):
+                        answer = await self.answer_question(image, questions[index])
+                return image, index, answer
+            except Exception as e:
+                logger.warning(f"Batch item failed for image {image.id}: {e}")
+                return image, index, e
+
+        tasks = [
+            asyncio.create_task(run_item(image, index))
+            for image in images
+            for index in range(len(questions))
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            pending = [t for t in [*tasks, *prefetches.values()] if not t.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+            # Retrieve prefetch failures so they are not reported as unhandled
+            for task in prefetches.values():
+                if not task.cancelled():
+                    task.exception()
 
 
 image_service = ImageService()
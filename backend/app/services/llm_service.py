@@ -1,7 +1,9 @@
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from app.config import settings
+from app.utils.tracing import set_token_attributes, span, start_span
+from app.utils.usage import TokenUsage, record_chat_usage
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 
@@ -17,6 +19,7 @@ class LLMService:
             model=settings.openai_model,
             max_completion_tokens=settings.openai_max_tokens,
             api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
             temperature=1.0,
         )
 
@@ -116,7 +119,10 @@ Question: {query}"""
             messages = self.build_chat_messages(query, context_chunks, chat_history)
 
             # Invoke LLM
-            response = await self.llm.ainvoke(messages)
+            with span("openai chat", kind="client", model=settings.openai_model) as s:
+                response = await self.llm.ainvoke(messages)
+                set_token_attributes(s, response.usage_metadata)
+            record_chat_usage(settings.openai_model, response.usage_metadata)
 
             logger.info(f"Generated response for query (length: {len(response.content)})")
 
@@ -131,6 +137,7 @@ Question: {query}"""
         query: str,
         context_chunks: List[Dict],
         chat_history: List[Dict] = None,
+        usage: Optional[TokenUsage] = None,
     ):
         """
         Generate streaming response using LLM
@@ -139,21 +146,34 @@ Question: {query}"""
             query: User's question
             context_chunks: Retrieved chunks for context
             chat_history: Previous chat messages
+            usage: Accumulator for the stream's token usage (reported with the
+                final chunk)
 
         Yields:
             Response chunks
         """
+        # Not made current: the generator is suspended between chunks
+        llm_span = start_span("openai chat stream", kind="client", model=settings.openai_model)
         try:
             messages = self.build_chat_messages(query, context_chunks, chat_history)
 
             # Stream response
-            async for chunk in self.llm.astream(messages):
+            async for chunk in self.llm.astream(messages, stream_usage=True):
+                if chunk.usage_metadata:
+                    set_token_attributes(llm_span, chunk.usage_metadata)
+                    if usage is not None:
+                        usage.add_chat(settings.openai_model, chunk.usage_metadata)
                 if chunk.content:
                     yield chunk.content
 
         except Exception as e:
+            if llm_span is not None:
+                llm_span.record_error(e)
             logger.error(f"Error streaming response: {e}")
             raise
+        finally:
+            if llm_span is not None:
+                llm_span.end()
 
 
 # Global LLM service instance
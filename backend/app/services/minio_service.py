@@ -1,28 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
 from minio import Minio
 from minio.error import S3Error
+import certifi
 import logging
-from typing import Optional
+import os
+from typing import BinaryIO, Optional
 import io
+import urllib3
 
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# S3 rejects multipart parts smaller than 5 MiB (except the last one)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
 
 class MinIOService:
     """MinIO client wrapper for file storage operations"""
 
-    def __init__(self):
-        """Initialize MinIO client"""
+    def __init__(self, part_size: int = None, parallelism: int = None):
+        """
+        Initialize MinIO client
+
+        Args:
+            part_size: Part size for multipart uploads and ranged downloads
+                (default from settings)
+            parallelism: Parts transferred concurrently per object (default from settings)
+        """
+        self.part_size = max(part_size or settings.minio_part_size, MIN_PART_SIZE)
+        self.parallelism = max(parallelism or settings.minio_parallelism, 1)
         self.client = Minio(
             settings.minio_endpoint,
             access_key=settings.minio_access_key,
             secret_key=settings.minio_secret_key,
             secure=settings.minio_secure,
+            http_client=self._create_http_client(),
         )
         self.bucket = settings.minio_bucket
         self._ensure_bucket_exists()
 
+    def _create_http_client(self) -> urllib3.PoolManager:
+        """HTTP pool sized for concurrent transfers (MinIO's default keeps 10 connections)"""
+        timeout = 300
+        # Every storage thread, streamed uploads included, may run a multipart
+        # upload or ranged download with `parallelism` requests in flight
+        storage_threads = settings.storage_max_workers + settings.storage_stream_upload_workers
+        return urllib3.PoolManager(
+            timeout=urllib3.Timeout(connect=timeout, read=timeout),
+            maxsize=storage_threads * self.parallelism,
+            cert_reqs="CERT_REQUIRED",
+            ca_certs=certifi.where(),
+            retries=urllib3.Retry(
+                total=5,
+                backoff_factor=0.2,
+                status_forcelist=[500, 502, 503, 504],
+            ),
+        )
+
     def _ensure_bucket_exists(self):
         """Create bucket if it doesn't exist"""
         try:
@@ -44,12 +79,68 @@ class MinIOService:
             file_path: Local file path to save to
         """
         try:
-            self.client.fget_object(self.bucket, object_name, file_path)
+            stat = self.client.stat_object(self.bucket, object_name)
+            if self.parallelism > 1 and stat.size > self.part_size:
+                self._download_ranges(object_name, file_path, stat.size, stat.etag)
+            else:
+                self.client.fget_object(self.bucket, object_name, file_path)
             logger.info(f"Downloaded {object_name} to {file_path}")
         except S3Error as e:
             logger.error(f"Error downloading file {object_name}: {e}")
             raise
 
+    def _download_ranges(self, object_name: str, file_path: str, size: int, etag: str) -> None:
+        """
+        Download an object as concurrent ranged GETs written into place
+
+        Args:
+            object_name: Object key in MinIO
+            file_path: Local file path to save to
+            size: Object size in bytes
+            etag: Object ETag; every range is pinned to it with If-Match
+        """
+        tmp_path = f"{file_path}.part"
+        ranges = [
+            (offset, min(self.part_size, size - offset))
+            for offset in range(0, size, self.part_size)
+        ]
+
+        def fetch_range(offset: int, length: int) -> None:
+            response = self.client.get_object(
+                self.bucket,
+                object_name,
+                offset=offset,
+                length=length,
+                request_headers={"If-Match": f'"{etag}"'},
+            )
+            try:
+                with open(tmp_path, "r+b") as f:
+                    f.seek(offset)
+                    for data in response.stream(amt=1024 * 1024):
+                        f.write(data)
+                    written = f.tell() - offset
+            finally:
+                response.close()
+                response.release_conn()
+            if written != length:
+                raise IOError(
+                    f"Short read for {object_name} at {offset}: {written} of {length} bytes"
+                )
+
+        try:
+            with open(tmp_path, "wb") as f:
+                f.truncate(size)
+            with ThreadPoolExecutor(max_workers=min(self.parallelism, len(ranges))) as pool:
+                # list() re-raises the first failed range
+                list(pool.map(lambda r: fetch_range(*r), ranges))
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        logger.info(f"Downloaded {object_name} in {len(ranges)} ranges")
+
     def download_file_bytes(self, object_name: str) -> bytes:
         """
         Download file from MinIO as bytes
@@ -80,7 +171,13 @@ class MinIOService:
             file_path: Local file path to upload
         """
         try:
-            self.client.fput_object(self.bucket, object_name, file_path)
+            self.client.fput_object(
+                self.bucket,
+                object_name,
+                file_path,
+                part_size=self.part_size,
+                num_parallel_uploads=self.parallelism,
+            )
             logger.info(f"Uploaded {file_path} to {object_name}")
         except S3Error as e:
             logger.error(f"Error uploading file {object_name}: {e}")
@@ -104,12 +201,48 @@ class MinIOService:
                 io.BytesIO(data),
                 length=len(data),
                 content_type=content_type,
+                part_size=self.part_size,
+                num_parallel_uploads=self.parallelism,
             )
             logger.info(f"Uploaded bytes to {object_name}")
         except S3Error as e:
             logger.error(f"Error uploading bytes to {object_name}: {e}")
             raise
 
+    def upload_fileobj(
+        self,
+        object_name: str,
+        fileobj: BinaryIO,
+        length: int,
+        content_type: str = "application/octet-stream",
+    ) -> None:
+        """
+        Upload from a readable file object without loading it into memory
+
+        The client reads at most one part at a time, so memory per upload is
+        bounded by the part size regardless of the object size.
+
+        Args:
+            object_name: Object key in MinIO
+            fileobj: Binary file object positioned at the start of the data
+            length: Number of bytes to upload, or -1 to read until EOF
+            content_type: MIME type of the file
+        """
+        try:
+            self.client.put_object(
+                self.bucket,
+                object_name,
+                fileobj,
+                length=length,
+                content_type=content_type,
+                part_size=self.part_size,
+                num_parallel_uploads=self.parallelism,
+            )
+            logger.info(f"Uploaded {length} bytes to {object_name}")
+        except S3Error as e:
+            logger.error(f"Error uploading to {object_name}: {e}")
+            raise
+
     def delete_file(self, object_name: str) -> None:
         """
         Delete file from MinIO
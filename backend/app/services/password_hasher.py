@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+import bcrypt
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class PasswordHasherBusyError(Exception):
+    """Raised when a hashing request cannot be queued or finished in time"""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated, bounded thread pool
+
+    bcrypt releases the GIL while hashing, so a small pool keeps ~250 ms
+    hashes off the event loop. At most ``max_pending`` requests may be queued
+    or running; callers wait up to ``timeout`` seconds for a slot and for the
+    result, after which PasswordHasherBusyError is raised. A request that
+    times out keeps its slot until its thread finishes.
+    """
+
+    def __init__(self, workers: int, max_pending: int, timeout: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="password-hash"
+            )
+        return self._executor
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        # Created lazily so the semaphore binds to the running event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        return self._slots
+
+    async def _run(self, fn: Callable[..., T], *args) -> T:
+        loop = asyncio.get_running_loop()
+        slots = self._get_slots()
+        deadline = loop.time() + self.timeout
+
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Password hashing queue is full")
+            raise PasswordHasherBusyError("Password hashing queue is full")
+
+        try:
+            job = self._get_executor().submit(fn, *args)
+        except Exception:
+            slots.release()
+            raise
+        # A timed-out job keeps running in its thread; hold its slot until the
+        # thread is done so max_pending bounds the work actually in flight
+        job.add_done_callback(lambda _: _call_soon(loop, slots.release))
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(job), timeout=max(deadline - loop.time(), 0)
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Password hashing timed out after {self.timeout}s")
+            raise PasswordHasherBusyError("Password hashing timed out")
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash_password_sync, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(_verify_password_sync, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _call_soon(loop: asyncio.AbstractEventLoop, callback: Callable[[], None]) -> None:
+    try:
+        loop.call_soon_threadsafe(callback)
+    except RuntimeError:
+        # Loop already closed (shutdown); nothing is waiting on the slot
+        pass
+
+
+def _hash_password_sync(password: str) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+
+def _verify_password_sync(plain_password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+    timeout=settings.password_hash_timeout_seconds,
+)
@@ -0,0 +1,428 @@
+"""On-demand profiling of live requests and ingestion jobs
+
+An admin arms a rule ("profile the next N requests under /api/v1/chat" or
+"the next ingestion of pdf X"); matching work is then captured with either
+cProfile (deterministic, event-loop thread only) or a wall-clock stack
+sampler (all busy threads, including to_thread PDF parsing and storage
+executor threads). Profiles are stored in object storage: cProfile runs as
+pstats files, sampled runs as speedscope JSON.
+
+Captures affect the whole process while they run (the event loop is shared),
+so only one runs at a time, each is cut off after a time limit and profiling
+is skipped while recent captures exceed a duty-cycle budget. Rules and the
+profile index are kept in memory and apply to the worker that received them.
+"""
+
+import asyncio
+import cProfile
+import functools
+import logging
+import marshal
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+import orjson
+
+from app.config import settings
+from app.services.storage import storage
+from app.utils.tracing import current_request_id
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PREFIX = "profiles/"
+PROFILE_FORMATS = {
+    "cprofile": ("pstats", "application/octet-stream"),
+    "sampling": ("speedscope.json", "application/json"),
+}
+MAX_STACK_DEPTH = 128
+# Window over which the duty-cycle budget is enforced
+DUTY_CYCLE_WINDOW_SECONDS = 300
+RECENT_PROFILES = 200
+
+# Innermost frames of a thread parked waiting for work
+_IDLE_FRAMES = {("threading.py", "wait"), ("queue.py", "get"), ("thread.py", "_worker")}
+
+
+@dataclass
+class ProfileRule:
+    """Armed request to profile the next matching runs"""
+
+    id: str
+    target: str  # "request" or "pdf_ingest"
+    mode: str  # "cprofile" or "sampling"
+    remaining: int
+    expires_at: datetime
+    created_by: str
+    route_prefix: Optional[str] = None
+    pdf_id: Optional[str] = None
+    profile_ids: List[str] = field(default_factory=list)
+
+    def matches(self, target: str, subject: str) -> bool:
+        if self.target != target or self.remaining <= 0:
+            return False
+        if target == "request":
+            return self.route_prefix is None or subject.startswith(self.route_prefix)
+        return self.pdf_id is None or subject == self.pdf_id
+
+
+@dataclass
+class ProfileRecord:
+    """A stored profile"""
+
+    id: str
+    rule_id: str
+    target: str
+    subject: str
+    mode: str
+    object_name: str
+    content_type: str
+    started_at: datetime
+    duration_s: float
+    size_bytes: int
+    truncated: bool
+    request_id: Optional[str] = None
+
+
+class StackSampler:
+    """
+    Wall-clock sampler of every busy thread's Python stack
+
+    Produces a speedscope "sampled" profile per thread. Threads parked
+    waiting for work are skipped; the event-loop thread is always sampled so
+    time spent awaiting I/O shows up under the selector.
+    """
+
+    def __init__(self, interval: float, loop_thread_id: int):
+        self.interval = interval
+        self.loop_thread_id = loop_thread_id
+        self._frames: List[Dict] = []
+        self._frame_index: Dict[Tuple[str, str, int], int] = {}
+        # thread id -> (name, samples, weights)
+        self._threads: Dict[int, Tuple[str, List[List[int]], List[float]]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.start_time = 0.0
+        self.end_time = 0.0
+
+    def start(self) -> None:
+        self.start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.end_time = time.perf_counter()
+
+    def _frame_id(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self._frames)
+            self._frames.append({"name": key[0], "file": key[1], "line": key[2]})
+        return index
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            names = {t.ident: t.name for t in threading.enumerate()}
+            frame = None
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                code = frame.f_code
+                if thread_id != self.loop_thread_id and (
+                    (code.co_filename.rsplit("/", 1)[-1], code.co_name) in _IDLE_FRAMES
+                ):
+                    continue
+                stack: List[int] = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(self._frame_id(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+
+                name = names.get(thread_id, str(thread_id))
+                if thread_id == self.loop_thread_id:
+                    name = f"{name} (event loop)"
+                _, samples, weights = self._threads.setdefault(thread_id, (name, [], []))
+                # Merge runs of identical stacks to keep profiles small
+                if samples and samples[-1] == stack:
+                    weights[-1] += weight
+                else:
+                    samples.append(stack)
+                    weights.append(weight)
+            # Don't keep the last sampled frame (and its locals) alive
+            del frame
+
+    def speedscope(self, name: str) -> bytes:
+        """Serialise the samples as a speedscope file"""
+        duration = self.end_time - self.start_time
+        profiles = []
+        for thread_name, samples, weights in self._threads.values():
+            profiles.append(
+                {
+                    "type": "sampled",
+                    "name": thread_name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": duration,
+                    "samples": samples,
+                    "weights": weights,
+                }
+            )
+        return orjson.dumps(
+            {
+                "$schema": "https://www.speedscope.app/file-format-schema.json",
+                "name": name,
+                "exporter": settings.app_name,
+                "shared": {"frames": self._frames},
+                "profiles": profiles,
+            }
+        )
+
+
+class ProfilingService:
+    """Armed profiling rules, capture scheduling and profile storage"""
+
+    def __init__(self):
+        self._rules: Dict[str, ProfileRule] = {}
+        self._profiles: Deque[ProfileRecord] = deque(maxlen=RECENT_PROFILES)
+        # (end monotonic time, duration) of recent captures for the duty-cycle budget
+        self._history: Deque[Tuple[float, float]] = deque()
+        self._active = False
+
+    def arm(
+        self,
+        target: str,
+        mode: str,
+        count: int,
+        expires_in_s: int,
+        created_by: str,
+        route_prefix: Optional[str] = None,
+        pdf_id: Optional[str] = None,
+    ) -> ProfileRule:
+        """
+        Profile the next `count` runs matching a route prefix or pdf id
+
+        Args:
+            target: "request" or "pdf_ingest"
+            mode: "cprofile" or "sampling"
+            count: Number of runs to capture
+            expires_in_s: Seconds after which the rule is dropped
+            created_by: Admin who armed the rule
+            route_prefix: Request path prefix (requests only; None matches all)
+            pdf_id: PDF to profile (ingestion only; None matches all)
+
+        Returns:
+            The armed rule
+        """
+        rule = ProfileRule(
+            id=uuid.uuid4().hex,
+            target=target,
+            mode=mode,
+            remaining=count,
+            expires_at=datetime.now(timezone.utc) + timedelta(seconds=expires_in_s),
+            created_by=created_by,
+            route_prefix=route_prefix,
+            pdf_id=pdf_id,
+        )
+        self._rules[rule.id] = rule
+        logger.info(
+            f"Armed {mode} profiling of {count} {target} runs "
+            f"({route_prefix or pdf_id or 'any'}) by {created_by}"
+        )
+        return rule
+
+    def disarm(self, rule_id: str) -> bool:
+        return self._rules.pop(rule_id, None) is not None
+
+    def rules(self) -> List[ProfileRule]:
+        self._expire()
+        return list(self._rules.values())
+
+    def profiles(self) -> List[ProfileRecord]:
+        return list(reversed(self._profiles))
+
+    def get_profile(self, profile_id: str) -> Optional[ProfileRecord]:
+        for record in self._profiles:
+            if record.id == profile_id:
+                return record
+        return None
+
+    def _expire(self) -> None:
+        now = datetime.now(timezone.utc)
+        for rule_id in [
+            r.id for r in self._rules.values() if r.expires_at <= now or r.remaining <= 0
+        ]:
+            del self._rules[rule_id]
+
+    def _within_budget(self) -> bool:
+        now = time.monotonic()
+        while self._history and self._history[0][0] < now - DUTY_CYCLE_WINDOW_SECONDS:
+            self._history.popleft()
+        spent = sum(duration for _, duration in self._history)
+        return spent < settings.profiling_max_duty_cycle * DUTY_CYCLE_WINDOW_SECONDS
+
+    def _claim(self, target: str, subject: str) -> Optional[ProfileRule]:
+        """Pick the rule that will profile this run (checks are synchronous, so race-free)"""
+        if not self._rules or self._active:
+            return None
+        self._expire()
+        for rule in self._rules.values():
+            if rule.matches(target, subject):
+                if not self._within_budget():
+                    logger.info(f"Skipping {target} profile of {subject}: duty-cycle budget spent")
+                    return None
+                rule.remaining -= 1
+                self._active = True
+                return rule
+        return None
+
+    @asynccontextmanager
+    async def capture(self, target: str, subject: str) -> AsyncIterator[Optional[ProfileRule]]:
+        """
+        Profile the enclosed block if an armed rule matches
+
+        Must be entered on the event-loop thread. The profile is stored when
+        the block exits (even if it raises).
+
+        Args:
+            target: "request" or "pdf_ingest"
+            subject: Request path or pdf id
+
+        Yields:
+            The matching rule, or None when the block is not profiled
+        """
+        rule = self._claim(target, subject)
+        if rule is None:
+            yield None
+            return
+
+        loop = asyncio.get_running_loop()
+        max_seconds = settings.profiling_max_capture_seconds
+        profiler: Optional[cProfile.Profile] = None
+        sampler: Optional[StackSampler] = None
+        stopped = False
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        request_id = current_request_id()
+
+        def stop() -> None:
+            nonlocal stopped
+            if stopped:
+                return
+            stopped = True
+            if profiler is not None:
+                profiler.disable()
+            if sampler is not None:
+                sampler.stop()
+
+        if rule.mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            sampler = StackSampler(
+                settings.profiling_sample_interval_ms / 1000, threading.get_ident()
+            )
+            sampler.start()
+        # Hard cap: runs on the loop thread, where cProfile was enabled
+        cutoff = loop.call_later(max_seconds, stop)
+        try:
+            yield rule
+        finally:
+            truncated = stopped
+            cutoff.cancel()
+            stop()
+            duration = min(time.perf_counter() - start, max_seconds)
+            self._history.append((time.monotonic(), duration))
+            self._active = False
+            try:
+                await self._store(
+                    rule, subject, profiler, sampler, started_at, duration, truncated, request_id
+                )
+            except Exception as e:
+                logger.error(f"Error storing {rule.mode} profile for {subject}: {e}")
+
+    def wrap(self, target: str, subject: str, fn):
+        """Wrap an async function so each call runs inside capture()"""
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            async with self.capture(target, subject):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    async def _store(
+        self,
+        rule: ProfileRule,
+        subject: str,
+        profiler: Optional[cProfile.Profile],
+        sampler: Optional[StackSampler],
+        started_at: datetime,
+        duration: float,
+        truncated: bool,
+        request_id: Optional[str],
+    ) -> None:
+        profile_id = uuid.uuid4().hex
+        extension, content_type = PROFILE_FORMATS[rule.mode]
+        if profiler is not None:
+            profiler.create_stats()
+            # Same encoding as Profile.dump_stats, loadable with pstats.Stats
+            data = marshal.dumps(profiler.stats)
+        else:
+            name = f"{rule.target} {subject} ({started_at.isoformat()})"
+            data = await asyncio.to_thread(sampler.speedscope, name)
+
+        object_name = f"{PROFILE_PREFIX}{profile_id}.{extension}"
+        await storage.upload_bytes(object_name, data, content_type)
+
+        record = ProfileRecord(
+            id=profile_id,
+            rule_id=rule.id,
+            target=rule.target,
+            subject=subject,
+            mode=rule.mode,
+            object_name=object_name,
+            content_type=content_type,
+            started_at=started_at,
+            duration_s=round(duration, 3),
+            size_bytes=len(data),
+            truncated=truncated,
+            request_id=request_id,
+        )
+        self._profiles.append(record)
+        rule.profile_ids.append(profile_id)
+        logger.info(
+            f"Stored {rule.mode} profile {profile_id} of {rule.target} {subject} "
+            f"({duration:.2f}s, {len(data)} bytes)"
+        )
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling HTTP requests that match an armed rule"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        async with profiling_service.capture("request", scope["path"]):
+            await self.app(scope, receive, send)
+
+
+# Global profiling service instance
+profiling_service = ProfilingService()
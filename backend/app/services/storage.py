@@ -0,0 +1,356 @@
+import asyncio
+import functools
+import logging
+import mimetypes
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Optional
+
+import aiofiles
+import aiofiles.os
+
+from app.config import settings
+from app.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class StorageBusyError(Exception):
+    """Raised when every streamed-upload slot is in use"""
+
+
+class ObjectStorage(ABC):
+    """Async object storage interface used by request handlers and jobs"""
+
+    @abstractmethod
+    async def upload_bytes(
+        self, object_name: str, data: bytes, content_type: str = "application/pdf"
+    ) -> None:
+        """Upload bytes to an object"""
+
+    @abstractmethod
+    async def upload_file(self, object_name: str, file_path: str) -> None:
+        """Upload a local file to an object"""
+
+    @abstractmethod
+    async def upload_fileobj(
+        self,
+        object_name: str,
+        fileobj: BinaryIO,
+        length: int,
+        content_type: str = "application/octet-stream",
+    ) -> None:
+        """Upload length bytes (-1: read to EOF) from a blocking file object, in chunks"""
+
+    @abstractmethod
+    async def upload_stream(
+        self,
+        object_name: str,
+        chunks: AsyncIterator[bytes],
+        content_type: str = "application/octet-stream",
+    ) -> int:
+        """
+        Upload an async stream of unknown length as it is produced
+
+        An exception raised by the stream aborts the upload and propagates.
+
+        Returns:
+            Number of bytes uploaded
+        """
+
+    @abstractmethod
+    async def download_file_bytes(self, object_name: str) -> bytes:
+        """Download an object as bytes"""
+
+    @abstractmethod
+    async def download_file(self, object_name: str, file_path: str) -> None:
+        """Download an object to a local file"""
+
+    @abstractmethod
+    async def delete_file(self, object_name: str) -> None:
+        """Delete an object"""
+
+    @abstractmethod
+    async def file_exists(self, object_name: str) -> bool:
+        """Check whether an object exists"""
+
+    @abstractmethod
+    async def get_file_info(self, object_name: str) -> Optional[dict]:
+        """Get object metadata, or None if it does not exist"""
+
+    @asynccontextmanager
+    async def spooled_download(self, object_name: str, suffix: str = "") -> AsyncIterator[str]:
+        """
+        Stream an object to a temporary file and yield its path
+
+        The object is written in chunks, so memory use stays flat regardless of
+        object size. The temporary directory is removed on exit.
+
+        Args:
+            object_name: Object key
+            suffix: File suffix for the temporary file (e.g. ".pdf")
+
+        Yields:
+            Path of the downloaded file
+        """
+        tmp_dir = await asyncio.to_thread(
+            tempfile.mkdtemp, prefix="chatpdf-", dir=settings.ingest_spool_dir
+        )
+        try:
+            path = os.path.join(tmp_dir, f"object{suffix}")
+            await self.download_file(object_name, path)
+            yield path
+        finally:
+            await asyncio.to_thread(shutil.rmtree, tmp_dir, True)
+
+
+class _AsyncChunkReader:
+    """Blocking read() over an async chunk stream, for clients running in a worker thread
+
+    Each read pulls the next chunk from the event loop on demand, so at most
+    one chunk is buffered here and the producer is paced by the upload.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes], loop: asyncio.AbstractEventLoop):
+        self._chunks = chunks.__aiter__()
+        self._loop = loop
+        self._buffer = b""
+        self._eof = False
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._buffer and not self._eof:
+            future = asyncio.run_coroutine_threadsafe(self._chunks.__anext__(), self._loop)
+            try:
+                self._buffer = future.result()
+            except StopAsyncIteration:
+                self._eof = True
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        self.bytes_read += len(data)
+        return data
+
+
+class MinIOStorage(ObjectStorage):
+    """Executor-backed adapter over the blocking MinIO client
+
+    Blocking calls run on a dedicated thread pool sized to match the MinIO
+    client's HTTP connection pool, so transfers never stall the event loop.
+    Streamed uploads hold a thread for as long as the client takes to send
+    the body, so they run on a separate, smaller pool and are refused with
+    StorageBusyError once it is full rather than queueing.
+    """
+
+    def __init__(self, max_workers: int, max_stream_uploads: int):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="object-storage"
+        )
+        self._stream_executor = ThreadPoolExecutor(
+            max_workers=max_stream_uploads, thread_name_prefix="object-storage-stream"
+        )
+        self._max_stream_uploads = max_stream_uploads
+        # Counted on the event loop; a slot is freed when its thread finishes
+        self._stream_uploads = 0
+
+    @functools.cached_property
+    def service(self):
+        # Imported lazily: the MinIO service connects to the server on import
+        from app.services.minio_service import minio_service
+
+        return minio_service
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Every adapter method passes the object name first
+        with span(f"storage {fn.__name__}", kind="client", **{"storage.object": args[0]}):
+            return await loop.run_in_executor(
+                self._executor, functools.partial(fn, *args, **kwargs)
+            )
+
+    async def upload_bytes(
+        self, object_name: str, data: bytes, content_type: str = "application/pdf"
+    ) -> None:
+        await self._run(self.service.upload_bytes, object_name, data, content_type)
+
+    async def upload_file(self, object_name: str, file_path: str) -> None:
+        await self._run(self.service.upload_file, object_name, file_path)
+
+    async def upload_fileobj(
+        self,
+        object_name: str,
+        fileobj: BinaryIO,
+        length: int,
+        content_type: str = "application/octet-stream",
+    ) -> None:
+        await self._run(self.service.upload_fileobj, object_name, fileobj, length, content_type)
+
+    async def upload_stream(
+        self,
+        object_name: str,
+        chunks: AsyncIterator[bytes],
+        content_type: str = "application/octet-stream",
+    ) -> int:
+        if self._stream_uploads >= self._max_stream_uploads:
+            raise StorageBusyError("All streamed-upload slots are in use")
+        loop = asyncio.get_running_loop()
+        reader = _AsyncChunkReader(chunks, loop)
+        self._stream_uploads += 1
+        try:
+            # Length unknown: the client reads part-sized blocks until EOF
+            job = self._stream_executor.submit(
+                self.service.upload_fileobj, object_name, reader, -1, content_type
+            )
+        except Exception:
+            self._stream_uploads -= 1
+            raise
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release_stream_slot))
+        with span("storage upload_stream", kind="client", **{"storage.object": object_name}):
+            await asyncio.wrap_future(job)
+        return reader.bytes_read
+
+    def _release_stream_slot(self) -> None:
+        self._stream_uploads -= 1
+
+    async def download_file_bytes(self, object_name: str) -> bytes:
+        return await self._run(self.service.download_file_bytes, object_name)
+
+    async def download_file(self, object_name: str, file_path: str) -> None:
+        await self._run(self.service.download_file, object_name, file_path)
+
+    async def delete_file(self, object_name: str) -> None:
+        await self._run(self.service.delete_file, object_name)
+
+    async def file_exists(self, object_name: str) -> bool:
+        return await self._run(self.service.file_exists, object_name)
+
+    async def get_file_info(self, object_name: str) -> Optional[dict]:
+        return await self._run(self.service.get_file_info, object_name)
+
+
+class LocalFilesystemStorage(ObjectStorage):
+    """Stores objects as files under a root directory (tests and benchmarks)"""
+
+    def __init__(self, root: str):
+        self.root = Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, object_name: str) -> Path:
+        path = (self.root / object_name).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"Invalid object name: {object_name}")
+        return path
+
+    async def upload_bytes(
+        self, object_name: str, data: bytes, content_type: str = "application/pdf"
+    ) -> None:
+        path = self._path(object_name)
+        await aiofiles.os.makedirs(path.parent, exist_ok=True)
+        async with aiofiles.open(path, "wb") as f:
+            await f.write(data)
+        logger.info(f"Stored bytes at {object_name}")
+
+    async def upload_file(self, object_name: str, file_path: str) -> None:
+        path = self._path(object_name)
+        await aiofiles.os.makedirs(path.parent, exist_ok=True)
+        await asyncio.to_thread(shutil.copyfile, file_path, path)
+        logger.info(f"Stored {file_path} at {object_name}")
+
+    async def upload_fileobj(
+        self,
+        object_name: str,
+        fileobj: BinaryIO,
+        length: int,
+        content_type: str = "application/octet-stream",
+    ) -> None:
+        path = self._path(object_name)
+        await aiofiles.os.makedirs(path.parent, exist_ok=True)
+
+        def copy() -> int:
+            # A negative length means read until EOF, as with MinIO
+            remaining = length if length >= 0 else None
+            written = 0
+            with open(path, "wb") as out:
+                while remaining is None or remaining > 0:
+                    size = COPY_CHUNK_SIZE if remaining is None else min(COPY_CHUNK_SIZE, remaining)
+                    chunk = fileobj.read(size)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    written += len(chunk)
+                    if remaining is not None:
+                        remaining -= len(chunk)
+            return written
+
+        written = await asyncio.to_thread(copy)
+        logger.info(f"Stored {written} bytes at {object_name}")
+
+    async def upload_stream(
+        self,
+        object_name: str,
+        chunks: AsyncIterator[bytes],
+        content_type: str = "application/octet-stream",
+    ) -> int:
+        path = self._path(object_name)
+        await aiofiles.os.makedirs(path.parent, exist_ok=True)
+        size = 0
+        try:
+            async with aiofiles.open(path, "wb") as f:
+                async for chunk in chunks:
+                    await f.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            await asyncio.to_thread(path.unlink, True)
+            raise
+        logger.info(f"Stored {size} bytes at {object_name}")
+        return size
+
+    async def download_file_bytes(self, object_name: str) -> bytes:
+        async with aiofiles.open(self._path(object_name), "rb") as f:
+            return await f.read()
+
+    async def download_file(self, object_name: str, file_path: str) -> None:
+        await asyncio.to_thread(shutil.copyfile, self._path(object_name), file_path)
+
+    async def delete_file(self, object_name: str) -> None:
+        await aiofiles.os.remove(self._path(object_name))
+        logger.info(f"Deleted {object_name}")
+
+    async def file_exists(self, object_name: str) -> bool:
+        return await aiofiles.os.path.isfile(self._path(object_name))
+
+    async def get_file_info(self, object_name: str) -> Optional[dict]:
+        path = self._path(object_name)
+        try:
+            stat = await aiofiles.os.stat(path)
+        except FileNotFoundError:
+            return None
+        return {
+            "size": stat.st_size,
+            "last_modified": stat.st_mtime,
+            "content_type": mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+            "etag": f"{stat.st_mtime_ns:x}-{stat.st_size:x}",
+        }
+
+
+def create_storage() -> ObjectStorage:
+    """Create the storage backend selected by settings.storage_backend"""
+    if settings.storage_backend == "local":
+        return LocalFilesystemStorage(settings.storage_local_root)
+    if settings.storage_backend == "minio":
+        return MinIOStorage(
+            max_workers=settings.storage_max_workers,
+            max_stream_uploads=settings.storage_stream_upload_workers,
+        )
+    raise ValueError(f"Unknown storage backend: {settings.storage_backend}")
+
+
+# Global storage instance
+storage = create_storage()
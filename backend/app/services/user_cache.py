@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+
+from app.config import settings
+from app.db.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+class UserCache:
+    """TTL cache of active-user snapshots keyed by user id
+
+    Snapshots are plain column dicts; each hit builds a fresh detached User so
+    concurrent requests never share (or mutate) the same instance. A detached
+    user can still be passed to ``db.add`` to persist changes.
+
+    Invalidation times are remembered for one TTL so that a snapshot loaded
+    before an invalidation (and stored after it) is not cached.
+    """
+
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._invalidated: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._columns = [attr.key for attr in inspect(User).column_attrs]
+
+    def get(self, user_id: str) -> Optional[User]:
+        if self.ttl_seconds <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, snapshot = entry
+            if expires_at <= now:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return user
+
+    def set(self, user: User, loaded_at: Optional[float] = None) -> None:
+        """
+        Cache a snapshot of a user
+
+        Args:
+            user: User as loaded from the database
+            loaded_at: time.monotonic() from before the user was loaded; the
+                snapshot is dropped if the user was invalidated since then
+        """
+        if self.ttl_seconds <= 0:
+            return
+        user_id = str(user.id)
+        if not user.is_active:
+            self.invalidate(user_id)
+            return
+        snapshot = {key: getattr(user, key) for key in self._columns}
+        with self._lock:
+            invalidated_at = self._invalidated.get(user_id)
+            if loaded_at is not None and invalidated_at is not None and invalidated_at >= loaded_at:
+                return
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, snapshot)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        user_id = str(user_id)
+        now = time.monotonic()
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._invalidated[user_id] = now
+            self._invalidated.move_to_end(user_id)
+            # Oldest first: drop those no in-flight load can predate
+            while self._invalidated and (
+                next(iter(self._invalidated.values())) <= now - self.ttl_seconds
+                or len(self._invalidated) > self.max_size
+            ):
+                self._invalidated.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._invalidated.clear()
+
+
+user_cache = UserCache(
+    ttl_seconds=settings.user_cache_ttl_seconds,
+    max_size=settings.user_cache_max_size,
+)
+
+
+# Session.info key for users changed in the session's current transaction
+_PENDING_INVALIDATIONS = "user_cache_invalidations"
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_change(mapper, connection, target: User) -> None:
+    # Catches profile edits, password changes and deactivation made through the ORM.
+    # This runs at flush: other sessions read (and may re-cache) the old row until
+    # the commit, so the user is invalidated again once the change is committed
+    user_id = str(target.id)
+    user_cache.invalidate(user_id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_INVALIDATIONS, set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    for user_id in session.info.pop(_PENDING_INVALIDATIONS, ()):
+        user_cache.invalidate(user_id)
@@ -6,6 +6,7 @@ import logging
 from app.db.models import PDFChunk
 from app.services.embeddings import embedding_service
 from app.config import settings
+from app.utils.timing import timed
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +40,8 @@ class VectorStoreService:
 
         try:
             # Generate query embedding
-            query_embedding = await embedding_service.generate_embedding(query)
+            with timed("embed"):
+                query_embedding = await embedding_service.generate_embedding(query)
 
             # Perform vector similarity search using pgvector
             # cosine_distance returns 0 for identical vectors, 2 for opposite
@@ -56,8 +58,9 @@ class VectorStoreService:
                 .limit(top_k)
             )
 
-            result = await db.execute(stmt)
-            rows = result.all()
+            with timed("search"):
+                result = await db.execute(stmt)
+                rows = result.all()
 
             # Filter by similarity threshold and format results
             similar_chunks = []
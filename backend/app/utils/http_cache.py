@@ -0,0 +1,45 @@
+"""Conditional request (ETag) helpers"""
+
+import hashlib
+from typing import Iterable, Optional
+
+
+def compute_etag(parts: Iterable[object]) -> str:
+    """
+    Compute a weak ETag from the values that identify a response
+
+    Args:
+        parts: Values that change whenever the response body would change
+
+    Returns:
+        Quoted weak ETag, e.g. W/"1a2b..."
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return f'W/"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag (weak comparison)
+
+    Args:
+        if_none_match: Raw If-None-Match header value
+        etag: Current ETag
+
+    Returns:
+        True if the client's cached representation is still current
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    def opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    current = opaque(etag)
+    return any(opaque(tag) == current for tag in if_none_match.split(","))
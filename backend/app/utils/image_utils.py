@@ -0,0 +1,107 @@
+"""Image preprocessing for vision model requests"""
+
+import io
+import logging
+import math
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# OpenAI high-detail processing: fit within 2048x2048, then scale the short
+# side down to 768px, then bill per 512px tile
+VISION_MAX_SIDE = 2048
+VISION_SHORT_SIDE = 768
+VISION_TILE = 512
+# Shrink a side by up to this fraction if that saves a whole row/column of tiles
+TILE_SNAP_TOLERANCE = 0.1
+
+JPEG_QUALITY = 85
+
+# Bytes needed to recognise every supported format
+SNIFF_LENGTH = 12
+
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """
+    Identify a supported image format from its leading bytes
+
+    Args:
+        header: At least the first SNIFF_LENGTH bytes of the file
+
+    Returns:
+        MIME type ("image/png", "image/jpeg" or "image/webp"), or None
+    """
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def vision_target_size(width: int, height: int) -> Tuple[int, int]:
+    """
+    Compute the tile-optimal size for a high-detail vision request
+
+    Mirrors the provider's own downscaling (so nothing visible is lost) and
+    then trims sides that barely spill into an extra tile.
+
+    Args:
+        width: Original width in pixels
+        height: Original height in pixels
+
+    Returns:
+        Target (width, height), never larger than the original
+    """
+    scale = min(1.0, VISION_MAX_SIDE / max(width, height))
+    w, h = width * scale, height * scale
+    scale = min(1.0, VISION_SHORT_SIDE / min(w, h))
+    w, h = w * scale, h * scale
+
+    snap = 1.0
+    for side in (w, h):
+        lower = (math.ceil(side / VISION_TILE) - 1) * VISION_TILE
+        if lower > 0 and side <= lower * (1 + TILE_SNAP_TOLERANCE):
+            snap = min(snap, lower / side)
+
+    return max(1, int(w * snap)), max(1, int(h * snap))
+
+
+def prepare_vision_image(data: bytes) -> bytes:
+    """
+    Downscale and re-encode an image for a vision request
+
+    Args:
+        data: Original image bytes (PNG, JPEG or WEBP)
+
+    Returns:
+        JPEG bytes at the tile-optimal resolution
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        original_format = original.format
+        img = ImageOps.exif_transpose(original)
+        target = vision_target_size(*img.size)
+
+        # Already small JPEGs are sent as-is rather than re-encoded
+        if target == img.size and original_format == "JPEG":
+            return data
+
+        if target != img.size:
+            img = img.resize(target, Image.LANCZOS)
+
+        if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+            rgba = img.convert("RGBA")
+            background = Image.new("RGB", rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+
+    logger.debug(f"Prepared vision image at {target[0]}x{target[1]} ({len(out.getvalue())} bytes)")
+    return out.getvalue()
@@ -0,0 +1,187 @@
+"""Event-loop lag monitoring with stack capture of blocking code
+
+A heartbeat task sleeps for a fixed interval and measures how late it wakes
+up; the delay is time the loop spent running something else without
+yielding. A watchdog thread notices while the loop is still blocked and
+snapshots the loop thread's stack, so the report names the code that was
+blocking rather than whatever ran next.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from app.config import settings
+from app.utils.metrics import metrics, percentile
+
+logger = logging.getLogger(__name__)
+
+# Frames kept in a slow-callback report (innermost last)
+MAX_REPORT_FRAMES = 25
+# Samples between refreshes of the lag quantile gauges
+QUANTILE_REFRESH_SAMPLES = 50
+# Lag samples kept for the quantile gauges
+WINDOW_SECONDS = 60
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASYNCIO_ROOT = os.path.dirname(asyncio.__file__)
+
+loop_lag_seconds = metrics.histogram(
+    "event_loop_lag_seconds",
+    "Delay between a heartbeat's scheduled and actual wake-up",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+loop_lag_quantiles = metrics.gauge(
+    "event_loop_lag_quantile_seconds",
+    f"Event-loop lag quantiles over the last {WINDOW_SECONDS} seconds",
+)
+slow_callbacks = metrics.counter(
+    "event_loop_slow_callbacks_total",
+    "Times the event loop was blocked for longer than the slow-callback threshold",
+)
+
+
+def _blocking_site(frames: List[traceback.FrameSummary]) -> Optional[traceback.FrameSummary]:
+    """Innermost frame in application code (the call that blocked, or its caller)"""
+    for frame in reversed(frames):
+        if frame.filename.startswith(APP_ROOT) and frame.filename != __file__:
+            return frame
+    return frames[-1] if frames else None
+
+
+class LoopLagMonitor:
+    """
+    Measure event-loop lag and report callbacks that block it
+
+    Args:
+        interval: Heartbeat period in seconds
+        threshold: Lag in seconds above which a block is reported
+        report_interval: Minimum seconds between logged reports (others are
+            counted and summarised in the next report)
+    """
+
+    def __init__(self, interval: float, threshold: float, report_interval: float):
+        self.interval = interval
+        self.threshold = threshold
+        self.report_interval = report_interval
+        self._samples: Deque[float] = deque(maxlen=max(1, int(WINDOW_SECONDS / interval)))
+        self._since_refresh = 0
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        # perf_counter() when the heartbeat last went to sleep
+        self._last_tick: Optional[float] = None
+        # (tick, frames) captured by the watchdog during the current block
+        self._captured: Optional[Tuple[float, List[traceback.FrameSummary]]] = None
+        self._last_report = 0.0
+        self._suppressed = 0
+
+    def start(self) -> None:
+        """Start monitoring the running event loop"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(
+            f"Event-loop lag monitor started (interval {self.interval * 1000:.0f} ms, "
+            f"threshold {self.threshold * 1000:.0f} ms)"
+        )
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._watchdog.join(timeout=1)
+        self._watchdog = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            tick = time.perf_counter()
+            self._last_tick = tick
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - tick - self.interval)
+            self._observe(lag)
+            if lag >= self.threshold:
+                captured = self._captured
+                frames = captured[1] if captured is not None and captured[0] == tick else None
+                self._report(lag, frames)
+
+    def _observe(self, lag: float) -> None:
+        loop_lag_seconds.observe(lag)
+        self._samples.append(lag)
+        self._since_refresh += 1
+        if self._since_refresh >= QUANTILE_REFRESH_SAMPLES:
+            self._since_refresh = 0
+            ordered = sorted(self._samples)
+            for quantile, pct in (("0.5", 50), ("0.9", 90), ("0.99", 99), ("1", 100)):
+                loop_lag_quantiles.set(percentile(ordered, pct), quantile=quantile)
+
+    def _watch(self) -> None:
+        # Poll often enough to catch a block before it reaches 1.5x the threshold
+        poll = self.threshold / 2
+        while not self._stop.wait(poll):
+            tick = self._last_tick
+            if tick is None:
+                continue
+            blocked = time.perf_counter() - tick - self.interval
+            if blocked < self.threshold:
+                continue
+            if self._captured is not None and self._captured[0] == tick:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                # The event loop's own frames are the same in every report
+                frames = [
+                    f
+                    for f in traceback.extract_stack(frame)
+                    if not f.filename.startswith(ASYNCIO_ROOT)
+                ]
+                self._captured = (tick, frames[-MAX_REPORT_FRAMES:])
+            del frame
+
+    def _report(self, lag: float, frames: Optional[List[traceback.FrameSummary]]) -> None:
+        slow_callbacks.inc()
+        now = time.monotonic()
+        if now - self._last_report < self.report_interval:
+            self._suppressed += 1
+            return
+        self._last_report = now
+        suppressed, self._suppressed = self._suppressed, 0
+
+        if frames:
+            site = _blocking_site(frames)
+            filename = os.path.relpath(site.filename, os.path.dirname(APP_ROOT))
+            location = f"{filename}:{site.lineno} in {site.name}"
+            stack = "".join(traceback.format_list(frames))
+        else:
+            # The block ended before the watchdog sampled it
+            location, stack = "unknown (block ended before it was sampled)", ""
+        more = f" ({suppressed} more since last report)" if suppressed else ""
+        logger.warning(
+            f"Event loop blocked for {lag * 1000:.0f} ms at {location}{more}"
+            + (f"\nBlocking stack (most recent call last):\n{stack}" if stack else "")
+        )
+
+
+# Global monitor instance (started in the app lifespan when enabled)
+loop_monitor = LoopLagMonitor(
+    interval=settings.loop_monitor_interval_ms / 1000,
+    threshold=settings.loop_monitor_threshold_ms / 1000,
+    report_interval=settings.loop_monitor_report_interval_s,
+)
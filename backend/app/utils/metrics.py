@@ -0,0 +1,267 @@
+"""In-process metrics: counters, gauges, histograms and Prometheus text exposition"""
+
+import bisect
+import math
+import threading
+from typing import Dict, List, Sequence, Tuple, Union
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Seconds; spans sub-millisecond cache hits up to multi-minute ingestion stages
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+)
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1.0, **labels: str) -> None:
+        """
+        Increment the counter
+
+        Args:
+            value: Amount to add (must be non-negative)
+            labels: Label values identifying the series
+        """
+        if value < 0:
+            raise ValueError("Counter can only be incremented by non-negative amounts")
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def values(self) -> Dict[LabelKey, float]:
+        """Return a snapshot of all series"""
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge:
+    """Point-in-time value with optional labels"""
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def values(self) -> Dict[LabelKey, float]:
+        """Return a snapshot of all series"""
+        with self._lock:
+            return dict(self._values)
+
+
+class HistogramSeries:
+    """Bucket counts, sum and count of one labelled histogram series"""
+
+    __slots__ = ("bucket_counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.bucket_counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with optional labels
+
+    Observing is a binary search plus three additions under a lock, cheap
+    enough to leave on for every request.
+    """
+
+    def __init__(self, name: str, description: str = "", buckets: Sequence[float] = None):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets or DEFAULT_BUCKETS))
+        self._series: Dict[LabelKey, HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Record one observation
+
+        Args:
+            value: Observed value (seconds for latency histograms)
+            labels: Label values identifying the series
+        """
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # One extra slot for observations above the largest bucket (+Inf)
+                series = self._series[key] = HistogramSeries(len(self.buckets) + 1)
+            series.bucket_counts[index] += 1
+            series.sum += value
+            series.count += 1
+
+    def values(self) -> Dict[LabelKey, Dict]:
+        """Return a snapshot of all series with cumulative bucket counts"""
+        with self._lock:
+            snapshot = {
+                key: (list(series.bucket_counts), series.sum, series.count)
+                for key, series in self._series.items()
+            }
+        result = {}
+        for key, (counts, total, count) in snapshot.items():
+            cumulative, running = [], 0
+            for bucket_count in counts:
+                running += bucket_count
+                cumulative.append(running)
+            result[key] = {"buckets": cumulative, "sum": total, "count": count}
+        return result
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+
+class MetricsRegistry:
+    """Registry of named metrics for the process"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, factory) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = factory()
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        """Get or create a counter by name"""
+        return self._get_or_create(name, lambda: Counter(name, description))
+
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        """Get or create a gauge by name"""
+        return self._get_or_create(name, lambda: Gauge(name, description))
+
+    def histogram(
+        self, name: str, description: str = "", buckets: Sequence[float] = None
+    ) -> Histogram:
+        """Get or create a histogram by name"""
+        return self._get_or_create(name, lambda: Histogram(name, description, buckets))
+
+    def collect(self) -> Dict[str, Metric]:
+        """Return all registered metrics"""
+        with self._lock:
+            return dict(self._metrics)
+
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format (0.0.4)"""
+        lines: List[str] = []
+        for name, metric in sorted(self.collect().items()):
+            if metric.description:
+                lines.append(f"# HELP {name} {_escape_help(metric.description)}")
+            if isinstance(metric, (Counter, Gauge)):
+                lines.append(
+                    f"# TYPE {name} {'counter' if isinstance(metric, Counter) else 'gauge'}"
+                )
+                for key, value in sorted(metric.values().items()):
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+            else:
+                lines.append(f"# TYPE {name} histogram")
+                bounds = [_format_value(b) for b in metric.buckets] + ["+Inf"]
+                for key, series in sorted(metric.values().items()):
+                    for bound, count in zip(bounds, series["buckets"]):
+                        labels = _format_labels(key + (("le", bound),))
+                        lines.append(f"{name}_bucket{labels} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(series['sum'])}")
+                    lines.append(f"{name}_count{_format_labels(key)} {series['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a sorted, non-empty list"""
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", r"\\").replace("\n", r"\n")
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in key) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else f"{int(value)}"
+
+
+# Global metrics registry
+metrics = MetricsRegistry()
+
+stream_cancellations = metrics.counter(
+    "chat_stream_cancellations_total",
+    "Streaming responses cancelled because the client disconnected",
+)
+stream_tokens_saved = metrics.counter(
+    "chat_stream_tokens_saved_total",
+    "Upper-bound estimate of completion tokens not generated after a cancellation",
+)
+stream_retrieval_seconds = metrics.histogram(
+    "chat_stream_retrieval_seconds",
+    "Time from request start until retrieval completed",
+)
+stream_first_token_seconds = metrics.histogram(
+    "chat_stream_first_token_seconds",
+    "Time from request start until the first upstream token arrived",
+)
+stream_first_byte_seconds = metrics.histogram(
+    "chat_stream_first_byte_seconds",
+    "Time from request start until the first SSE frame was sent",
+)
+stream_tokens_per_second = metrics.histogram(
+    "chat_stream_tokens_per_second",
+    "Upstream tokens per second between the first and last token",
+    buckets=(5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500),
+)
+stream_inter_token_gap_seconds = metrics.histogram(
+    "chat_stream_inter_token_gap_seconds",
+    "Gap between consecutive upstream tokens",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+stream_tokens = metrics.counter(
+    "chat_stream_tokens_total",
+    "Upstream tokens streamed to clients",
+)
@@ -0,0 +1,114 @@
+"""Streaming access to one file field of a multipart/form-data request
+
+FastAPI's UploadFile is only available after Starlette has read and spooled
+the whole body. MultipartFileStream instead parses the request stream as it
+arrives and hands over the file's bytes chunk by chunk, so a handler can
+validate, hash and forward an upload in a single pass and stop reading as
+soon as it decides to reject it.
+"""
+
+from typing import AsyncIterator, List, Optional
+
+from starlette.requests import Request
+
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    import multipart
+    from multipart.multipart import parse_options_header
+
+
+class MultipartStreamError(ValueError):
+    """The body is not multipart/form-data or does not contain the file field"""
+
+
+class MultipartFileStream:
+    """
+    Yield the contents of a single file field while the body is being received
+
+    Other fields are parsed and discarded. Only the first part named
+    field_name that carries a filename is streamed.
+
+    Args:
+        request: Incoming request (its body must not have been read yet)
+        field_name: Form field holding the file
+    """
+
+    def __init__(self, request: Request, field_name: str):
+        self.request = request
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._in_file = False
+        self._file_done = False
+        self._pending: List[bytes] = []
+
+    def _on_part_begin(self) -> None:
+        self._disposition = b""
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        self._in_file = not self._file_done and name == self.field_name and b"filename" in options
+        if self._in_file:
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self._pending.append(data[start:end])
+
+    def _on_part_end(self) -> None:
+        if self._in_file:
+            self._in_file = False
+            self._file_done = True
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """File contents, in the chunks they arrive in (reading stops after the file part)"""
+        _, params = parse_options_header(self.request.headers.get("content-type", ""))
+        boundary = params.get(b"boundary")
+        if boundary is None:
+            raise MultipartStreamError("Expected a multipart/form-data body")
+
+        parser = multipart.MultipartParser(
+            boundary,
+            {
+                "on_part_begin": self._on_part_begin,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+            },
+        )
+        async for body_chunk in self.request.stream():
+            try:
+                parser.write(body_chunk)
+            except Exception as e:
+                raise MultipartStreamError(f"Malformed multipart body: {e}")
+            pending, self._pending = self._pending, []
+            for data in pending:
+                if data:
+                    yield data
+            if self._file_done:
+                return
+
+        if self.filename is None:
+            raise MultipartStreamError(f"Missing file field '{self.field_name}'")
+        if not self._file_done:
+            raise MultipartStreamError("Multipart body ended before the file did")
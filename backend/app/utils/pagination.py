@@ -0,0 +1,156 @@
+"""Keyset pagination and row-count helpers"""
+
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import UUID
+
+import orjson
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+COUNT_MODES = ("exact", "estimated", "none")
+
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    """
+    Encode a (created_at, id) position as an opaque cursor string
+
+    Args:
+        created_at: Timestamp of the row
+        row_id: Primary key of the row
+
+    Returns:
+        URL-safe cursor string
+    """
+    payload = orjson.dumps([created_at.isoformat(), str(row_id)])
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Cursor string
+
+    Returns:
+        Tuple of (created_at, id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = orjson.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def apply_keyset(stmt, created_col, id_col, cursor: Optional[str], descending: bool = True):
+    """
+    Apply keyset ordering and an optional cursor predicate on (created_at, id)
+
+    Args:
+        stmt: Select statement to extend
+        created_col: created_at column
+        id_col: Primary key column (tie-breaker)
+        cursor: Cursor of the last row already seen, or None for the first page
+        descending: Newest first when True
+
+    Returns:
+        Statement ordered by (created_at, id) and filtered past the cursor
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        position = tuple_(created_col, id_col)
+        if descending:
+            stmt = stmt.where(position < tuple_(created_at, row_id))
+        else:
+            stmt = stmt.where(position > tuple_(created_at, row_id))
+
+    if descending:
+        return stmt.order_by(created_col.desc(), id_col.desc())
+    return stmt.order_by(created_col.asc(), id_col.asc())
+
+
+async def count_rows(db: AsyncSession, model, mode: str = "exact") -> Optional[int]:
+    """
+    Count rows in a model's table
+
+    Args:
+        db: Database session
+        model: ORM model class
+        mode: 'exact' runs SELECT count(*), 'estimated' reads the planner's
+            row estimate from pg_class, 'none' skips counting
+
+    Returns:
+        Row count, or None when mode is 'none'
+    """
+    if mode == "none":
+        return None
+
+    if mode == "estimated":
+        result = await db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+            {"table": model.__tablename__},
+        )
+        estimate = result.scalar_one_or_none()
+        # reltuples is -1 until the table has been vacuumed or analyzed
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+
+    result = await db.execute(select(func.count()).select_from(model))
+    return result.scalar_one()
+
+
+async def fetch_history_page(
+    db: AsyncSession,
+    stmt,
+    created_col,
+    id_col,
+    limit: int,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+) -> Tuple[list, bool]:
+    """
+    Fetch one page of a chronological message history
+
+    Without a cursor the newest `limit` rows are returned. `before` pages
+    backwards from a cursor, `after` returns rows newer than a cursor (for
+    incremental sync).
+
+    Args:
+        db: Database session
+        stmt: Select statement already filtered to one conversation
+        created_col: created_at column
+        id_col: Primary key column
+        limit: Maximum number of rows
+        before: Cursor of the oldest row the client already has
+        after: Cursor of the newest row the client already has
+
+    Returns:
+        Tuple of (rows in chronological order, whether more rows exist in the
+        direction of travel)
+
+    Raises:
+        ValueError: If both cursors are given or a cursor is malformed
+    """
+    if before and after:
+        raise ValueError("Use either 'before' or 'after', not both")
+
+    if after:
+        stmt = apply_keyset(stmt, created_col, id_col, after, descending=False)
+    else:
+        stmt = apply_keyset(stmt, created_col, id_col, before, descending=True)
+
+    result = await db.execute(stmt.limit(limit + 1))
+    rows = result.all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not after:
+        rows.reverse()
+
+    return rows, has_more
@@ -0,0 +1,183 @@
+"""Per-stage resource accounting (RSS, CPU, wall time, allocations)"""
+
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.utils.timing import record_stage
+
+# Allocation sites reported per stage when tracemalloc is on
+TOP_ALLOCATIONS = 5
+# Smaller growth is noise (interpreter caches, queues) rather than the document
+MIN_ALLOCATION_BYTES = 64 * 1024
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+# tracemalloc is process-wide; only one tracker may drive it at a time
+_tracemalloc_lock = threading.Lock()
+_TRACEMALLOC_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes (peak RSS where unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return max_rss()
+
+
+def max_rss() -> int:
+    """Peak RSS over the process lifetime in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class ResourceTracker:
+    """
+    Record wall time, CPU time, peak RSS and (optionally) allocations per stage
+
+    RSS is sampled on a background thread, so the per-stage peak can miss
+    spikes shorter than the sample interval. CPU time and RSS are
+    process-wide: concurrent work in the same process is included.
+
+    Args:
+        sample_interval: Seconds between RSS samples
+        trace_allocations: Run tracemalloc and report the top allocation
+            sites of each stage (slow; meant for a sample of runs). Ignored
+            while another tracker is tracing.
+        checkpoint: Awaited with report() when each stage begins, so the
+            running stage is known even if the process is killed mid-stage
+    """
+
+    def __init__(
+        self,
+        sample_interval: float = 0.02,
+        trace_allocations: bool = False,
+        checkpoint: Optional[Callable[[Dict], Awaitable[None]]] = None,
+    ):
+        self.sample_interval = sample_interval
+        self.trace_allocations = trace_allocations
+        self.checkpoint = checkpoint
+        self.stages: List[Dict] = []
+        self._current: Optional[Dict] = None
+        self._current_start: tuple = ()
+        self._current_peak = 0
+        self._peak = 0
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "ResourceTracker":
+        if self.trace_allocations:
+            if tracemalloc.is_tracing() or not _tracemalloc_lock.acquire(blocking=False):
+                self.trace_allocations = False
+            else:
+                tracemalloc.start()
+        self._peak = current_rss()
+        self._sampler = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._current is not None:
+            if exc_type is not None:
+                self._current["failed"] = True
+            self.end()
+        self._stop.set()
+        self._sampler.join()
+        if self.trace_allocations:
+            tracemalloc.stop()
+            _tracemalloc_lock.release()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.sample_interval):
+            rss = current_rss()
+            if rss > self._current_peak:
+                self._current_peak = rss
+            if rss > self._peak:
+                self._peak = rss
+
+    async def begin(self, stage: str) -> None:
+        """Start a stage (ending the current one, if any)"""
+        if self._current is not None:
+            self.end()
+        self._current = {"stage": stage}
+        # Before the stage's clocks start, so the checkpoint write is not counted
+        if self.checkpoint is not None:
+            await self.checkpoint(self.report())
+        rss = current_rss()
+        self._current["rss_start_bytes"] = rss
+        self._current_peak = rss
+        if self.trace_allocations:
+            tracemalloc.reset_peak()
+            self._snapshot = tracemalloc.take_snapshot().filter_traces(_TRACEMALLOC_FILTERS)
+        self._current_start = (time.perf_counter(), time.process_time())
+
+    def end(self) -> None:
+        """Finish the current stage"""
+        stage, self._current = self._current, None
+        wall = time.perf_counter() - self._current_start[0]
+        rss = current_rss()
+        stage.update(
+            wall_s=round(wall, 3),
+            cpu_s=round(time.process_time() - self._current_start[1], 3),
+            rss_end_bytes=rss,
+            peak_rss_bytes=max(self._current_peak, rss),
+        )
+        self._peak = max(self._peak, rss)
+        if self.trace_allocations:
+            stage["traced_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            snapshot = tracemalloc.take_snapshot().filter_traces(_TRACEMALLOC_FILTERS)
+            diffs = sorted(
+                snapshot.compare_to(self._snapshot, "lineno"),
+                key=lambda d: d.size_diff,
+                reverse=True,
+            )
+            stage["top_allocations"] = [
+                {
+                    "site": f"{diff.traceback[0].filename}:{diff.traceback[0].lineno}",
+                    "size_bytes": diff.size_diff,
+                    "count": diff.count_diff,
+                }
+                for diff in diffs[:TOP_ALLOCATIONS]
+                if diff.size_diff >= MIN_ALLOCATION_BYTES
+            ]
+            self._snapshot = None
+        self.stages.append(stage)
+        record_stage(stage["stage"], wall)
+
+    @asynccontextmanager
+    async def stage(self, name: str) -> AsyncIterator[None]:
+        """Record the enclosed block as a stage (also fed to the stage timing histogram)"""
+        await self.begin(name)
+        try:
+            yield
+        except Exception:
+            self._current["failed"] = True
+            raise
+        finally:
+            if self._current is not None:
+                self.end()
+
+    def report(self) -> Dict:
+        """Finished stages, the running stage (if any) and run totals"""
+        return {
+            "stages": list(self.stages),
+            "running_stage": self._current["stage"] if self._current is not None else None,
+            "peak_rss_bytes": max(self._peak, self._current_peak),
+            "process_max_rss_bytes": max_rss(),
+            "wall_s": round(sum(s["wall_s"] for s in self.stages), 3),
+            "cpu_s": round(sum(s["cpu_s"] for s in self.stages), 3),
+            "tracemalloc": self.trace_allocations,
+        }
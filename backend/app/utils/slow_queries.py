@@ -0,0 +1,273 @@
+"""Slow-query log with statement fingerprints and EXPLAIN capture
+
+Statements slower than the threshold are kept in a ring buffer with their
+normalised text, parameter shape (types and sizes, never values) and
+duration. With SLOW_QUERY_EXPLAIN on (it re-runs the query, so it is off by
+default), slow vector searches and list queries also get an EXPLAIN
+(ANALYZE, BUFFERS) plan, captured in the background on a separate
+connection and at most once per fingerprint per interval.
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Set
+
+import orjson
+
+from app.config import settings
+from app.utils.metrics import metrics
+from app.utils.tracing import current_request_id
+
+logger = logging.getLogger(__name__)
+
+# Distinct fingerprints tracked (least recently seen are dropped)
+MAX_FINGERPRINTS = 1000
+# EXPLAIN ANALYZE re-runs the query; give up rather than pile onto a struggling database
+EXPLAIN_TIMEOUT_MS = 10_000
+EXPLAINED_KINDS = ("vector_search", "list")
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"\$\d+|%\(\w+\)s|(?<![\w])\?(?![\w])|:\w+")
+_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_RE = re.compile(r"(\((?:\?|\?, \.\.\.)\))(?:\s*,\s*\((?:\?|\?, \.\.\.)\))+")
+_WHITESPACE_RE = re.compile(r"\s+")
+_VECTOR_OPERATOR_RE = re.compile(r"<=>|<->|<#>")
+
+slow_queries_total = metrics.counter(
+    "db_slow_queries_total", "Statements slower than the slow-query threshold"
+)
+
+
+def normalize_statement(statement: str) -> str:
+    """Replace literals and placeholders with ? and collapse lists and whitespace"""
+    normalized = _STRING_RE.sub("?", statement)
+    normalized = _PLACEHOLDER_RE.sub("?", normalized)
+    normalized = _NUMBER_RE.sub("?", normalized)
+    normalized = _WHITESPACE_RE.sub(" ", normalized).strip()
+    normalized = _LIST_RE.sub("(?, ...)", normalized)
+    return _VALUES_RE.sub(r"\1, ...", normalized)
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def classify_statement(statement: str) -> str:
+    """vector_search, list (ordered and limited SELECT) or the statement verb"""
+    upper = statement.lstrip().upper()
+    verb = upper.split(None, 1)[0].lower() if upper else "unknown"
+    if verb not in ("select", "with"):
+        return verb
+    if _VECTOR_OPERATOR_RE.search(statement):
+        return "vector_search"
+    if " ORDER BY " in upper and " LIMIT " in upper:
+        return "list"
+    return "select"
+
+
+def _value_shape(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+
+def parameter_shape(parameters: Any, executemany: bool) -> Dict:
+    """Types and sizes of the bound parameters (values are never kept)"""
+    if executemany:
+        rows = list(parameters or [])
+        first = parameter_shape(rows[0], False) if rows else {}
+        return {"rows": len(rows), **first}
+    if isinstance(parameters, dict):
+        return {"params": {key: _value_shape(value) for key, value in parameters.items()}}
+    return {"params": [_value_shape(value) for value in parameters or ()]}
+
+
+@dataclass
+class SlowQuery:
+    id: str
+    fingerprint: str
+    kind: str
+    statement: str
+    duration_ms: float
+    parameters: Dict
+    rowcount: Optional[int]
+    occurred_at: datetime
+    request_id: Optional[str] = None
+    explain: Optional[Any] = None
+    explain_error: Optional[str] = None
+
+
+@dataclass
+class FingerprintStats:
+    fingerprint: str
+    kind: str
+    statement: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    last_seen: Optional[datetime] = None
+    explained_at: Optional[float] = field(default=None, repr=False)
+
+
+class SlowQueryLog:
+    """Ring buffer of slow statements plus per-fingerprint counters"""
+
+    def __init__(self, max_entries: int):
+        self._entries: Deque[SlowQuery] = deque(maxlen=max_entries)
+        self._fingerprints: "OrderedDict[str, FingerprintStats]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def instrument(self, engine) -> None:
+        """
+        Time every statement executed on an engine
+
+        Args:
+            engine: AsyncEngine (EXPLAIN plans run on a fresh connection from it)
+        """
+        from sqlalchemy import event
+
+        if not settings.slow_query_enabled:
+            return
+        sync_engine = engine.sync_engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            context._slow_query_start = time.perf_counter()
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            start = getattr(context, "_slow_query_start", None)
+            if start is None:
+                return
+            duration_ms = (time.perf_counter() - start) * 1000
+            if duration_ms < settings.slow_query_threshold_ms or statement.startswith("EXPLAIN"):
+                return
+            rowcount = (
+                cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+            )
+            self.record(engine, statement, parameters, executemany, duration_ms, rowcount)
+
+    def record(
+        self,
+        engine,
+        statement: str,
+        parameters: Any,
+        executemany: bool,
+        duration_ms: float,
+        rowcount: Optional[int],
+    ) -> SlowQuery:
+        normalized = normalize_statement(statement)
+        kind = classify_statement(statement)
+        entry = SlowQuery(
+            id=uuid.uuid4().hex,
+            fingerprint=fingerprint(normalized),
+            kind=kind,
+            statement=normalized,
+            duration_ms=round(duration_ms, 1),
+            parameters=parameter_shape(parameters, executemany),
+            rowcount=rowcount,
+            occurred_at=datetime.now(timezone.utc),
+            request_id=current_request_id(),
+        )
+        explain = False
+        with self._lock:
+            self._entries.append(entry)
+            stats = self._fingerprints.get(entry.fingerprint)
+            if stats is None:
+                stats = self._fingerprints[entry.fingerprint] = FingerprintStats(
+                    entry.fingerprint, kind, normalized
+                )
+                if len(self._fingerprints) > MAX_FINGERPRINTS:
+                    self._fingerprints.popitem(last=False)
+            self._fingerprints.move_to_end(entry.fingerprint)
+            stats.count += 1
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+            stats.last_seen = entry.occurred_at
+
+            now = time.monotonic()
+            if (
+                settings.slow_query_explain
+                and kind in EXPLAINED_KINDS
+                and not executemany
+                and (
+                    stats.explained_at is None
+                    or now - stats.explained_at >= settings.slow_query_explain_interval_s
+                )
+            ):
+                stats.explained_at = now
+                explain = True
+
+        # Labelled by kind only: fingerprints are unbounded (see fingerprints())
+        slow_queries_total.inc(kind=kind)
+        logger.warning(
+            f"Slow query ({entry.duration_ms:.0f} ms, {kind}, {entry.fingerprint}): "
+            f"{normalized[:300]}"
+        )
+
+        if explain and engine is not None:
+            try:
+                # Cursor events run on the event-loop thread (inside SQLAlchemy's greenlet)
+                task = asyncio.get_running_loop().create_task(
+                    self._explain(engine, entry, statement, parameters)
+                )
+            except RuntimeError:
+                pass
+            else:
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        return entry
+
+    async def _explain(self, engine, entry: SlowQuery, statement: str, parameters: Any) -> None:
+        try:
+            async with engine.connect() as conn:
+                await conn.exec_driver_sql(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}")
+                result = await conn.exec_driver_sql(
+                    f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters
+                )
+                plan = result.scalar()
+                # Nothing to keep; ANALYZE only ran a SELECT
+                await conn.rollback()
+            entry.explain = orjson.loads(plan) if isinstance(plan, (str, bytes)) else plan
+        except Exception as e:
+            entry.explain_error = str(e)
+            logger.info(f"EXPLAIN failed for slow query {entry.fingerprint}: {e}")
+
+    def entries(self, limit: int) -> List[SlowQuery]:
+        """Most recent slow queries first"""
+        with self._lock:
+            return list(reversed(self._entries))[:limit]
+
+    def fingerprints(self) -> List[Dict]:
+        """Per-fingerprint counters, by total time spent"""
+        with self._lock:
+            stats = [asdict(s) for s in self._fingerprints.values()]
+        for s in stats:
+            s.pop("explained_at")
+            s["avg_ms"] = round(s["total_ms"] / s["count"], 1)
+            s["total_ms"] = round(s["total_ms"], 1)
+            s["max_ms"] = round(s["max_ms"], 1)
+        return sorted(stats, key=lambda s: s["total_ms"], reverse=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._fingerprints.clear()
+
+
+# Global slow-query log
+slow_query_log = SlowQueryLog(max_entries=settings.slow_query_buffer_size)
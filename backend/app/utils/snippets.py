@@ -0,0 +1,65 @@
+"""Highlighted snippet extraction for citation previews"""
+
+import re
+from typing import Any, Dict, List, Tuple
+
+SNIPPET_LENGTH = 240
+_WORD_RE = re.compile(r"\w+")
+_MIN_TERM_LENGTH = 3
+_STOPWORDS = {
+    "the", "and", "for", "are", "was", "were", "what", "when", "where", "which", "who",
+    "how", "why", "did", "does", "this", "that", "with", "from", "about", "can", "you",
+    "your", "there", "their", "has", "have", "had", "not", "but", "all", "any", "into",
+}  # fmt: skip
+
+
+def _query_terms(query: str) -> set:
+    return {
+        t.lower()
+        for t in _WORD_RE.findall(query)
+        if len(t) >= _MIN_TERM_LENGTH and t.lower() not in _STOPWORDS
+    }
+
+
+def build_snippet(text: str, query: str, max_length: int = SNIPPET_LENGTH) -> Dict[str, Any]:
+    """
+    Build a short snippet of a chunk centred on the densest run of query terms
+
+    Args:
+        text: Full chunk text
+        query: User's question (terms are matched case-insensitively)
+        max_length: Maximum snippet length in characters
+
+    Returns:
+        Dict with 'snippet', 'offset' (start of the snippet within text) and
+        'highlights' (list of [start, end] offsets of matched terms within the snippet)
+    """
+    terms = _query_terms(query)
+    matches: List[Tuple[int, int]] = [
+        m.span() for m in _WORD_RE.finditer(text) if m.group().lower() in terms
+    ]
+
+    start = 0
+    if matches:
+        # Sliding window over match positions: pick the window covering most matches
+        best_count = 0
+        right = 0
+        for left in range(len(matches)):
+            while right < len(matches) and matches[right][1] - matches[left][0] <= max_length:
+                right += 1
+            if right - left > best_count:
+                best_count = right - left
+                start = matches[left][0]
+        # Leave a little leading context before the first highlighted term
+        start = max(0, start - max_length // 8)
+
+    end = min(len(text), start + max_length)
+    start = max(0, end - max_length)
+
+    highlights = [[s - start, e - start] for s, e in matches if s >= start and e <= end]
+
+    return {
+        "snippet": text[start:end],
+        "offset": start,
+        "highlights": highlights,
+    }
@@ -0,0 +1,214 @@
+"""Helpers for Server-Sent Events streaming"""
+
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Dict, List, Optional, TypeVar
+
+import orjson
+from starlette.requests import Request
+
+from app.utils.metrics import (
+    percentile,
+    stream_first_byte_seconds,
+    stream_first_token_seconds,
+    stream_inter_token_gap_seconds,
+    stream_retrieval_seconds,
+    stream_tokens,
+    stream_tokens_per_second,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# How often to poll the client connection while waiting on the upstream stream
+DISCONNECT_POLL_INTERVAL = 0.25
+
+
+def sse_json(payload: dict) -> str:
+    """Serialize an SSE data payload"""
+    return orjson.dumps(payload).decode("utf-8")
+
+
+class ClientDisconnected(Exception):
+    """Raised when the SSE client goes away before the stream finishes"""
+
+
+class StreamTelemetry:
+    """
+    Latency and throughput of one streamed answer
+
+    All times are measured from the start of the request. Histograms are fed
+    once, in finish(); per-token work is a clock read and a list append.
+    """
+
+    def __init__(self, endpoint: str, start: Optional[float] = None):
+        self.endpoint = endpoint
+        self.start = start if start is not None else time.perf_counter()
+        self.retrieval_done: Optional[float] = None
+        self.first_token: Optional[float] = None
+        self.first_byte: Optional[float] = None
+        self.last_token: Optional[float] = None
+        self.tokens = 0
+        self._gaps: List[float] = []
+
+    def mark_retrieval(self) -> None:
+        self.retrieval_done = time.perf_counter()
+
+    def mark_token(self) -> None:
+        now = time.perf_counter()
+        if self.first_token is None:
+            self.first_token = now
+        else:
+            self._gaps.append(now - self.last_token)
+        self.last_token = now
+        self.tokens += 1
+
+    def mark_byte_sent(self) -> None:
+        if self.first_byte is None:
+            self.first_byte = time.perf_counter()
+
+    def _ms(self, moment: Optional[float]) -> Optional[float]:
+        return round((moment - self.start) * 1000, 1) if moment is not None else None
+
+    def finish(self) -> Dict:
+        """
+        Record the stream in the histograms
+
+        Returns:
+            Per-message record (times in ms since the request started)
+        """
+        labels = {"endpoint": self.endpoint}
+        if self.retrieval_done is not None:
+            stream_retrieval_seconds.observe(self.retrieval_done - self.start, **labels)
+        if self.first_token is not None:
+            stream_first_token_seconds.observe(self.first_token - self.start, **labels)
+        if self.first_byte is not None:
+            stream_first_byte_seconds.observe(self.first_byte - self.start, **labels)
+        stream_tokens.inc(self.tokens, **labels)
+        for gap in self._gaps:
+            stream_inter_token_gap_seconds.observe(gap, **labels)
+
+        tokens_per_second = None
+        if self.tokens > 1 and self.last_token > self.first_token:
+            tokens_per_second = (self.tokens - 1) / (self.last_token - self.first_token)
+            stream_tokens_per_second.observe(tokens_per_second, **labels)
+
+        record = {
+            "retrieval_ms": self._ms(self.retrieval_done),
+            "first_token_ms": self._ms(self.first_token),
+            "first_byte_ms": self._ms(self.first_byte),
+            "total_ms": self._ms(time.perf_counter()),
+            "tokens": self.tokens,
+            "tokens_per_second": (
+                round(tokens_per_second, 1) if tokens_per_second is not None else None
+            ),
+        }
+        ordered = sorted(self._gaps)
+        for pct in (50, 95, 99):
+            record[f"gap_p{pct}_ms"] = (
+                round(percentile(ordered, pct) * 1000, 1) if ordered else None
+            )
+        record["gap_max_ms"] = round(ordered[-1] * 1000, 1) if ordered else None
+        return record
+
+
+class FrameCoalescer:
+    """
+    Batch small text chunks into fewer SSE frames
+
+    The first chunk is released immediately so time-to-first-token is
+    unaffected; after that, chunks are held until the interval has passed
+    since the last frame or the buffer reaches max_chars.
+    """
+
+    def __init__(self, interval: float, max_chars: int = 2048):
+        self.interval = interval
+        self.max_chars = max_chars
+        self._parts: List[str] = []
+        self._size = 0
+        self._last_flush: Optional[float] = None
+
+    def add(self, chunk: str) -> Optional[str]:
+        """Buffer a chunk and return a frame's text if one is due"""
+        self._parts.append(chunk)
+        self._size += len(chunk)
+        now = time.monotonic()
+        if (
+            self._last_flush is None
+            or now - self._last_flush >= self.interval
+            or self._size >= self.max_chars
+        ):
+            return self.flush(now)
+        return None
+
+    def flush(self, now: Optional[float] = None) -> Optional[str]:
+        """Return and clear the buffered text (None if empty)"""
+        if not self._parts:
+            return None
+        text = "".join(self._parts)
+        self._parts.clear()
+        self._size = 0
+        self._last_flush = now if now is not None else time.monotonic()
+        return text
+
+
+async def iterate_until_disconnect(
+    request: Request,
+    source: AsyncIterator[T],
+    poll_interval: float = DISCONNECT_POLL_INTERVAL,
+) -> AsyncIterator[T]:
+    """
+    Yield items from an async iterator until the client disconnects
+
+    The next upstream item is awaited in a task so that a disconnect is noticed
+    even while the upstream is still thinking (e.g. before the first token).
+    The source iterator is always closed on exit, which aborts the upstream
+    HTTP request instead of draining it.
+
+    Args:
+        request: Incoming request used to detect the disconnect
+        source: Upstream async iterator (e.g. an LLM token stream)
+        poll_interval: Seconds between connection checks while waiting
+
+    Yields:
+        Items from the source iterator
+
+    Raises:
+        ClientDisconnected: If the client disconnects before the source is exhausted
+    """
+    iterator = source.__aiter__()
+    pending = None
+
+    try:
+        while True:
+            pending = asyncio.ensure_future(iterator.__anext__())
+            while True:
+                done, _ = await asyncio.wait({pending}, timeout=poll_interval)
+                if done:
+                    break
+                if await request.is_disconnected():
+                    raise ClientDisconnected()
+
+            try:
+                item = pending.result()
+            except StopAsyncIteration:
+                return
+            finally:
+                pending = None
+
+            yield item
+
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+            await asyncio.wait({pending})
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            try:
+                await aclose()
+            except Exception as e:
+                logger.warning(f"Error closing upstream stream: {e}")
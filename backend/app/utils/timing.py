@@ -0,0 +1,79 @@
+"""Per-stage pipeline timing feeding histograms and Server-Timing headers"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from app.utils.metrics import metrics
+
+stage_duration = metrics.histogram(
+    "pipeline_stage_duration_seconds",
+    "Wall-clock duration of each pipeline stage",
+)
+
+
+class StageTimings:
+    """Stage durations recorded for one pipeline run (e.g. one chat request)"""
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.durations: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """Format the recorded stages as a Server-Timing header value"""
+        return ", ".join(
+            f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.durations.items()
+        )
+
+
+_current: ContextVar[Optional[StageTimings]] = ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def track_pipeline(pipeline: str) -> Iterator[StageTimings]:
+    """
+    Attribute stages timed inside the block to a pipeline
+
+    Args:
+        pipeline: Pipeline label (e.g. "chat_query", "pdf_ingest")
+
+    Yields:
+        StageTimings collecting the stages recorded in this context
+    """
+    timings = StageTimings(pipeline)
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def record_stage(stage: str, seconds: float, pipeline: Optional[str] = None) -> None:
+    """
+    Record a stage duration measured by the caller
+
+    Args:
+        stage: Stage name (a Server-Timing token: letters, digits, '_' or '-')
+        seconds: Duration in seconds
+        pipeline: Pipeline label; defaults to the enclosing track_pipeline
+    """
+    timings = _current.get()
+    if pipeline is None:
+        pipeline = timings.pipeline if timings is not None else "other"
+    stage_duration.observe(seconds, pipeline=pipeline, stage=stage)
+    if timings is not None and timings.pipeline == pipeline:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str, pipeline: Optional[str] = None) -> Iterator[None]:
+    """Time the enclosed block as a pipeline stage (recorded even if it raises)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start, pipeline)
@@ -0,0 +1,562 @@
+"""Request-scoped tracing: request ids, spans and span export
+
+Every HTTP request gets a request id (the incoming X-Request-ID, which tusd
+forwards on its hooks, or a generated one) that is attached to log records
+and echoed on the response. When tracing is enabled a sampled fraction of
+requests also records spans (HTTP, SQL, object storage, OpenAI calls and
+Inngest steps) which are exported in batches on a background thread, either
+to a JSON-lines file or to an OTLP/HTTP (JSON) collector.
+"""
+
+import functools
+import hashlib
+import logging
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+import orjson
+
+from app.config import settings
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = b"x-request-id"
+# Longest incoming request id that is honoured (longer ones are replaced)
+MAX_REQUEST_ID_LENGTH = 128
+# Longest SQL statement kept on a span
+MAX_STATEMENT_LENGTH = 2000
+
+EXPORT_BATCH_SIZE = 512
+EXPORT_QUEUE_SIZE = 8192
+
+_TRACE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_REQUEST_ID_RE = re.compile(r"^[\w.:/+=-]+$")
+
+spans_dropped = metrics.counter(
+    "trace_spans_dropped_total", "Finished spans dropped because the export queue was full"
+)
+span_export_failures = metrics.counter(
+    "trace_span_export_failures_total", "Span export batches that failed to be written or sent"
+)
+
+# OTLP span kinds
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+
+
+@dataclass
+class TraceState:
+    """Identity of the trace the current request or job belongs to"""
+
+    request_id: str
+    trace_id: str
+    sampled: bool
+    # Span in another process this trace continues from (e.g. the request
+    # that sent an Inngest event)
+    remote_parent_id: Optional[str] = None
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    kind: str = "internal"
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def record_error(self, exc: BaseException) -> None:
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def end(self) -> None:
+        """Finish the span and queue it for export (only the first call counts)"""
+        if self.end_ns:
+            return
+        self.end_ns = time.time_ns()
+        _processor.submit(self)
+
+    def to_record(self) -> Dict:
+        """Flat representation written to trace files"""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_unix_nano": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_trace: ContextVar[Optional[TraceState]] = ContextVar("trace_state", default=None)
+_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def _new_span_id() -> str:
+    return secrets.token_hex(8)
+
+
+def _should_sample() -> bool:
+    return settings.tracing_enabled and random.random() < settings.tracing_sample_rate
+
+
+def normalize_request_id(value: Optional[str]) -> str:
+    """Honour a well-formed incoming request id, otherwise generate one"""
+    if value and len(value) <= MAX_REQUEST_ID_LENGTH and _REQUEST_ID_RE.match(value):
+        return value
+    return secrets.token_hex(16)
+
+
+def trace_id_for(request_id: str) -> str:
+    """Trace id for a request id: used directly if it is 32 hex digits, else hashed"""
+    lowered = request_id.lower().replace("-", "")
+    if _TRACE_ID_RE.match(lowered):
+        return lowered
+    return hashlib.blake2b(request_id.encode(), digest_size=16).hexdigest()
+
+
+def current_request_id() -> Optional[str]:
+    trace = _trace.get()
+    return trace.request_id if trace is not None else None
+
+
+def trace_context() -> Optional[Dict]:
+    """
+    Serialisable context for continuing the current trace elsewhere
+
+    Included in Inngest event data so background jobs share the request id
+    (and trace) of the request that triggered them.
+
+    Returns:
+        Dict with request_id, trace_id, span_id and sampled, or None outside
+        a traced request
+    """
+    trace = _trace.get()
+    if trace is None:
+        return None
+    parent = _span.get()
+    return {
+        "request_id": trace.request_id,
+        "trace_id": trace.trace_id,
+        "span_id": parent.span_id if parent is not None else trace.remote_parent_id,
+        "sampled": trace.sampled,
+    }
+
+
+def start_span(name: str, kind: str = "internal", **attributes) -> Optional[Span]:
+    """
+    Start a span without making it the current span
+
+    For work that cannot be wrapped in a with block in a single context (async
+    generators, SQLAlchemy cursor events). The caller must call end().
+
+    Returns:
+        The started span, or None when the current trace is not sampled
+    """
+    trace = _trace.get()
+    if trace is None or not trace.sampled:
+        return None
+    parent = _span.get()
+    span_obj = Span(
+        name=name,
+        trace_id=trace.trace_id,
+        span_id=_new_span_id(),
+        parent_id=parent.span_id if parent is not None else trace.remote_parent_id,
+        kind=kind,
+    )
+    for key, value in attributes.items():
+        span_obj.set_attribute(key, value)
+    return span_obj
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes) -> Iterator[Optional[Span]]:
+    """
+    Record the enclosed block as a child of the current span
+
+    Yields:
+        The span (to add attributes), or None when the trace is not sampled
+    """
+    span_obj = start_span(name, kind, **attributes)
+    if span_obj is None:
+        yield None
+        return
+    token = _span.set(span_obj)
+    try:
+        yield span_obj
+    # Not BaseException: cancellation and Inngest's step interrupts are control flow
+    except Exception as exc:
+        span_obj.record_error(exc)
+        raise
+    finally:
+        _span.reset(token)
+        span_obj.end()
+
+
+def traced(name: str, **attributes):
+    """Decorator running an async function inside a span"""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name, **attributes):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def trace_request(
+    name: str,
+    request_id: Optional[str] = None,
+    kind: str = "server",
+    record: bool = True,
+    **attributes,
+) -> Iterator[Optional[Span]]:
+    """
+    Start a new trace for a request and record it as the root span
+
+    Args:
+        name: Root span name (e.g. "GET /api/v1/pdf/list")
+        request_id: Incoming request id (validated, or generated if missing)
+        kind: Root span kind
+        record: False to only assign a request id, never recording spans
+
+    Yields:
+        The root span, or None when the request is not sampled
+    """
+    request_id = normalize_request_id(request_id)
+    trace = TraceState(request_id, trace_id_for(request_id), record and _should_sample())
+    token = _trace.set(trace)
+    try:
+        with span(name, kind, **attributes) as root:
+            yield root
+    finally:
+        _trace.reset(token)
+
+
+@contextmanager
+def continue_trace(
+    context: Optional[Dict], name: str, kind: str = "consumer", **attributes
+) -> Iterator[Optional[Span]]:
+    """
+    Continue a trace started in another process (see trace_context)
+
+    Falls back to a fresh trace when no context was propagated.
+    """
+    if not context or not context.get("trace_id"):
+        with trace_request(name, kind=kind, **attributes) as root:
+            yield root
+        return
+
+    trace = TraceState(
+        request_id=context.get("request_id") or context["trace_id"],
+        trace_id=context["trace_id"],
+        sampled=bool(context.get("sampled")) and settings.tracing_enabled,
+        remote_parent_id=context.get("span_id"),
+    )
+    token = _trace.set(trace)
+    try:
+        with span(name, kind, **attributes) as root:
+            yield root
+    finally:
+        _trace.reset(token)
+
+
+def set_token_attributes(span_obj: Optional[Span], usage_metadata: Optional[Dict]) -> None:
+    """Copy a LangChain usage_metadata's token counts onto a span"""
+    if span_obj is not None and usage_metadata:
+        span_obj.set_attribute("prompt_tokens", usage_metadata.get("input_tokens"))
+        span_obj.set_attribute("completion_tokens", usage_metadata.get("output_tokens"))
+
+
+class RequestIdLogFilter(logging.Filter):
+    """Add the current request id to log records as %(request_id)s"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id() or "-"
+        return True
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+
+class FileSpanExporter:
+    """Append finished spans to a JSON-lines file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]) -> None:
+        with open(self.path, "ab") as f:
+            f.write(b"".join(orjson.dumps(s.to_record()) + b"\n" for s in spans))
+
+
+def _otlp_value(value: Any) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPHttpSpanExporter:
+    """POST finished spans to an OTLP/HTTP collector using the JSON encoding"""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def encode(self, spans: List[Span]) -> bytes:
+        return orjson.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": {
+                            "attributes": [
+                                {"key": "service.name", "value": _otlp_value(self.service_name)}
+                            ]
+                        },
+                        "scopeSpans": [
+                            {
+                                "scope": {"name": __name__},
+                                "spans": [self._encode_span(s) for s in spans],
+                            }
+                        ],
+                    }
+                ]
+            }
+        )
+
+    def _encode_span(self, s: Span) -> Dict:
+        encoded = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": SPAN_KINDS.get(s.kind, 1),
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 0},
+        }
+        if s.parent_id:
+            encoded["parentSpanId"] = s.parent_id
+        return encoded
+
+    def export(self, spans: List[Span]) -> None:
+        request = urllib.request.Request(
+            self.endpoint,
+            data=self.encode(spans),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def create_exporter():
+    """Create the span exporter selected by settings.tracing_exporter"""
+    if settings.tracing_exporter == "otlp":
+        return OTLPHttpSpanExporter(settings.tracing_otlp_endpoint, settings.tracing_service_name)
+    return FileSpanExporter(settings.tracing_file_path)
+
+
+class BatchSpanProcessor:
+    """
+    Queue finished spans and export them in batches on a daemon thread
+
+    Spans are dropped (and counted) rather than blocking the request path
+    when the queue is full.
+    """
+
+    def __init__(self, exporter_factory=create_exporter):
+        self._exporter_factory = exporter_factory
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, span_obj: Span) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span_obj)
+        except queue.Full:
+            spans_dropped.inc()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    args=(self._exporter_factory(),),
+                    name="span-export",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def _run(self, exporter) -> None:
+        interval = settings.tracing_export_interval_ms / 1000
+        stopping = False
+        while not stopping:
+            batch: List[Span] = []
+            deadline = time.monotonic() + interval
+            while len(batch) < EXPORT_BATCH_SIZE:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                try:
+                    exporter.export(batch)
+                except Exception as e:
+                    span_export_failures.inc()
+                    logger.warning(f"Failed to export {len(batch)} spans: {e}")
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Flush queued spans and stop the export thread"""
+        thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+        self._thread = None
+
+
+_processor = BatchSpanProcessor()
+
+
+def shutdown_tracing() -> None:
+    _processor.shutdown()
+
+
+# ---------------------------------------------------------------------------
+# Instrumentation
+# ---------------------------------------------------------------------------
+
+
+def instrument_engine(engine) -> None:
+    """
+    Record a span around every statement executed on a SQLAlchemy engine
+
+    Args:
+        engine: AsyncEngine or Engine
+    """
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        # Runs in SQLAlchemy's greenlet, which shares the caller's contextvars
+        span_obj = start_span(
+            f"db {statement.split(None, 1)[0].upper() if statement else 'SQL'}",
+            kind="client",
+            **{
+                "db.system": sync_engine.dialect.name,
+                "db.statement": statement[:MAX_STATEMENT_LENGTH],
+                "db.executemany": executemany or None,
+            },
+        )
+        if span_obj is not None:
+            context._trace_span = span_obj
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        span_obj = getattr(context, "_trace_span", None)
+        if span_obj is not None:
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                span_obj.set_attribute("db.rowcount", cursor.rowcount)
+            span_obj.end()
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        span_obj = getattr(exception_context.execution_context, "_trace_span", None)
+        if span_obj is not None:
+            span_obj.record_error(exception_context.original_exception)
+            span_obj.end()
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware assigning each HTTP request a request id and root span
+
+    The request id is echoed in the X-Request-ID response header. Paths in
+    untraced_paths still get a request id but never record spans.
+    """
+
+    def __init__(self, app, untraced_paths=("/health", "/metrics", "/api/inngest")):
+        self.app = app
+        self.untraced_paths = tuple(untraced_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                incoming = value.decode("latin-1")
+                break
+
+        path = scope["path"]
+        with trace_request(
+            f"{scope['method']} {path}",
+            request_id=incoming,
+            record=not path.startswith(self.untraced_paths),
+        ) as root:
+            request_id = current_request_id()
+
+            async def send_with_request_id(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (REQUEST_ID_HEADER, request_id.encode("latin-1"))
+                    ]
+                    if root is not None:
+                        root.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            if root is not None:
+                root.set_attribute("http.method", scope["method"])
+                root.set_attribute("http.target", path)
+                root.set_attribute("http.request_id", request_id)
+
+            try:
+                await self.app(scope, receive, send_with_request_id)
+            finally:
+                route = scope.get("route")
+                if root is not None and getattr(route, "path", None):
+                    root.name = f"{scope['method']} {route.path}"
+                    root.set_attribute("http.route", route.path)
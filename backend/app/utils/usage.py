@@ -0,0 +1,107 @@
+"""Token usage and cost accounting for OpenAI calls"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional
+
+from app.config import settings
+
+
+@dataclass
+class TokenUsage:
+    """Tokens and estimated cost accumulated over one or more model calls"""
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    embedding_tokens: int = 0
+    cost_usd: float = 0.0
+
+    def add_chat(self, model: str, usage_metadata: Optional[Dict]) -> None:
+        """
+        Add a chat completion's usage
+
+        Args:
+            model: Model name used for pricing
+            usage_metadata: LangChain usage_metadata (input_tokens, output_tokens,
+                input_token_details.cache_read)
+        """
+        if not usage_metadata:
+            return
+        prompt = usage_metadata.get("input_tokens", 0) or 0
+        completion = usage_metadata.get("output_tokens", 0) or 0
+        cached = (usage_metadata.get("input_token_details") or {}).get("cache_read", 0) or 0
+
+        self.prompt_tokens += prompt
+        self.completion_tokens += completion
+        self.cached_tokens += cached
+
+        price = settings.openai_prices.get(model, {})
+        self.cost_usd += (
+            (prompt - cached) * price.get("input", 0.0)
+            + cached * price.get("cached_input", price.get("input", 0.0))
+            + completion * price.get("output", 0.0)
+        ) / 1_000_000
+
+    def add_embedding(self, model: str, tokens: int) -> None:
+        """Add an embedding call's usage"""
+        self.embedding_tokens += tokens
+        price = settings.openai_prices.get(model, {})
+        self.cost_usd += tokens * price.get("input", 0.0) / 1_000_000
+
+    def merge(self, other: "TokenUsage") -> None:
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cached_tokens += other.cached_tokens
+        self.embedding_tokens += other.embedding_tokens
+        self.cost_usd += other.cost_usd
+
+    def columns(self) -> Dict:
+        """Values for the usage columns of a message or document row"""
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "embedding_tokens": self.embedding_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+
+_current: ContextVar[Optional[TokenUsage]] = ContextVar("token_usage", default=None)
+
+
+@contextmanager
+def track_usage() -> Iterator[TokenUsage]:
+    """
+    Collect the usage of every model call made inside the block
+
+    Nested blocks each see their own calls; the outer block also receives
+    them when the inner block exits.
+
+    Yields:
+        TokenUsage accumulating the calls made in this context
+    """
+    usage = TokenUsage()
+    parent = _current.get()
+    token = _current.set(usage)
+    try:
+        yield usage
+    finally:
+        _current.reset(token)
+        if parent is not None:
+            parent.merge(usage)
+
+
+def record_chat_usage(model: str, usage_metadata: Optional[Dict]) -> None:
+    """Attribute a chat completion's usage to the enclosing track_usage block"""
+    usage = _current.get()
+    if usage is not None:
+        usage.add_chat(model, usage_metadata)
+
+
+def record_embedding_usage(model: str, tokens: int) -> None:
+    """Attribute an embedding call's usage to the enclosing track_usage block"""
+    usage = _current.get()
+    if usage is not None:
+        usage.add_embedding(model, tokens)
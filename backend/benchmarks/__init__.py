@@ -0,0 +1 @@
+"""Performance benchmarks (run against a live backend or local stand-ins)"""
@@ -0,0 +1,149 @@
+"""Login-storm benchmark
+
+Measures /chat/stream latency while a burst of concurrent logins hits the
+same server. bcrypt work that blocks the event loop shows up directly as
+inflated time-to-first-byte on the streaming requests.
+
+Usage:
+    uv run python -m benchmarks.login_storm --base-url http://localhost:8000 \\
+        --pdf-id <completed pdf id> --logins 200 --streams 20
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import statistics
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list of values"""
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    """Summary statistics in milliseconds"""
+    if not values:
+        return {"count": 0, "mean_ms": None, "p50_ms": None, "p99_ms": None, "max_ms": None}
+    return {
+        "count": len(values),
+        "mean_ms": statistics.fmean(values) * 1000,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": max(values) * 1000,
+    }
+
+
+async def ensure_user(client: httpx.AsyncClient, email: str, password: str) -> None:
+    """Register the benchmark user (ignores 'already registered')"""
+    response = await client.post(
+        "/api/v1/auth/register",
+        json={
+            "email": email,
+            "username": f"bench-{uuid.uuid4().hex[:8]}",
+            "password": password,
+        },
+    )
+    if response.status_code not in (201, 400):
+        response.raise_for_status()
+
+
+async def login_once(client: httpx.AsyncClient, email: str, password: str) -> float:
+    start = time.perf_counter()
+    response = await client.post("/api/v1/auth/login", json={"email": email, "password": password})
+    elapsed = time.perf_counter() - start
+    if response.status_code not in (200, 503):
+        logger.warning(f"Login returned {response.status_code}")
+    return elapsed
+
+
+async def stream_once(client: httpx.AsyncClient, pdf_id: str, message: str) -> Dict[str, float]:
+    """Run one /chat/stream request and time first byte and completion"""
+    start = time.perf_counter()
+    first_byte = None
+    async with client.stream(
+        "POST", "/api/v1/chat/stream", json={"pdf_id": pdf_id, "message": message}
+    ) as response:
+        response.raise_for_status()
+        async for _ in response.aiter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return {"ttfb": first_byte if first_byte is not None else total, "total": total}
+
+
+async def run_streams(
+    client: httpx.AsyncClient, pdf_id: str, message: str, count: int
+) -> List[Dict[str, float]]:
+    return await asyncio.gather(*(stream_once(client, pdf_id, message) for _ in range(count)))
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    email = args.email or f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.logins + args.streams + 10)
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout, limits=limits) as client:
+        await ensure_user(client, email, args.password)
+
+        # Baseline: streams alone
+        baseline = await run_streams(client, args.pdf_id, args.message, args.streams)
+
+        # Storm: the same streams while a login burst is in flight
+        login_tasks = [
+            asyncio.create_task(login_once(client, email, args.password))
+            for _ in range(args.logins)
+        ]
+        storm = await run_streams(client, args.pdf_id, args.message, args.streams)
+        login_latencies = await asyncio.gather(*login_tasks)
+
+    return {
+        "logins": args.logins,
+        "streams": args.streams,
+        "baseline": {
+            "ttfb": summarize([r["ttfb"] for r in baseline]),
+            "total": summarize([r["total"] for r in baseline]),
+        },
+        "storm": {
+            "ttfb": summarize([r["ttfb"] for r in storm]),
+            "total": summarize([r["total"] for r in storm]),
+            "login": summarize(list(login_latencies)),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--pdf-id", required=True, help="ID of a completed PDF to chat with")
+    parser.add_argument("--message", default="Summarize this document in one sentence.")
+    parser.add_argument("--logins", type=int, default=200, help="Concurrent login requests")
+    parser.add_argument("--streams", type=int, default=20, help="Concurrent /chat/stream requests")
+    parser.add_argument("--email", default=None, help="Existing user email (default: register one)")
+    parser.add_argument("--password", default="benchmark-password")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", default=None, help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    results = asyncio.run(run(args))
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""Offline OpenAI-compatible stand-in server for embeddings and chat
+
+Implements the subset of the OpenAI API that EmbeddingService, LLMService and
+ImageService use: POST /v1/embeddings (float and base64 encodings) and
+POST /v1/chat/completions (including SSE streaming with a final usage chunk,
+image content parts and JSON-object response format). Embeddings are
+deterministic unit vectors derived from a hash of the input, so identical
+text always embeds identically. Completions are deterministic filler text.
+
+Latency, token rate and injected errors come from a named profile (see
+PROFILES) and can be overridden per option. GET /stats returns request,
+token and error counts.
+
+Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:9200/v1.
+
+Usage:
+    uv run python -m benchmarks.openai_standin --profile realistic --port 9200
+"""
+
+import argparse
+import array
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, List, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIMENSIONS = 1536
+# Rough OpenAI vision pricing: a low-detail image, or one high-detail tile set
+IMAGE_TOKENS = {"low": 85, "high": 765, "auto": 765}
+WORDS = (
+    "the document describes a method for measuring results across several sections "
+    "with tables figures and references that support each claim in the text while "
+    "the appendix lists additional data collected during the study period"
+).split()
+
+
+@dataclass(frozen=True)
+class Profile:
+    """
+    Simulated service behaviour
+
+    Args:
+        latency_ms: Delay before the first byte of every response
+        jitter_ms: Uniform random extra delay added to latency_ms
+        tokens_per_s: Completion token rate (0 = unlimited)
+        embedding_ms_per_input: Extra embedding latency per input text
+        completion_tokens: Completion length when the request sets no limit
+        error_rate: Fraction of requests rejected with 429/500/503
+        stream_abort_rate: Fraction of streams cut off partway through
+    """
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    tokens_per_s: float = 0.0
+    embedding_ms_per_input: float = 0.0
+    completion_tokens: int = 200
+    error_rate: float = 0.0
+    stream_abort_rate: float = 0.0
+
+
+PROFILES: Dict[str, Profile] = {
+    "instant": Profile(),
+    "fast": Profile(latency_ms=100, jitter_ms=50, tokens_per_s=250, embedding_ms_per_input=0.2),
+    "realistic": Profile(
+        latency_ms=400,
+        jitter_ms=300,
+        tokens_per_s=70,
+        embedding_ms_per_input=1.0,
+        error_rate=0.005,
+        stream_abort_rate=0.002,
+    ),
+    "flaky": Profile(
+        latency_ms=300,
+        jitter_ms=500,
+        tokens_per_s=60,
+        embedding_ms_per_input=1.0,
+        error_rate=0.1,
+        stream_abort_rate=0.05,
+    ),
+}
+
+ERRORS = (
+    (429, "rate_limit_exceeded", "Rate limit reached (injected by stand-in)"),
+    (500, "server_error", "The server had an error (injected by stand-in)"),
+    (503, "service_unavailable", "The engine is currently overloaded (injected by stand-in)"),
+)
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count (about four characters per token)"""
+    return max(1, math.ceil(len(text) / 4)) if text else 0
+
+
+def hash_embedding(text: str, dimensions: int, model: str) -> List[float]:
+    """Deterministic unit vector for a text"""
+    raw = hashlib.shake_256(f"{model}\0{text}".encode()).digest(dimensions * 2)
+    values = array.array("h", raw)
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+
+def _completion_words(seed: str, count: int) -> List[str]:
+    rng = random.Random(seed)
+    return [rng.choice(WORDS) for _ in range(count)]
+
+
+def _content_tokens(content) -> int:
+    if isinstance(content, str):
+        return count_tokens(content)
+    tokens = 0
+    for part in content or []:
+        if part.get("type") == "text":
+            tokens += count_tokens(part.get("text", ""))
+        elif part.get("type") == "image_url":
+            tokens += IMAGE_TOKENS.get(part.get("image_url", {}).get("detail", "auto"), 765)
+    return tokens
+
+
+def _content_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return " ".join(part.get("text", "") for part in content or [] if part.get("type") == "text")
+
+
+def _error(status: int, code: str, message: str) -> Response:
+    headers = {"Retry-After": "1"} if status == 429 else {}
+    return JSONResponse(
+        {"error": {"message": message, "type": code, "param": None, "code": code}},
+        status_code=status,
+        headers=headers,
+    )
+
+
+class OpenAIStandIn:
+    """Deterministic embeddings and filler completions behind the OpenAI HTTP API"""
+
+    def __init__(self, profile: Profile, dimensions: int = DEFAULT_DIMENSIONS, seed: int = 0):
+        self.profile = profile
+        self.dimensions = dimensions
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "embedding_requests": 0,
+            "embedding_inputs": 0,
+            "embedding_tokens": 0,
+            "chat_requests": 0,
+            "chat_streams": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "injected_errors": 0,
+            "aborted_streams": 0,
+        }
+        self.app = Starlette(
+            routes=[
+                Route("/v1/embeddings", self.embeddings, methods=["POST"]),
+                Route("/v1/chat/completions", self.chat_completions, methods=["POST"]),
+                Route("/v1/models", self.models, methods=["GET"]),
+                Route("/stats", self.get_stats, methods=["GET"]),
+            ]
+        )
+
+    def _count(self, **increments: int) -> None:
+        with self._lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def _roll(self, rate: float) -> bool:
+        with self._lock:
+            return rate > 0 and self._rng.random() < rate
+
+    async def _delay(self, extra_ms: float = 0.0) -> None:
+        with self._lock:
+            jitter = self._rng.uniform(0, self.profile.jitter_ms) if self.profile.jitter_ms else 0
+        delay = (self.profile.latency_ms + jitter + extra_ms) / 1000
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _injected_error(self) -> Optional[Response]:
+        if not self._roll(self.profile.error_rate):
+            return None
+        with self._lock:
+            status, code, message = self._rng.choice(ERRORS)
+        self._count(injected_errors=1)
+        return _error(status, code, message)
+
+    async def embeddings(self, request: Request) -> Response:
+        try:
+            body = await request.json()
+            model = body["model"]
+            inputs = body["input"]
+        except (ValueError, KeyError) as e:
+            return _error(400, "invalid_request_error", f"Malformed request: {e}")
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        # Token-id inputs are embedded by their ids
+        texts = [text if isinstance(text, str) else " ".join(map(str, text)) for text in inputs]
+        dimensions = int(body.get("dimensions") or self.dimensions)
+
+        await self._delay(len(texts) * self.profile.embedding_ms_per_input)
+        error = self._injected_error()
+        if error is not None:
+            return error
+
+        data = []
+        for index, text in enumerate(texts):
+            vector = hash_embedding(text, dimensions, model)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(array.array("f", vector).tobytes()).decode()
+            else:
+                embedding = vector
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+        tokens = sum(count_tokens(text) for text in texts)
+        self._count(embedding_requests=1, embedding_inputs=len(texts), embedding_tokens=tokens)
+        return JSONResponse(
+            {
+                "object": "list",
+                "data": data,
+                "model": model,
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            }
+        )
+
+    async def chat_completions(self, request: Request) -> Response:
+        try:
+            body = await request.json()
+            model = body["model"]
+            messages = body["messages"]
+        except (ValueError, KeyError) as e:
+            return _error(400, "invalid_request_error", f"Malformed request: {e}")
+
+        prompt_tokens = sum(4 + _content_tokens(m.get("content")) for m in messages)
+        limit = body.get("max_completion_tokens") or body.get("max_tokens")
+        count = min(self.profile.completion_tokens, limit or self.profile.completion_tokens)
+        seed = _content_text(messages[-1].get("content")) if messages else ""
+        words = _completion_words(seed, count)
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            half = len(words) // 2
+            text = json.dumps(
+                {"description": " ".join(words[:half]), "text": " ".join(words[half:])}
+            )
+            # Split into as many fragments as words so token counts and pacing still apply
+            size = math.ceil(len(text) / max(1, len(words)))
+            tokens = [text[i : i + size] for i in range(0, len(text), size)]
+        else:
+            tokens = [word if i == 0 else " " + word for i, word in enumerate(words)]
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if body.get("stream"):
+            await self._delay()
+            error = self._injected_error()
+            if error is not None:
+                return error
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            self._count(chat_requests=1, chat_streams=1, prompt_tokens=prompt_tokens)
+            return StreamingResponse(
+                self._stream(completion_id, created, model, tokens, usage, include_usage),
+                media_type="text/event-stream",
+            )
+
+        rate = self.profile.tokens_per_s
+        await self._delay(len(tokens) / rate * 1000 if rate else 0)
+        error = self._injected_error()
+        if error is not None:
+            return error
+        self._count(chat_requests=1, prompt_tokens=prompt_tokens, completion_tokens=len(tokens))
+        return JSONResponse(
+            {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(tokens)},
+                        "finish_reason": "stop" if len(tokens) < (limit or math.inf) else "length",
+                    }
+                ],
+                "usage": usage,
+            }
+        )
+
+    async def _stream(
+        self,
+        completion_id: str,
+        created: int,
+        model: str,
+        tokens: List[str],
+        usage: Dict,
+        include_usage: bool,
+    ):
+        def event(choices: List[Dict], **extra) -> bytes:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": choices,
+                **extra,
+            }
+            return f"data: {json.dumps(chunk)}\n\n".encode()
+
+        abort_at = None
+        if self._roll(self.profile.stream_abort_rate):
+            with self._lock:
+                abort_at = self._rng.randrange(len(tokens) or 1)
+
+        yield event([{"index": 0, "delta": {"role": "assistant", "content": ""}}])
+        interval = 1 / self.profile.tokens_per_s if self.profile.tokens_per_s else 0
+        start = time.perf_counter()
+        for i, token in enumerate(tokens):
+            if i == abort_at:
+                self._count(aborted_streams=1, completion_tokens=i)
+                raise ConnectionAbortedError("Stream aborted (injected by stand-in)")
+            # Pace against the stream start so sleep overshoot does not accumulate
+            wait = start + (i + 1) * interval - time.perf_counter()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield event([{"index": 0, "delta": {"content": token}, "finish_reason": None}])
+        yield event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if include_usage:
+            yield event([], usage=usage)
+        yield b"data: [DONE]\n\n"
+        self._count(completion_tokens=len(tokens))
+
+    async def models(self, request: Request) -> Response:
+        return JSONResponse({"object": "list", "data": []})
+
+    async def get_stats(self, request: Request) -> Response:
+        with self._lock:
+            stats = dict(self.stats)
+        return JSONResponse({"profile": asdict(self.profile), **stats})
+
+
+def start_in_thread(
+    profile: Profile = PROFILES["instant"],
+    host: str = "127.0.0.1",
+    port: int = 9200,
+    dimensions: int = DEFAULT_DIMENSIONS,
+) -> uvicorn.Server:
+    """Start the stand-in on a background thread and wait until it accepts requests"""
+    server = uvicorn.Server(
+        uvicorn.Config(
+            OpenAIStandIn(profile, dimensions).app, host=host, port=port, log_level="warning"
+        )
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("OpenAI stand-in did not start")
+        time.sleep(0.05)
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="fast")
+    parser.add_argument("--latency-ms", type=float)
+    parser.add_argument("--jitter-ms", type=float)
+    parser.add_argument("--tokens-per-s", type=float)
+    parser.add_argument("--completion-tokens", type=int)
+    parser.add_argument("--error-rate", type=float)
+    parser.add_argument("--stream-abort-rate", type=float)
+    parser.add_argument("--dimensions", type=int, default=DEFAULT_DIMENSIONS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9200)
+    args = parser.parse_args()
+
+    overrides = {
+        field: getattr(args, field)
+        for field in (
+            "latency_ms",
+            "jitter_ms",
+            "tokens_per_s",
+            "completion_tokens",
+            "error_rate",
+            "stream_abort_rate",
+        )
+        if getattr(args, field) is not None
+    }
+    profile = replace(PROFILES[args.profile], **overrides)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    logger.info(f"OpenAI stand-in profile: {profile}")
+    uvicorn.run(
+        OpenAIStandIn(profile, args.dimensions, args.seed).app, host=args.host, port=args.port
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Minimal OTLP/HTTP trace collector stand-in
+
+Accepts the JSON encoding of OTLP trace exports on POST /v1/traces (what the
+backend sends with TRACING_EXPORTER=otlp) and appends each span to a
+JSON-lines file in the same flat format as the backend's file exporter.
+GET /traces/{trace_id} returns the spans collected for one trace. Protobuf
+payloads are not supported.
+
+Usage:
+    uv run python -m benchmarks.otlp_standin --output /tmp/traces.jsonl --port 4318
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+logger = logging.getLogger(__name__)
+
+SPAN_KIND_NAMES = {1: "internal", 2: "server", 3: "client", 4: "producer", 5: "consumer"}
+
+
+def _attribute_value(value: Dict):
+    if "intValue" in value:
+        return int(value["intValue"])
+    if "doubleValue" in value:
+        return value["doubleValue"]
+    if "boolValue" in value:
+        return value["boolValue"]
+    return value.get("stringValue")
+
+
+def decode_spans(payload: Dict) -> List[Dict]:
+    """Flatten an OTLP/JSON ExportTraceServiceRequest into span records"""
+    records = []
+    for resource_spans in payload.get("resourceSpans", []):
+        resource = {
+            a["key"]: _attribute_value(a["value"])
+            for a in resource_spans.get("resource", {}).get("attributes", [])
+        }
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for span in scope_spans.get("spans", []):
+                start, end = int(span["startTimeUnixNano"]), int(span["endTimeUnixNano"])
+                status = span.get("status", {})
+                records.append(
+                    {
+                        "service": resource.get("service.name"),
+                        "trace_id": span["traceId"],
+                        "span_id": span["spanId"],
+                        "parent_id": span.get("parentSpanId") or None,
+                        "name": span["name"],
+                        "kind": SPAN_KIND_NAMES.get(span.get("kind"), "internal"),
+                        "start_unix_nano": start,
+                        "duration_ms": round((end - start) / 1e6, 3),
+                        "attributes": {
+                            a["key"]: _attribute_value(a["value"])
+                            for a in span.get("attributes", [])
+                        },
+                        "error": status.get("message") if status.get("code") == 2 else None,
+                    }
+                )
+    return records
+
+
+class OTLPStandIn:
+    """Collects exported spans into a file and an in-memory index by trace"""
+
+    def __init__(self, output: str):
+        self.output = output
+        self.traces: Dict[str, List[Dict]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self.app = Starlette(
+            routes=[
+                Route("/v1/traces", self.export, methods=["POST"]),
+                Route("/traces/{trace_id}", self.get_trace, methods=["GET"]),
+            ]
+        )
+
+    async def export(self, request: Request) -> Response:
+        if not request.headers.get("content-type", "").startswith("application/json"):
+            return JSONResponse({"error": "only the JSON encoding is supported"}, 415)
+        try:
+            records = decode_spans(json.loads(await request.body()))
+        except (ValueError, KeyError, TypeError) as e:
+            return JSONResponse({"error": f"malformed export: {e}"}, 400)
+
+        with self._lock:
+            with open(self.output, "a") as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+                    self.traces[record["trace_id"]].append(record)
+        logger.info(f"Collected {len(records)} spans")
+        return JSONResponse({"partialSuccess": {}})
+
+    async def get_trace(self, request: Request) -> Response:
+        spans = self.traces.get(request.path_params["trace_id"])
+        if not spans:
+            return JSONResponse({"error": "trace not found"}, 404)
+        return JSONResponse({"spans": sorted(spans, key=lambda s: s["start_unix_nano"])})
+
+
+def start_in_thread(output: str, host: str = "127.0.0.1", port: int = 4318) -> uvicorn.Server:
+    """Start the stand-in on a background thread and wait until it accepts requests"""
+    server = uvicorn.Server(
+        uvicorn.Config(OTLPStandIn(output).app, host=host, port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("OTLP stand-in did not start")
+        time.sleep(0.05)
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="/tmp/chatpdf-traces.jsonl")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    uvicorn.run(OTLPStandIn(args.output).app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""Minimal S3-compatible stand-in server for local benchmarks
+
+Implements the subset of the S3 API that MinIOService uses: bucket
+HEAD/PUT/location, object PUT/GET (with Range and If-Match)/HEAD/DELETE and
+multipart uploads. Objects live in a directory on disk. Authentication is
+not checked.
+
+Usage:
+    uv run python -m benchmarks.s3_standin --root /tmp/s3 --port 9100
+"""
+
+import argparse
+import email.utils
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Optional
+from xml.etree import ElementTree as ET
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+logger = logging.getLogger(__name__)
+
+S3_NAMESPACE = "http://s3.amazonaws.com/doc/2006-03-01/"
+READ_CHUNK = 1024 * 1024
+
+
+def _xml(tag: str, **children: str) -> bytes:
+    root = ET.Element(tag, {"xmlns": S3_NAMESPACE})
+    for name, text in children.items():
+        ET.SubElement(root, name).text = text
+    return b'<?xml version="1.0" encoding="UTF-8"?>' + ET.tostring(root)
+
+
+def _error(status: int, code: str, message: str) -> Response:
+    return Response(
+        _xml("Error", Code=code, Message=message), status_code=status, media_type="application/xml"
+    )
+
+
+class S3StandIn:
+    """Directory-backed object store exposed over a tiny S3 HTTP API"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        self.uploads_dir = os.path.join(self.root, ".uploads")
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        self.app = Starlette(
+            routes=[
+                Route(
+                    "/{path:path}",
+                    self.handle,
+                    methods=["GET", "PUT", "POST", "HEAD", "DELETE"],
+                )
+            ]
+        )
+
+    def _object_path(self, bucket: str, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, bucket, key))
+        if not path.startswith(os.path.join(self.root, bucket) + os.sep):
+            raise ValueError("Invalid key")
+        return path
+
+    @staticmethod
+    def _meta_path(path: str) -> str:
+        return path + ".meta.json"
+
+    async def handle(self, request: Request) -> Response:
+        path = request.path_params["path"]
+        bucket, _, key = path.partition("/")
+        if not bucket:
+            return _error(400, "InvalidRequest", "Bucket name required")
+        if not key:
+            return await self._bucket(request, bucket)
+        try:
+            object_path = self._object_path(bucket, key)
+        except ValueError:
+            return _error(400, "InvalidArgument", "Invalid object key")
+        if not os.path.isdir(os.path.join(self.root, bucket)):
+            return _error(404, "NoSuchBucket", "The specified bucket does not exist")
+        return await self._object(request, bucket, key, object_path)
+
+    async def _bucket(self, request: Request, bucket: str) -> Response:
+        bucket_path = os.path.join(self.root, bucket)
+        if request.method == "GET" and "location" in request.query_params:
+            return Response(_xml("LocationConstraint"), media_type="application/xml")
+        if request.method == "HEAD":
+            return Response(status_code=200 if os.path.isdir(bucket_path) else 404)
+        if request.method == "PUT":
+            os.makedirs(bucket_path, exist_ok=True)
+            return Response(status_code=200)
+        return _error(501, "NotImplemented", "Bucket operation not supported")
+
+    async def _object(self, request: Request, bucket: str, key: str, path: str) -> Response:
+        params = request.query_params
+        method = request.method
+
+        if method == "POST" and "uploads" in params:
+            upload_id = uuid.uuid4().hex
+            os.makedirs(os.path.join(self.uploads_dir, upload_id))
+            return Response(
+                _xml("InitiateMultipartUploadResult", Bucket=bucket, Key=key, UploadId=upload_id),
+                media_type="application/xml",
+            )
+        if method == "PUT" and "uploadId" in params:
+            part_path = os.path.join(
+                self.uploads_dir, params["uploadId"], f"{int(params['partNumber']):05d}"
+            )
+            etag = await self._write_body(request, part_path)
+            return Response(headers={"ETag": f'"{etag}"'})
+        if method == "POST" and "uploadId" in params:
+            return await self._complete_upload(request, bucket, key, path, params["uploadId"])
+        if method == "DELETE" and "uploadId" in params:
+            shutil.rmtree(os.path.join(self.uploads_dir, params["uploadId"]), ignore_errors=True)
+            return Response(status_code=204)
+
+        if method == "PUT":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            etag = await self._write_body(request, path)
+            self._write_meta(path, etag, request.headers.get("content-type"))
+            return Response(headers={"ETag": f'"{etag}"'})
+        if method == "DELETE":
+            for p in (path, self._meta_path(path)):
+                if os.path.exists(p):
+                    os.remove(p)
+            return Response(status_code=204)
+
+        if not os.path.isfile(path):
+            return _error(404, "NoSuchKey", "The specified key does not exist")
+        meta = self._read_meta(path)
+        size = os.path.getsize(path)
+        headers = {
+            "ETag": f'"{meta["etag"]}"',
+            "Last-Modified": email.utils.formatdate(os.path.getmtime(path), usegmt=True),
+            "Content-Type": meta.get("content_type") or "application/octet-stream",
+            "Accept-Ranges": "bytes",
+        }
+
+        if_match = request.headers.get("if-match")
+        if if_match and if_match.strip('"') != meta["etag"]:
+            return _error(412, "PreconditionFailed", "ETag does not match")
+
+        if method == "HEAD":
+            return Response(headers={**headers, "Content-Length": str(size)})
+
+        start, end = 0, size - 1
+        status = 200
+        byte_range = request.headers.get("range")
+        if byte_range and byte_range.startswith("bytes="):
+            first, _, last = byte_range[6:].partition("-")
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+
+        return StreamingResponse(
+            self._read_range(path, start, end), status_code=status, headers=headers
+        )
+
+    async def _complete_upload(
+        self, request: Request, bucket: str, key: str, path: str, upload_id: str
+    ) -> Response:
+        upload_dir = os.path.join(self.uploads_dir, upload_id)
+        if not os.path.isdir(upload_dir):
+            return _error(404, "NoSuchUpload", "The specified upload does not exist")
+
+        root = ET.fromstring(await request.body())
+        part_numbers = sorted(
+            int(el.text) for el in root.iter() if el.tag.endswith("PartNumber") and el.text
+        )
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        part_digests = b""
+        with open(path, "wb") as out:
+            for number in part_numbers:
+                part_path = os.path.join(upload_dir, f"{number:05d}")
+                digest = hashlib.md5()
+                with open(part_path, "rb") as part:
+                    while chunk := part.read(READ_CHUNK):
+                        digest.update(chunk)
+                        out.write(chunk)
+                part_digests += digest.digest()
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+        etag = f"{hashlib.md5(part_digests).hexdigest()}-{len(part_numbers)}"
+        self._write_meta(path, etag, None)
+        return Response(
+            _xml(
+                "CompleteMultipartUploadResult",
+                Location=f"/{bucket}/{key}",
+                Bucket=bucket,
+                Key=key,
+                ETag=f'"{etag}"',
+            ),
+            media_type="application/xml",
+        )
+
+    @staticmethod
+    async def _write_body(request: Request, path: str) -> str:
+        digest = hashlib.md5()
+        with open(path, "wb") as f:
+            async for chunk in request.stream():
+                digest.update(chunk)
+                f.write(chunk)
+        return digest.hexdigest()
+
+    def _write_meta(self, path: str, etag: str, content_type: Optional[str]) -> None:
+        with open(self._meta_path(path), "w") as f:
+            json.dump({"etag": etag, "content_type": content_type}, f)
+
+    def _read_meta(self, path: str) -> dict:
+        try:
+            with open(self._meta_path(path)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"etag": f"{int(os.path.getmtime(path))}-{os.path.getsize(path)}"}
+
+    @staticmethod
+    async def _read_range(path: str, start: int, end: int):
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(READ_CHUNK, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+def start_in_thread(root: str, host: str = "127.0.0.1", port: int = 9100) -> uvicorn.Server:
+    """Start the stand-in on a background thread and wait until it accepts requests"""
+    server = uvicorn.Server(
+        uvicorn.Config(S3StandIn(root).app, host=host, port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("S3 stand-in did not start")
+        time.sleep(0.05)
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", default="/tmp/chatpdf-s3")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    uvicorn.run(S3StandIn(args.root).app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
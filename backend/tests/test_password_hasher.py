@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.password_hasher import PasswordHasher, PasswordHasherBusyError
+
+
+def test_timed_out_call_holds_its_slot_until_the_thread_finishes():
+    release = threading.Event()
+
+    def blocking_hash(value: str) -> str:
+        release.wait(5)
+        return value
+
+    async def scenario():
+        hasher = PasswordHasher(workers=1, max_pending=1, timeout=0.05)
+        try:
+            with pytest.raises(PasswordHasherBusyError, match="timed out"):
+                await hasher._run(blocking_hash, "first")
+            # The bcrypt job is still running, so its slot is still taken
+            assert hasher._slots.locked()
+            with pytest.raises(PasswordHasherBusyError, match="queue is full"):
+                await hasher._run(blocking_hash, "second")
+
+            release.set()
+            for _ in range(100):
+                if not hasher._slots.locked():
+                    break
+                await asyncio.sleep(0.01)
+            assert not hasher._slots.locked()
+            assert await hasher._run(blocking_hash, "third") == "third"
+        finally:
+            release.set()
+            hasher.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_hash_and_verify_round_trip():
+    async def scenario():
+        hasher = PasswordHasher(workers=2, max_pending=4, timeout=10)
+        try:
+            hashed = await hasher.hash("correct horse")
+            assert await hasher.verify("correct horse", hashed)
+            assert not await hasher.verify("wrong", hashed)
+            assert not hasher._slots.locked()
+        finally:
+            hasher.shutdown()
+
+    asyncio.run(scenario())
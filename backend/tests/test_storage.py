@@ -0,0 +1,65 @@
+import asyncio
+import io
+
+import pytest
+
+from app.services.storage import LocalFilesystemStorage, MinIOStorage, StorageBusyError
+
+
+class FakeMinIOService:
+    def __init__(self):
+        self.uploads = {}
+
+    def upload_fileobj(self, object_name, fileobj, length, content_type):
+        data = b""
+        while chunk := fileobj.read(1024):
+            data += chunk
+        self.uploads[object_name] = data
+
+    def file_exists(self, object_name):
+        return object_name in self.uploads
+
+
+def test_streamed_uploads_are_refused_when_saturated_without_blocking_other_calls():
+    async def scenario():
+        storage = MinIOStorage(max_workers=1, max_stream_uploads=1)
+        storage.service = FakeMinIOService()
+        release = asyncio.Event()
+
+        async def slow_client():
+            yield b"first "
+            await release.wait()
+            yield b"chunk"
+
+        async def one_chunk():
+            yield b"x"
+
+        try:
+            first = asyncio.create_task(storage.upload_stream("a", slow_client()))
+            await asyncio.sleep(0.05)
+            with pytest.raises(StorageBusyError):
+                await storage.upload_stream("b", one_chunk())
+            # The slow upload holds a stream thread, not one of the shared workers
+            assert not await asyncio.wait_for(storage.file_exists("a"), timeout=1)
+
+            release.set()
+            assert await first == len(b"first chunk")
+            await asyncio.sleep(0.01)
+            assert await storage.upload_stream("b", one_chunk()) == 1
+            assert storage.service.uploads == {"a": b"first chunk", "b": b"x"}
+        finally:
+            release.set()
+            storage._executor.shutdown()
+            storage._stream_executor.shutdown()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("length, expected", [(-1, b"x" * 3000), (1000, b"x" * 1000)])
+def test_local_upload_fileobj_honours_length(tmp_path, monkeypatch, length, expected):
+    monkeypatch.setattr("app.services.storage.COPY_CHUNK_SIZE", 512)
+    storage = LocalFilesystemStorage(str(tmp_path))
+
+    asyncio.run(storage.upload_fileobj("a/b.bin", io.BytesIO(b"x" * 3000), length))
+
+    assert (tmp_path / "a" / "b.bin").read_bytes() == expected
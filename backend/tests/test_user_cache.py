@@ -0,0 +1,48 @@
+import time
+import uuid
+
+from sqlalchemy.orm import Session
+
+from app.db.models.user import User
+from app.services.user_cache import UserCache, _PENDING_INVALIDATIONS, user_cache
+
+
+def _user(**overrides) -> User:
+    values = dict(
+        id=uuid.uuid4(),
+        email="reader@example.com",
+        username="reader",
+        hashed_password="hash",
+        is_active=True,
+        is_admin=False,
+    )
+    values.update(overrides)
+    return User(**values)
+
+
+def test_snapshot_loaded_before_invalidation_is_not_cached():
+    cache = UserCache(ttl_seconds=60, max_size=10)
+    user = _user()
+    loaded_at = time.monotonic()
+    cache.invalidate(str(user.id))
+
+    cache.set(user, loaded_at=loaded_at)
+    assert cache.get(str(user.id)) is None
+
+    cache.set(user, loaded_at=time.monotonic())
+    assert cache.get(str(user.id)).email == user.email
+
+
+def test_commit_invalidates_users_changed_in_the_session():
+    user = _user()
+    user_cache.set(user)
+    assert user_cache.get(str(user.id)) is not None
+
+    # As left by the flush-time mapper hook; the old row is re-cached before commit
+    session = Session()
+    session.info[_PENDING_INVALIDATIONS] = {str(user.id)}
+    user_cache.set(user, loaded_at=time.monotonic())
+    session.dispatch.after_commit(session)
+
+    assert user_cache.get(str(user.id)) is None
+    assert _PENDING_INVALIDATIONS not in session.info
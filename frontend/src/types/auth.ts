@@ -6,6 +6,7 @@ export interface User {
   bio?: string
   avatar_url?: string
   is_active: boolean
+  is_admin: boolean
   created_at: string
 }
 
@@ -6,11 +6,13 @@ export interface Image {
   created_at: string
   updated_at: string
   error_message?: string
+  description_status?: 'pending' | 'ready' | 'failed' | null
 }
 
 export interface ImageListResponse {
   images: Image[]
   total: number
+  next_cursor?: string | null
 }
 
 export interface DeleteImageResponse {
@@ -31,6 +33,7 @@ export interface ImageChatRequest {
 
 export interface ImageChatResponse {
   response: string
+  answer_path?: 'text' | 'vision' | 'escalated' | 'cached' | null
 }
 
 export interface ImageChatHistoryResponse {
@@ -19,4 +19,5 @@ export interface InitUploadResponse {
 export interface PDFListResponse {
   pdfs: PDF[]
   total: number
+  next_cursor?: string | null
 }